@@ -0,0 +1,214 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Mapping, Optional
+
+import httpx
+
+# Seconds a response is served without revalidation, per agent
+DEFAULT_TTLS: Dict[str, float] = {
+    "news": 900.0,
+    "filings": 6 * 3600.0,
+    "sanctions": 3600.0,
+    "wiki": 24 * 3600.0,
+    "finance": 3600.0,
+}
+
+# Describe the stored (decoded) body, not the original transfer
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection", "keep-alive"}
+
+
+def request_key(request: httpx.Request) -> str:
+    """Cache key over method, full URL (query included), body and request headers."""
+    h = hashlib.sha256()
+    h.update(request.method.encode())
+    h.update(b"\0" + str(request.url).encode())
+    for name, value in sorted(request.headers.items()):
+        h.update(b"\0" + name.encode() + b":" + value.encode())
+    h.update(b"\0" + request.content)
+    return h.hexdigest()
+
+
+def is_cacheable(response: httpx.Response) -> bool:
+    if response.status_code != 200:
+        return False
+    cc = response.headers.get("cache-control", "").lower()
+    return "no-store" not in cc and "private" not in cc
+
+
+@dataclass
+class CachedResponse:
+    status_code: int
+    headers: Dict[str, str]
+    body: bytes = field(repr=False)
+    # Wall-clock time of the last fetch or successful revalidation
+    stored_at: float
+
+    @classmethod
+    def from_response(cls, response: httpx.Response) -> "CachedResponse":
+        headers = {k: v for k, v in response.headers.items() if k.lower() not in _DROP_HEADERS}
+        return cls(response.status_code, headers, response.content, time.time())
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (now if now is not None else time.time()) - self.stored_at
+
+    def validators(self) -> Dict[str, str]:
+        """Conditional-request headers for revalidating this response."""
+        out = {}
+        if "etag" in self.headers:
+            out["If-None-Match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            out["If-Modified-Since"] = self.headers["last-modified"]
+        return out
+
+    def to_response(self, request: httpx.Request, status: str) -> httpx.Response:
+        resp = httpx.Response(self.status_code, headers=self.headers, content=self.body, request=request)
+        resp.headers["x-cache"] = status
+        return resp
+
+
+class ResponseCache:
+    """On-disk cache of agent responses, bounded to `max_bytes` with LRU eviction.
+
+    Entries live under `directory/<2 hex>/<key>.{body,meta}`, written atomically
+    (a uniquely named temp file in the same directory, then rename; body before
+    metadata), so workers sharing the directory never interleave writes. The LRU
+    index and `total_bytes` are per process: they are rebuilt from the files at
+    startup, ordered by modification time, and then track only this process's
+    reads and writes. `max_bytes` therefore bounds each worker's share, and the
+    directory as a whole can grow to the number of workers times that. Freshness is per agent: `ttls`
+    overrides DEFAULT_TTLS, and a TTL of 0 disables caching for that agent.
+    Stale entries younger than TTL + `stale_while_revalidate` may be served while
+    they are revalidated in the background (see HttpClients).
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttls: Optional[Mapping[str, float]] = None,
+        stale_while_revalidate: float = 300.0,
+    ) -> None:
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.stale_while_revalidate = stale_while_revalidate
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self.total_bytes = 0
+        self._load_index()
+
+    def ttl(self, agent: str) -> float:
+        return self.ttls.get(agent, 0.0)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def _paths(self, key: str):
+        base = self.directory / key[:2] / key
+        return base.with_suffix(".body"), base.with_suffix(".meta")
+
+    def _load_index(self) -> None:
+        if not self.directory.exists():
+            return
+        entries = []
+        for meta in self.directory.glob("*/*.meta"):
+            body = meta.with_suffix(".body")
+            try:
+                entries.append((meta.stat().st_mtime, meta.stem, body.stat().st_size + meta.stat().st_size))
+            except FileNotFoundError:
+                continue
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self.total_bytes += size
+
+    def _read(self, key: str) -> Optional[CachedResponse]:
+        body_path, meta_path = self._paths(key)
+        try:
+            meta = json.loads(meta_path.read_text())
+            body = body_path.read_bytes()
+        except (FileNotFoundError, ValueError):
+            return None
+        return CachedResponse(meta["status_code"], meta["headers"], body, meta["stored_at"])
+
+    @staticmethod
+    def _replace(path: Path, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
+
+    def _write(self, key: str, entry: CachedResponse, write_body: bool = True) -> int:
+        body_path, meta_path = self._paths(key)
+        body_path.parent.mkdir(parents=True, exist_ok=True)
+        if write_body:
+            self._replace(body_path, entry.body)
+        meta = json.dumps({"status_code": entry.status_code, "headers": entry.headers, "stored_at": entry.stored_at}).encode()
+        self._replace(meta_path, meta)
+        return len(entry.body) + len(meta)
+
+    def _delete(self, key: str) -> None:
+        for p in self._paths(key):
+            try:
+                p.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _account(self, key: str, size: int) -> None:
+        self.total_bytes += size - self._index.pop(key, 0)
+        self._index[key] = size
+        while self.total_bytes > self.max_bytes and len(self._index) > 1:
+            old, old_size = self._index.popitem(last=False)
+            self.total_bytes -= old_size
+            self._delete(old)
+
+    async def get(self, key: str) -> Optional[CachedResponse]:
+        if key not in self._index:
+            return None
+        entry = await asyncio.to_thread(self._read, key)
+        if entry is None:
+            self.total_bytes -= self._index.pop(key, 0)
+            return None
+        self._index.move_to_end(key)
+        return entry
+
+    async def put(self, key: str, entry: CachedResponse) -> None:
+        if self.max_bytes <= 0 or len(entry.body) > self.max_bytes:
+            return
+        size = await asyncio.to_thread(self._write, key, entry)
+        self._account(key, size)
+
+    async def refresh(self, key: str, entry: CachedResponse, response: httpx.Response) -> CachedResponse:
+        """Record a 304: restart the entry's freshness and take updated validators."""
+        for name in ("etag", "last-modified", "cache-control", "expires", "date"):
+            if name in response.headers:
+                entry.headers[name] = response.headers[name]
+        entry.stored_at = time.time()
+        if key in self._index:
+            size = await asyncio.to_thread(self._write, key, entry, False)
+            self._account(key, size)
+        return entry
+
+    async def clear(self) -> None:
+        keys = list(self._index)
+        self._index.clear()
+        self.total_bytes = 0
+        for key in keys:
+            await asyncio.to_thread(self._delete, key)
+
+
+__all__ = ["DEFAULT_TTLS", "CachedResponse", "ResponseCache", "is_cacheable", "request_key"]
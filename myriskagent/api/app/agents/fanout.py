@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+Factory = Callable[[], Awaitable[Any]]
+
+
+class SourceUnavailable(Exception):
+    """A source already timed out or failed earlier in the same request."""
+
+
+@dataclass
+class SourceStatus:
+    name: str
+    status: str  # ok | timeout | error
+    elapsed_ms: float
+    result: Any = None
+    error: Optional[str] = None
+
+    def summary(self) -> dict:
+        out = {"name": self.name, "status": self.status, "elapsed_ms": round(self.elapsed_ms, 1)}
+        if self.error:
+            out["error"] = self.error
+        return out
+
+
+class RequestFetches:
+    """Request-scoped memo of agent calls keyed by (agent, arguments).
+
+    Concurrent or repeated `get`s for the same key share one task, so a source
+    is fetched at most once per request. A key that timed out or failed is not
+    retried within the request: later `get`s raise SourceUnavailable at once,
+    while waiters already sharing its task keep their own deadlines. Call
+    `aclose` when the request ends to cancel whatever is still running.
+    """
+
+    def __init__(self) -> None:
+        self._tasks: Dict[Hashable, asyncio.Future] = {}
+        self._failed: Dict[Hashable, str] = {}
+
+    async def get(self, key: Hashable, factory: Factory, deadline: Optional[float] = None) -> Any:
+        if key in self._failed:
+            raise SourceUnavailable(f"{key!r}: {self._failed[key]}")
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(factory())
+        try:
+            # shield: one waiter's deadline must not cancel the task under the others
+            return await asyncio.wait_for(asyncio.shield(task), deadline)
+        except asyncio.TimeoutError:
+            # The task keeps running for waiters with later deadlines; aclose() cancels it
+            self._failed[key] = "timeout"
+            raise
+        except Exception as e:
+            self._failed.setdefault(key, type(e).__name__)
+            raise
+
+    async def aclose(self) -> None:
+        pending = [t for t in self._tasks.values() if not t.done()]
+        for t in pending:
+            t.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def fan_out(
+    fetches: RequestFetches,
+    sources: Mapping[str, Tuple[Hashable, Factory]],
+    deadlines: Mapping[str, float],
+    default_deadline: float = 5.0,
+) -> Dict[str, SourceStatus]:
+    """Run every source concurrently, each bounded by its own deadline.
+
+    `sources` maps a source name to (memo key, factory). Returns a status per
+    source; sources that miss their deadline or raise are reported, not raised.
+    """
+
+    async def run(name: str, key: Hashable, factory: Factory) -> SourceStatus:
+        start = time.perf_counter()
+        try:
+            result = await fetches.get(key, factory, deadlines.get(name, default_deadline))
+            status, error = "ok", None
+        except asyncio.TimeoutError:
+            result, status, error = None, "timeout", None
+        except Exception as e:
+            result, status, error = None, "error", str(e) or type(e).__name__
+        return SourceStatus(name, status, (time.perf_counter() - start) * 1000.0, result, error)
+
+    done = await asyncio.gather(*(run(name, key, factory) for name, (key, factory) in sources.items()))
+    return {s.name: s for s in done}
+
+
+__all__ = ["RequestFetches", "SourceStatus", "SourceUnavailable", "fan_out"]
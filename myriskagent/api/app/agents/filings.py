@@ -1,9 +1,13 @@
 from __future__ import annotations
 
+import asyncio
+import os
+import tempfile
 from dataclasses import dataclass
 from typing import Dict, List, Optional
 
-import httpx
+from .http import HttpClients
+from .xbrl import FactStore, fundamental_features, normalize_cik
 
 
 @dataclass
@@ -15,30 +19,75 @@ class FilingsResult:
     embeds: List[Dict[str, str]]
 
 
+def default_fact_store() -> FactStore:
+    return FactStore(os.path.join(tempfile.gettempdir(), "myriskagent-xbrl"))
+
+
+def _fmt(value: float) -> str:
+    for div, suffix in ((1e9, "B"), (1e6, "M"), (1e3, "K")):
+        if abs(value) >= div:
+            return f"{value / div:.1f}{suffix}"
+    return f"{value:.0f}"
+
+
 class FilingsAgent:
     """Fetch SEC filings and extract high-level snippets.
 
-    MVP: hit EDGAR company facts if ticker is provided; otherwise return empty.
+    MVP: hit EDGAR company facts if ticker (a CIK) is provided; otherwise return
+    empty. Selected XBRL facts are kept in a local per-company table (see
+    FactStore), refreshed at most every `max_age` seconds and conditionally.
     """
 
     BASE = "https://data.sec.gov"
 
+    def __init__(self, http: Optional[HttpClients] = None, facts: Optional[FactStore] = None) -> None:
+        self.http = http or HttpClients(pooled=False)
+        self.facts = facts or default_fact_store()
+
+    async def refresh_facts(self, cik: str) -> bool:
+        """Bring the local fact table for `cik` up to date; returns whether one is available."""
+        store = self.facts
+        if store.is_fresh(cik):
+            return True
+        headers = {"User-Agent": "MyRiskAgent/0.1 (contact@example.com)", **store.validators(cik)}
+        url = f"{self.BASE}/api/xbrl/companyfacts/CIK{normalize_cik(cik)}.json"
+        store.directory.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".companyfacts-", suffix=".json", dir=store.directory)
+        os.close(fd)
+        try:
+            r = await self.http.download("filings", url, tmp, headers=headers)
+            if r.status_code == 304:
+                store.touch(cik, r.headers)
+            elif r.status_code == 200:
+                # Parsing is CPU-bound; keep it off the event loop
+                await asyncio.to_thread(store.ingest, cik, tmp, r.headers)
+        finally:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+        return store.has(cik)
+
     async def fetch(self, org: str, ticker: Optional[str] = None) -> FilingsResult:
-        headers = {"User-Agent": "MyRiskAgent/0.1 (contact@example.com)"}
         facts: Dict[str, str] = {}
         snippets: List[Dict[str, str]] = []
         embeds: List[Dict[str, str]] = []
         if not ticker:
             return FilingsResult(org=org, ticker=ticker, facts=facts, snippets=snippets, embeds=embeds)
-        url = f"{self.BASE}/api/xbrl/companyfacts/CIK{ticker}.json"
         try:
-            async with httpx.AsyncClient(timeout=20.0, headers=headers) as client:
-                r = await client.get(url)
-                if r.status_code == 200:
-                    data = r.json()
-                    facts["fetched"] = "true"
-                    snippets.append({"section": "summary", "text": f"Fetched company facts for {ticker}"})
-                    embeds.append({"id": f"sec-{ticker}", "text": f"Company facts for {org} ({ticker})"})
+            if await self.refresh_facts(ticker):
+                annual = await asyncio.to_thread(self.facts.annual, ticker)
+                facts["fetched"] = "true"
+                if not annual.empty:
+                    latest = annual.iloc[-1]
+                    year_end = annual.index[-1].date().isoformat()
+                    for metric, value in latest.dropna().items():
+                        facts[metric] = f"{value:.0f}"
+                    facts["fiscal_year_end"] = year_end
+                    for name, value in fundamental_features(annual).items():
+                        facts[name] = f"{value:.4f}"
+                    figures = ", ".join(f"{m.replace('_', ' ')} {_fmt(v)}" for m, v in latest.dropna().items())
+                    text = f"{org} ({ticker}) fiscal year ended {year_end}: {figures}"
+                    snippets.append({"section": "financials", "text": text})
+                    embeds.append({"id": f"sec-{normalize_cik(ticker)}-{year_end}", "text": text})
         except Exception:
             pass
         return FilingsResult(org=org, ticker=ticker, facts=facts, snippets=snippets, embeds=embeds)
@@ -1,12 +1,17 @@
 from __future__ import annotations
 
+import asyncio
 from dataclasses import dataclass
-from typing import Dict, Optional
+from datetime import date, datetime, timezone
+from typing import Dict, Optional, Sequence, Tuple
 
-import httpx
 import numpy as np
 import pandas as pd
 
+from .http import HttpClients
+from .prices import PriceStore, batch_features
+from .xbrl import FactStore, fundamental_features
+
 
 @dataclass
 class FinanceResult:
@@ -16,18 +21,43 @@ class FinanceResult:
 
 
 class FinanceAgent:
-    def __init__(self, api_key: Optional[str] = None) -> None:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        http: Optional[HttpClients] = None,
+        facts: Optional[FactStore] = None,
+        prices: Optional[PriceStore] = None,
+        return_windows: Sequence[int] = (30,),
+        vol_windows: Sequence[int] = (30,),
+        drawdown_window: int = 0,
+        fetch_concurrency: int = 8,
+    ) -> None:
         self.api_key = api_key
+        self.http = http or HttpClients(pooled=False)
+        # Locally stored XBRL facts (written by FilingsAgent); never downloaded from here
+        self.facts = facts
+        # Local daily closes; fetches only append what is missing
+        self.prices = prices
+        self.return_windows: Tuple[int, ...] = tuple(return_windows)
+        self.vol_windows: Tuple[int, ...] = tuple(vol_windows)
+        self.drawdown_window = drawdown_window
+        self.fetch_concurrency = fetch_concurrency
+
+    def fundamentals(self, cik: str) -> Dict[str, float]:
+        """Ratios from the company's stored annual facts; empty when none are stored."""
+        if self.facts is None or not self.facts.has(cik):
+            return {}
+        return fundamental_features(self.facts.annual(cik))
 
-    async def fetch_prices_alpha(self, ticker: str) -> pd.DataFrame:
+    async def fetch_prices_alpha(self, ticker: str, full: bool = False) -> pd.DataFrame:
         if not self.api_key:
             return pd.DataFrame()
         url = "https://www.alphavantage.co/query"
-        params = {"function": "TIME_SERIES_DAILY_ADJUSTED", "symbol": ticker, "outputsize": "compact", "apikey": self.api_key}
-        async with httpx.AsyncClient(timeout=20.0) as client:
-            r = await client.get(url, params=params)
-            r.raise_for_status()
-            data = r.json().get("Time Series (Daily)", {})
+        outputsize = "full" if full else "compact"
+        params = {"function": "TIME_SERIES_DAILY_ADJUSTED", "symbol": ticker, "outputsize": outputsize, "apikey": self.api_key}
+        r = await self.http.get("finance", url, params=params)
+        r.raise_for_status()
+        data = r.json().get("Time Series (Daily)", {})
         if not data:
             return pd.DataFrame()
         rows = []
@@ -38,23 +68,71 @@ class FinanceAgent:
         df.set_index("date", inplace=True)
         return df
 
+    async def update_prices(self, tickers: Sequence[str], today: Optional[date] = None) -> int:
+        """Fetch closes for tickers not yet current in the price store and append them.
+
+        A ticker is current once it has the close of the last business day
+        before `today` (UTC), or when it was already fetched today, which covers
+        exchange holidays. Tickers with no stored history get the full series,
+        the rest the recent one; only dates after each ticker's last stored date
+        are written. Returns the number of rows appended; failed fetches are skipped.
+        """
+        if self.prices is None:
+            return 0
+        last = await asyncio.to_thread(self.prices.last_dates)
+        fetched = self.prices.fetched()
+        today = today or datetime.now(timezone.utc).date()
+        expected = (pd.Timestamp(today) - pd.offsets.BDay(1)).date()
+        stale = [
+            t for t in dict.fromkeys(tickers)
+            if fetched.get(t) != today and (last.get(t) is None or last[t] < expected)
+        ]
+        sem = asyncio.Semaphore(max(1, self.fetch_concurrency))
+
+        async def one(ticker: str) -> Optional[pd.DataFrame]:
+            async with sem:
+                try:
+                    df = await self.fetch_prices_alpha(ticker, full=ticker not in last)
+                except Exception:
+                    return None
+            if df.empty:
+                return df
+            return pd.DataFrame({"ticker": ticker, "date": df.index, "close": df["close"].to_numpy()})
+
+        results = await asyncio.gather(*(one(t) for t in stale))
+        self.prices.mark_fetched([t for t, f in zip(stale, results) if f is not None], today)
+        frames = [f for f in results if f is not None and not f.empty]
+        if not frames:
+            return 0
+        return await asyncio.to_thread(self.prices.append, pd.concat(frames, ignore_index=True))
+
+    def matrix_features(self, prices: pd.DataFrame) -> pd.DataFrame:
+        """Features for every column of a wide date x ticker close matrix, with this agent's windows."""
+        return batch_features(prices, self.return_windows, self.vol_windows, self.drawdown_window)
+
+    async def portfolio_features(self, tickers: Sequence[str], refresh: bool = True) -> pd.DataFrame:
+        """Features for many tickers from the local price store, optionally fetching missing dates first."""
+        if self.prices is None:
+            return pd.DataFrame(index=pd.Index(list(tickers), name="ticker"))
+        if refresh:
+            await self.update_prices(tickers)
+        matrix = await asyncio.to_thread(self.prices.matrix, list(tickers))
+        return self.matrix_features(matrix)
+
     @staticmethod
     def compute_features(prices: pd.DataFrame) -> Dict[str, float]:
         if prices.empty:
             return {"ret_30d": 0.0, "vol_30d": 0.0, "drawdown": 0.0}
-        close = prices["close"].astype(float)
-        ret = close.pct_change().dropna()
-        ret_30 = (close.iloc[-1] / close.iloc[-min(30, len(close)-1)] - 1.0) if len(close) > 1 else 0.0
-        vol_30 = float(ret.tail(min(30, len(ret))).std() or 0.0)
-        peak = close.cummax()
-        dd = float(((close - peak) / peak).min() or 0.0)
-        return {"ret_30d": float(ret_30), "vol_30d": float(vol_30), "drawdown": float(abs(dd))}
-
-    async def run(self, ticker: str) -> FinanceResult:
+        feats = batch_features(prices[["close"]].astype(float)).iloc[0]
+        return {k: float(0.0 if pd.isna(v) else v) for k, v in feats.items()}
+
+    async def run(self, ticker: str, cik: Optional[str] = None) -> FinanceResult:
         df = await self.fetch_prices_alpha(ticker)
         if df.empty:
             # fallback: synthetic flat series
-            idx = pd.date_range(end=pd.Timestamp.utcnow(), periods=60, freq="D")
+            idx = pd.date_range(end=pd.Timestamp.now(tz="UTC"), periods=60, freq="D")
             df = pd.DataFrame({"close": np.linspace(100, 102, len(idx))}, index=idx)
         feats = self.compute_features(df)
+        if cik:
+            feats.update(self.fundamentals(cik))
         return FinanceResult(ticker=ticker, features=feats, series=df)
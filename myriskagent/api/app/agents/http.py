@@ -0,0 +1,269 @@
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Callable, Dict, Mapping, Optional, Set
+from urllib.parse import urlsplit
+
+import httpx
+
+from .cache import CachedResponse, ResponseCache, is_cacheable, request_key
+from .resilience import HostResilience
+
+try:
+    import h2  # type: ignore  # noqa: F401
+
+    HTTP2_AVAILABLE = True
+except Exception:  # pragma: no cover
+    HTTP2_AVAILABLE = False
+
+# Read timeouts per agent, matching what each agent used before pooling
+DEFAULT_TIMEOUTS: Dict[str, float] = {
+    "news": 15.0,
+    "filings": 20.0,
+    "sanctions": 10.0,
+    "wiki": 10.0,
+    "finance": 20.0,
+}
+
+# (host, reused connection?, seconds spent connecting incl. TLS)
+RequestObserver = Callable[[str, bool, float], None]
+# (agent, outcome): hit, stale, revalidated, miss, stale-error
+CacheObserver = Callable[[str, str], None]
+
+
+class _ConnectionTrace:
+    """httpcore trace hook recording whether a request opened a new connection."""
+
+    __slots__ = ("connect_started", "connect_s", "opened")
+
+    def __init__(self) -> None:
+        self.connect_started = 0.0
+        self.connect_s = 0.0
+        self.opened = False
+
+    async def __call__(self, event_name: str, info: dict) -> None:
+        if event_name == "connection.connect_tcp.started":
+            self.opened = True
+            self.connect_started = time.perf_counter()
+        elif event_name in ("connection.connect_tcp.complete", "connection.start_tls.complete"):
+            self.connect_s = time.perf_counter() - self.connect_started
+
+
+class HttpClients:
+    """Application-scoped `httpx.AsyncClient` registry shared by the external-data agents.
+
+    One pooled client per host, so `max_connections_per_host` bounds concurrent
+    connections to each upstream and idle connections are kept alive for
+    `keepalive_expiry` seconds. HTTP/2 is negotiated when the `h2` package is
+    installed. Timeouts are per agent (`timeouts` overrides DEFAULT_TIMEOUTS).
+
+    `pooled=False` gives the old behavior (a client per request, closed after
+    it), which is what agents use when no registry is injected. `observer` is
+    called after every request with the host, whether the connection was
+    reused, and the time spent connecting.
+
+    With a `cache`, requests from agents that have a TTL go through it: fresh
+    entries are returned without a request, expired ones are revalidated with
+    If-None-Match / If-Modified-Since, and (pooled mode only) entries within the
+    stale-while-revalidate window are returned at once while a background task
+    refreshes them. A failed revalidation falls back to the stale entry.
+    Responses carry an `x-cache` header saying which path served them.
+
+    With `resilience`, every request to the network goes through the host's
+    token bucket and circuit breaker, with jittered retries (see HostResilience).
+    """
+
+    def __init__(
+        self,
+        max_connections_per_host: int = 10,
+        max_keepalive_per_host: int = 10,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: float = 5.0,
+        http2: bool = True,
+        timeouts: Optional[Mapping[str, float]] = None,
+        observer: Optional[RequestObserver] = None,
+        pooled: bool = True,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        cache: Optional[ResponseCache] = None,
+        cache_observer: Optional[CacheObserver] = None,
+        resilience: Optional[HostResilience] = None,
+    ) -> None:
+        self.limits = httpx.Limits(
+            max_connections=max_connections_per_host,
+            max_keepalive_connections=max_keepalive_per_host,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.connect_timeout = connect_timeout
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.observer = observer
+        self.pooled = pooled
+        self._transport = transport
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+        self.cache = cache
+        self.cache_observer = cache_observer
+        self._refreshing: Set[str] = set()
+        self._tasks: Set[asyncio.Task] = set()
+        self.resilience = resilience
+
+    def timeout(self, agent: str) -> httpx.Timeout:
+        read = self.timeouts.get(agent, 10.0)
+        return httpx.Timeout(read, connect=min(self.connect_timeout, read))
+
+    def _new_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(limits=self.limits, http2=self.http2, transport=self._transport)
+
+    def client(self, host: str) -> httpx.AsyncClient:
+        """The pooled client for `host`, created on first use."""
+        c = self._clients.get(host)
+        if c is None or c.is_closed:
+            c = self._clients[host] = self._new_client()
+        return c
+
+    async def request(self, agent: str, method: str, url: str, cache: bool = True, **kwargs) -> httpx.Response:
+        """Send a request on the host's pooled client with `agent`'s timeout.
+
+        `cache=False` bypasses the response cache for this call.
+        """
+        kwargs.setdefault("timeout", self.timeout(agent))
+        if self.pooled:
+            return await self._request(self.client(urlsplit(url).netloc), agent, method, url, cache, kwargs)
+        async with self._new_client() as c:
+            return await self._request(c, agent, method, url, cache, kwargs)
+
+    async def download(
+        self, agent: str, url: str, dest: str | os.PathLike, headers: Optional[Mapping[str, str]] = None
+    ) -> httpx.Response:
+        """Stream a GET response body to `dest` without holding it in memory.
+
+        The body is written to a temporary file and renamed into place, and only
+        for a 200; other statuses (e.g. 304 to a conditional request) leave
+        `dest` untouched. Bypasses the response cache. The returned response is
+        closed and its body is not available.
+        """
+        dest = Path(dest)
+        client = self.client(urlsplit(url).netloc) if self.pooled else self._new_client()
+        try:
+            request = client.build_request("GET", url, headers=headers, timeout=self.timeout(agent))
+            resp = await self._send(client, request, stream=True)
+            try:
+                if resp.status_code == 200:
+                    tmp = dest.with_name(f".{dest.name}.{os.getpid()}.part")
+                    try:
+                        with open(tmp, "wb") as fh:
+                            async for chunk in resp.aiter_bytes():
+                                fh.write(chunk)
+                        os.replace(tmp, dest)
+                    finally:
+                        if tmp.exists():
+                            tmp.unlink()
+            finally:
+                await resp.aclose()
+            return resp
+        finally:
+            if not self.pooled:
+                await client.aclose()
+
+    async def _send(self, client: httpx.AsyncClient, request: httpx.Request, stream: bool = False) -> httpx.Response:
+        if self.resilience is None:
+            return await self._send_once(client, request, stream)
+        return await self.resilience.call(
+            request.url.netloc.decode("ascii"), lambda: self._send_once(client, request, stream)
+        )
+
+    async def _send_once(self, client: httpx.AsyncClient, request: httpx.Request, stream: bool = False) -> httpx.Response:
+        trace = _ConnectionTrace()
+        request.extensions = {**request.extensions, "trace": trace}
+        resp = await client.send(request, stream=stream)
+        if self.observer is not None:
+            self.observer(request.url.netloc.decode("ascii"), not trace.opened, trace.connect_s)
+        return resp
+
+    def _observe_cache(self, agent: str, outcome: str) -> None:
+        if self.cache_observer is not None:
+            self.cache_observer(agent, outcome)
+
+    async def _request(self, client, agent: str, method: str, url: str, use_cache: bool, kwargs: dict) -> httpx.Response:
+        request = client.build_request(method, url, **kwargs)
+        cache = self.cache
+        if cache is None or not use_cache or cache.ttl(agent) <= 0:
+            return await self._send(client, request)
+        key = request_key(request)
+        entry = await cache.get(key)
+        if entry is not None:
+            age, ttl = entry.age(), cache.ttl(agent)
+            if age < ttl:
+                self._observe_cache(agent, "hit")
+                return entry.to_response(request, "HIT")
+            if self.pooled and age < ttl + cache.stale_while_revalidate:
+                self._observe_cache(agent, "stale")
+                self._refresh_later(client, agent, request, key, entry)
+                return entry.to_response(request, "STALE")
+        return await self._revalidate(client, agent, request, key, entry)
+
+    async def _revalidate(
+        self, client, agent: str, request: httpx.Request, key: str, entry: Optional[CachedResponse]
+    ) -> httpx.Response:
+        assert self.cache is not None
+        if entry is not None:
+            request.headers.update(entry.validators())
+        try:
+            resp = await self._send(client, request)
+        except httpx.HTTPError:
+            if entry is None:
+                raise
+            self._observe_cache(agent, "stale-error")
+            return entry.to_response(request, "STALE")
+        if entry is not None and resp.status_code >= 500:
+            # Upstream failing: the stale copy beats an error page
+            await resp.aclose()
+            self._observe_cache(agent, "stale-error")
+            return entry.to_response(request, "STALE")
+        if entry is not None and resp.status_code == 304:
+            entry = await self.cache.refresh(key, entry, resp)
+            self._observe_cache(agent, "revalidated")
+            return entry.to_response(request, "REVALIDATED")
+        if is_cacheable(resp):
+            await self.cache.put(key, CachedResponse.from_response(resp))
+        self._observe_cache(agent, "miss")
+        resp.headers["x-cache"] = "MISS"
+        return resp
+
+    def _refresh_later(self, client, agent: str, request: httpx.Request, key: str, entry: CachedResponse) -> None:
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def refresh() -> None:
+            try:
+                await self._revalidate(client, agent, request, key, entry)
+            except Exception:
+                # Best-effort; the next request past the window revalidates inline
+                pass
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(refresh())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def get(self, agent: str, url: str, **kwargs) -> httpx.Response:
+        return await self.request(agent, "GET", url, **kwargs)
+
+    async def post(self, agent: str, url: str, **kwargs) -> httpx.Response:
+        return await self.request(agent, "POST", url, **kwargs)
+
+    async def aclose(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        clients, self._clients = list(self._clients.values()), {}
+        for c in clients:
+            await c.aclose()
+
+
+__all__ = ["DEFAULT_TIMEOUTS", "HTTP2_AVAILABLE", "HttpClients"]
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import os
+from typing import AsyncIterator, Dict, List, Optional
+
+try:
+    import openai  # type: ignore
+except Exception:  # pragma: no cover
+    openai = None  # type: ignore
+
+
+def chat_client(api_key: Optional[str] = None):
+    """`openai.AsyncOpenAI` for chat completions, or None without the package or a key.
+
+    OPENAI_BASE_URL points it at any compatible server (a proxy, or a local fake
+    in tests), as for embeddings.
+    """
+    api_key = api_key or os.getenv("OPENAI_API_KEY")
+    if openai is None or not api_key:
+        return None
+    return openai.AsyncOpenAI(api_key=api_key, base_url=os.getenv("OPENAI_BASE_URL") or None)
+
+
+def chat_model() -> str:
+    return os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+
+async def complete(client, messages: List[Dict[str, str]], temperature: float = 0.2) -> str:
+    resp = await client.chat.completions.create(model=chat_model(), temperature=temperature, messages=messages)
+    return resp.choices[0].message.content or ""
+
+
+async def stream(client, messages: List[Dict[str, str]], temperature: float = 0.2) -> AsyncIterator[str]:
+    """Content deltas of a streamed completion, as they arrive."""
+    chunks = await client.chat.completions.create(
+        model=chat_model(), temperature=temperature, messages=messages, stream=True
+    )
+    try:
+        async for chunk in chunks:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+    finally:
+        # Releases the connection when the consumer stops early (e.g. the client disconnected)
+        await chunks.close()
+
+
+__all__ = ["chat_client", "chat_model", "complete", "stream"]
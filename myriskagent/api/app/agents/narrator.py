@@ -1,13 +1,10 @@
 from __future__ import annotations
 
+import json
 from dataclasses import dataclass
-from typing import Dict, List, Optional
-import os
+from typing import AsyncIterator, Dict, List, Optional
 
-try:
-    import openai  # type: ignore
-except Exception:  # pragma: no cover
-    openai = None  # type: ignore
+from . import llm
 
 
 @dataclass
@@ -24,15 +21,31 @@ SYSTEM_PROMPT = (
 )
 
 
+def parse_report(content: str) -> Report:
+    """Split model output into report HTML and the JSON summary block (```json fences), if present."""
+    html = content
+    summary: Dict[str, object] = {"headline": "", "risks": [], "actions": []}
+    if "```" in content:
+        parts = content.split("```")
+        for i in range(len(parts) - 1):
+            if parts[i].strip().lower().startswith("json"):
+                try:
+                    summary = json.loads(parts[i + 1])  # type: ignore
+                    html = content.replace("```json\n" + parts[i + 1] + "\n```", "").strip()
+                    break
+                except Exception:
+                    pass
+    return Report(html=html, summary=summary)
+
+
 class NarratorAgent:
-    def __init__(self, openai_api_key: Optional[str] = None) -> None:
-        self.openai_api_key = openai_api_key or os.getenv("OPENAI_API_KEY")
-        if openai is None or not self.openai_api_key:
+    def __init__(self, openai_api_key: Optional[str] = None, client=None) -> None:
+        # `client` (an openai.AsyncOpenAI) is shared with the QA agent
+        self.client = client or llm.chat_client(openai_api_key)
+        if self.client is None:
             raise RuntimeError("OPENAI_API_KEY is required for NarratorAgent")
-        self._client = openai.OpenAI(api_key=self.openai_api_key)
-        self._model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
-    async def build_reports(self, inputs: Dict[str, object]) -> Report:
+    def messages(self, inputs: Dict[str, object]) -> List[Dict[str, str]]:
         # Expected inputs: {org_id, period, scores, drivers, top_docs: [{id,title,url,snippet}], ...}
         org_id = inputs.get("org_id")
         period = inputs.get("period")
@@ -55,28 +68,14 @@ Write two artifacts:
 1) Executive brief HTML. Include a headline, 2–4 bullet risks (with (%) where applicable), 2–4 actions. Cite every factual claim inline using [id](url). Keep HTML semantic and minimal.
 2) JSON summary with keys: headline (string), risks (array of strings), actions (array of strings).
 """
-        resp = self._client.chat.completions.create(
-            model=self._model,
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
-        content = resp.choices[0].message.content or ""
-        # Simple split heuristic: expect a JSON block at the end delineated by ```json fences if present
-        html = content
-        summary: Dict[str, object] = {"headline": "", "risks": [], "actions": []}
-        # Attempt to extract JSON between code fences
-        if "```" in content:
-            parts = content.split("```")
-            for i in range(len(parts) - 1):
-                if parts[i].strip().lower().startswith("json"):
-                    try:
-                        import json
-                        summary = json.loads(parts[i + 1])  # type: ignore
-                        html = content.replace("```json\n" + parts[i + 1] + "\n```", "").strip()
-                        break
-                    except Exception:
-                        pass
-        return Report(html=html, summary=summary)
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
+
+    async def build_reports(self, inputs: Dict[str, object]) -> Report:
+        return parse_report(await llm.complete(self.client, self.messages(inputs)))
+
+    def stream_reports(self, inputs: Dict[str, object]) -> AsyncIterator[str]:
+        """Report text as it is generated; pass the joined text to `parse_report` at the end."""
+        return llm.stream(self.client, self.messages(inputs))
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
+from datetime import datetime
 from typing import Dict, List, Optional
 
-import httpx
+from .http import HttpClients
 
 
 @dataclass
@@ -15,33 +16,48 @@ class NewsResult:
 
 
 class NewsAgent:
-    def __init__(self, api_key: Optional[str] = None) -> None:
+    page_size = 20
+
+    def __init__(self, api_key: Optional[str] = None, http: Optional[HttpClients] = None) -> None:
         self.api_key = api_key
+        self.http = http or HttpClients(pooled=False)
 
-    async def search(self, query: str, months: int = 12) -> NewsResult:
+    async def articles(
+        self, query: str, since: Optional[datetime] = None, until: Optional[datetime] = None
+    ) -> List[Dict[str, str]]:
+        """Up to `page_size` latest articles for `query` published in [since, until], newest first.
+
+        Both bounds are inclusive (NewsAPI's `from`/`to`). Raises on transport or HTTP errors.
+        """
         if not self.api_key:
-            return NewsResult(query=query, items=[], embeds=[], online_component=10.0)
+            return []
         url = "https://newsapi.org/v2/everything"
-        params = {"q": query, "pageSize": 20, "sortBy": "publishedAt", "language": "en"}
+        params = {"q": query, "pageSize": self.page_size, "sortBy": "publishedAt", "language": "en"}
+        if since is not None:
+            params["from"] = since.strftime("%Y-%m-%dT%H:%M:%S")
+        if until is not None:
+            params["to"] = until.strftime("%Y-%m-%dT%H:%M:%S")
         headers = {"X-Api-Key": self.api_key}
+        r = await self.http.get("news", url, params=params, headers=headers)
+        r.raise_for_status()
+        return [
+            {
+                "title": art.get("title") or "",
+                "url": art.get("url") or "",
+                "publishedAt": art.get("publishedAt") or "",
+                "source": (art.get("source") or {}).get("name") or "",
+            }
+            for art in r.json().get("articles", [])[: self.page_size]
+        ]
+
+    async def search(self, query: str, months: int = 12) -> NewsResult:
+        if not self.api_key:
+            return NewsResult(query=query, items=[], embeds=[], online_component=10.0)
         items: List[Dict[str, str]] = []
-        embeds: List[Dict[str, str]] = []
         try:
-            async with httpx.AsyncClient(timeout=15.0, headers=headers) as client:
-                r = await client.get(url, params=params)
-                if r.status_code == 200:
-                    data = r.json()
-                    for art in data.get("articles", [])[:20]:
-                        items.append(
-                            {
-                                "title": art.get("title") or "",
-                                "url": art.get("url") or "",
-                                "publishedAt": art.get("publishedAt") or "",
-                                "source": (art.get("source") or {}).get("name") or "",
-                            }
-                        )
-                        embeds.append({"id": art.get("url") or "", "text": (art.get("title") or "")})
+            items = await self.articles(query)
         except Exception:
             pass
+        embeds = [{"id": it["url"], "text": it["title"]} for it in items]
         # Online component is a tiny placeholder until sentiment/severity
         return NewsResult(query=query, items=items, embeds=embeds, online_component=15.0)
@@ -0,0 +1,227 @@
+from __future__ import annotations
+
+import os
+import threading
+import uuid
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as pads
+import pyarrow.parquet as pq
+
+PRICE_SCHEMA = pa.schema([("ticker", pa.string()), ("date", pa.date32()), ("close", pa.float64())])
+
+
+class PriceStore:
+    """Daily closes for many tickers as Parquet files under `directory`.
+
+    `append` only writes rows newer than each ticker's last stored date, as a
+    new part file; once there are more than `max_parts` files they are
+    compacted into one sorted by (ticker, date). `matrix` reads the dataset
+    back as a wide date x ticker frame. `fetched` records the day each ticker
+    was last fetched (per process), so a fetch that brought nothing new is not
+    repeated that day.
+    """
+
+    def __init__(self, directory: str | os.PathLike, max_parts: int = 64) -> None:
+        self.directory = Path(directory)
+        self.max_parts = max_parts
+        self._last: Optional[Dict[str, date]] = None
+        self._fetched: Dict[str, date] = {}
+        self._lock = threading.Lock()
+
+    def _parts(self):
+        if not self.directory.is_dir():
+            return []
+        return sorted(p for p in self.directory.glob("part-*.parquet"))
+
+    def _dataset(self) -> Optional[pads.Dataset]:
+        parts = self._parts()
+        if not parts:
+            return None
+        return pads.dataset([str(p) for p in parts], schema=PRICE_SCHEMA, format="parquet")
+
+    def last_dates(self) -> Dict[str, date]:
+        """Latest stored date per ticker."""
+        if self._last is None:
+            with self._lock:
+                if self._last is None:
+                    ds = self._dataset()
+                    last: Dict[str, date] = {}
+                    if ds is not None:
+                        agg = ds.to_table(columns=["ticker", "date"]).group_by("ticker").aggregate([("date", "max")])
+                        last = dict(zip(agg["ticker"].to_pylist(), agg["date_max"].to_pylist()))
+                    self._last = last
+        return dict(self._last)
+
+    def fetched(self) -> Dict[str, date]:
+        """Day each ticker was last fetched by this process."""
+        return dict(self._fetched)
+
+    def mark_fetched(self, tickers: Iterable[str], day: date) -> None:
+        with self._lock:
+            self._fetched.update(dict.fromkeys(tickers, day))
+
+    def _write_part(self, table: pa.Table, name: Optional[str] = None) -> Path:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        dates = table["date"]
+        lo, hi = pc.min(dates).as_py(), pc.max(dates).as_py()
+        path = self.directory / (name or f"part-{lo:%Y%m%d}-{hi:%Y%m%d}-{uuid.uuid4().hex[:8]}.parquet")
+        # Dot-prefixed while being written, so dataset scans never pick up a partial file
+        tmp = path.with_name(f".{path.name}.tmp")
+        pq.write_table(table, tmp, compression="zstd")
+        os.replace(tmp, path)
+        return path
+
+    def append(self, prices: pd.DataFrame) -> int:
+        """Store long-format rows (`ticker`, `date`, `close`) newer than what is stored; returns rows written."""
+        if prices.empty:
+            return 0
+        last = {t: pd.Timestamp(d) for t, d in self.last_dates().items()}
+        df = prices[["ticker", "date", "close"]].dropna()
+        df = df.assign(date=pd.to_datetime(df["date"]).dt.normalize(), ticker=df["ticker"].astype(str))
+        cutoff = pd.to_datetime(df["ticker"].map(last))
+        df = df[cutoff.isna() | (df["date"] > cutoff)]
+        df = df.drop_duplicates(["ticker", "date"], keep="last").sort_values(["ticker", "date"])
+        if df.empty:
+            return 0
+        table = pa.Table.from_arrays(
+            [
+                pa.array(df["ticker"].to_numpy(), pa.string()),
+                pa.array(df["date"].to_numpy().astype("datetime64[D]")),
+                pa.array(df["close"].to_numpy(dtype=float)),
+            ],
+            schema=PRICE_SCHEMA,
+        )
+        with self._lock:
+            self._write_part(table)
+            latest = df.groupby("ticker")["date"].max()
+            if self._last is not None:
+                self._last.update({t: ts.date() for t, ts in latest.items()})
+            if len(self._parts()) > self.max_parts:
+                self._compact()
+        return len(df)
+
+    def _compact(self) -> None:
+        parts = self._parts()
+        if len(parts) <= 1:
+            return
+        table = pads.dataset([str(p) for p in parts], schema=PRICE_SCHEMA, format="parquet").to_table()
+        table = table.sort_by([("ticker", "ascending"), ("date", "ascending")])
+        self._write_part(table)
+        for p in parts:
+            p.unlink()
+
+    def compact(self) -> None:
+        with self._lock:
+            self._compact()
+
+    def matrix(
+        self,
+        tickers: Optional[Sequence[str]] = None,
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+    ) -> pd.DataFrame:
+        """Closes as a float64 date x ticker frame (NaN where a ticker has no row for a date)."""
+        ds = self._dataset()
+        if ds is None:
+            return pd.DataFrame(columns=list(tickers or []), dtype=float)
+        flt = None
+        for cond in (
+            pc.field("ticker").isin(list(tickers)) if tickers is not None else None,
+            pc.field("date") >= pa.scalar(start, pa.date32()) if start else None,
+            pc.field("date") <= pa.scalar(end, pa.date32()) if end else None,
+        ):
+            if cond is not None:
+                flt = cond if flt is None else flt & cond
+        table = ds.to_table(filter=flt)
+        dates, date_idx = np.unique(table["date"].to_numpy(), return_inverse=True)
+        names = list(tickers) if tickers is not None else sorted(pc.unique(table["ticker"]).to_pylist())
+        ticker_idx = pc.index_in(table["ticker"], value_set=pa.array(names, pa.string())).to_numpy()
+        out = np.full((len(dates), len(names)), np.nan)
+        out[date_idx, ticker_idx] = table["close"].to_numpy()
+        return pd.DataFrame(out, index=pd.DatetimeIndex(dates, name="date"), columns=names)
+
+
+def _ffill(a: np.ndarray) -> np.ndarray:
+    """Forward-fill NaNs down each column (leading NaNs stay NaN)."""
+    idx = np.where(np.isnan(a), 0, np.arange(a.shape[0])[:, None])
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    return a[idx, np.arange(a.shape[1])]
+
+
+def rolling_volatility(returns: np.ndarray, window: int) -> np.ndarray:
+    """Sample std (ddof=1) of each column over trailing `window` rows, from running sums.
+
+    NaN returns are skipped; rows with fewer than two values in the window are NaN.
+    """
+    valid = ~np.isnan(returns)
+    r = np.where(valid, returns, 0.0)
+    zero = np.zeros((1, returns.shape[1]))
+    s1 = np.concatenate([zero, np.cumsum(r, axis=0)])
+    s2 = np.concatenate([zero, np.cumsum(r * r, axis=0)])
+    n = np.concatenate([zero, np.cumsum(valid, axis=0)])
+    lo = np.maximum(np.arange(1, len(r) + 1) - window, 0)
+    hi = np.arange(1, len(r) + 1)
+    c = n[hi] - n[lo]
+    t1 = s1[hi] - s1[lo]
+    t2 = s2[hi] - s2[lo]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        var = (t2 - t1 * t1 / c) / (c - 1)
+    var = np.where(c >= 2, np.maximum(var, 0.0), np.nan)
+    return np.sqrt(var)
+
+
+def batch_features(
+    prices: pd.DataFrame,
+    return_windows: Iterable[int] = (30,),
+    vol_windows: Iterable[int] = (30,),
+    drawdown_window: int = 0,
+) -> pd.DataFrame:
+    """Per-ticker features from a wide date x ticker close matrix, in one vectorized pass.
+
+    - ret_{w}d: last close over the close w rows earlier (or the first close, if
+      the history is shorter), minus 1
+    - vol_{w}d: sample std of daily simple returns over the last w returns
+    - drawdown: largest peak-to-trough fall over the last `drawdown_window`
+      rows (0 = full history), as a positive fraction
+
+    Each ticker is measured as of its own last close, so a ticker that was not
+    refreshed is not flattened by dates only other tickers have; gaps inside
+    its history are forward-filled. Returns a frame indexed by ticker; tickers
+    without any price are NaN.
+    """
+    tickers = list(prices.columns)
+    if prices.empty:
+        return pd.DataFrame(index=pd.Index(tickers, name="ticker"))
+    raw = prices.to_numpy(dtype=float)
+    rows, cols = raw.shape
+    ar, row = np.arange(cols), np.arange(rows)[:, None]
+    has = ~np.isnan(raw)
+    first = np.argmax(has, axis=0)
+    last_row = rows - 1 - np.argmax(has[::-1], axis=0)
+    p = np.where(row > last_row, np.nan, _ffill(raw))
+    last = p[last_row, ar]
+    out: Dict[str, np.ndarray] = {}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for w in return_windows:
+            out[f"ret_{w}d"] = last / p[np.maximum(last_row - w, first), ar] - 1.0
+        # rets[i] is the return into row i + 1
+        rets = p[1:] / p[:-1] - 1.0
+        for w in vol_windows:
+            vol = rolling_volatility(rets, w)[np.maximum(last_row - 1, 0), ar] if rows > 1 else np.full(cols, np.nan)
+            out[f"vol_{w}d"] = vol
+        tail = np.where(row <= last_row - drawdown_window, np.nan, p) if drawdown_window else p
+        peak = np.fmax.accumulate(tail, axis=0)
+        dd = 1.0 - tail / peak
+        worst = np.max(np.where(np.isnan(dd), -np.inf, dd), axis=0)
+        out["drawdown"] = np.where(np.isinf(worst), np.nan, worst)
+    return pd.DataFrame(out, index=pd.Index(tickers, name="ticker"))
+
+
+__all__ = ["PRICE_SCHEMA", "PriceStore", "batch_features", "rolling_volatility"]
@@ -1,16 +1,15 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List, Optional
-import os
+from typing import AsyncIterator, Dict, List, Optional
 
 from app.search.vector import InMemoryVectorStore, DocumentUpsert
+from app.search.aio import AsyncStore, as_async
+from app.search.dedup import NearDuplicateIndex
+from app.agents.fanout import RequestFetches
+from app.agents.http import HttpClients
 from app.agents.news import NewsAgent
-
-try:
-    import openai  # type: ignore
-except Exception:  # pragma: no cover
-    openai = None  # type: ignore
+from app.agents import llm
 
 
 SYSTEM_PROMPT = (
@@ -26,29 +25,70 @@ class QAAnswer:
     citations: List[Dict[str, str]]
 
 
+@dataclass
+class QAContext:
+    """Retrieved citations and the prompt built from them, before generation."""
+
+    citations: List[Dict[str, str]]
+    messages: List[Dict[str, str]]
+
+
 class QAAssistantAgent:
-    def __init__(self, vector_store: Optional[InMemoryVectorStore] = None, news_api_key: Optional[str] = None) -> None:
-        self.vs = vector_store or InMemoryVectorStore()
-        self.news = NewsAgent(api_key=news_api_key)
-        api_key = os.getenv("OPENAI_API_KEY")
-        if openai is None or not api_key:
+    def __init__(
+        self,
+        vector_store: Optional[AsyncStore | InMemoryVectorStore] = None,
+        news_api_key: Optional[str] = None,
+        near_dups: Optional[NearDuplicateIndex] = None,
+        http: Optional[HttpClients] = None,
+        client=None,
+    ) -> None:
+        self.vs = as_async(vector_store or InMemoryVectorStore())
+        self.news = NewsAgent(api_key=news_api_key, http=http)
+        self.near_dups = near_dups
+        # `client` (an openai.AsyncOpenAI) is shared across requests; one is created otherwise
+        self.client = client or llm.chat_client()
+        if self.client is None:
             raise RuntimeError("OPENAI_API_KEY is required for QAAssistantAgent")
-        self._client = openai.OpenAI(api_key=api_key)
-        self._model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
-    async def answer(self, question: str, org_id: Optional[int] = None, scope: Optional[List[str]] = None) -> QAAnswer:
+    async def context(
+        self,
+        question: str,
+        org_id: Optional[int] = None,
+        scope: Optional[List[str]] = None,
+        fetches: Optional[RequestFetches] = None,
+    ) -> QAContext:
+        """Citations and prompt for `question`; `fetches` shares agent calls already made in this request."""
         scope = [s.lower() for s in (scope or [])]
         # Retrieve first
-        results = self.vs.search(question, org_id=org_id, k=5)
+        results = await self.vs.search(question, org_id=org_id, k=5)
         citations: List[Dict[str, str]] = [
             {"id": str(r.get("id")), "title": r.get("title") or "", "url": r.get("url") or ""}
             for r in results
         ]
-        # Optionally fetch recent news and append citations
+        # Optionally fetch recent news and append citations, skipping near-duplicates of cited docs
+        nr = None
         if "news" in scope:
-            nr = await self.news.search(question)
-            for it in nr.items[:3]:
-                citations.append({"id": it.get("url", ""), "title": it.get("title", ""), "url": it.get("url", "")})
+            try:
+                if fetches is not None:
+                    nr = await fetches.get(("news", question), lambda: self.news.search(question))
+                else:
+                    nr = await self.news.search(question)
+            except Exception:
+                # Timed out or failed earlier in this request; answer from the index alone
+                nr = None
+        if nr is not None:
+            cited = {c["url"] for c in citations if c.get("url")}
+            added = 0
+            for it in nr.items:
+                url = it.get("url", "")
+                canon = self.near_dups.canonical_url(org_id, url) if (self.near_dups and url) else url
+                if canon and canon in cited:
+                    continue
+                cited.add(canon)
+                citations.append({"id": url, "title": it.get("title", ""), "url": url})
+                added += 1
+                if added >= 3:
+                    break
 
         # Build prompt with top citations
         cite_lines = "\n".join(
@@ -63,14 +103,25 @@ Sources (cite only from these):
 Write an answer HTML with strict citations using [id](url) after each factual claim.
 If info is insufficient, say you need more data.
 """
-        resp = self._client.chat.completions.create(
-            model=self._model,
-            temperature=0.2,
-            messages=[
-                {"role": "system", "content": SYSTEM_PROMPT},
-                {"role": "user", "content": user_prompt},
-            ],
-        )
-        html = resp.choices[0].message.content or ""
+        messages = [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt},
+        ]
+        return QAContext(citations=citations[:10], messages=messages)
+
+    async def answer(
+        self,
+        question: str,
+        org_id: Optional[int] = None,
+        scope: Optional[List[str]] = None,
+        fetches: Optional[RequestFetches] = None,
+    ) -> QAAnswer:
+        """Answer with citations; `fetches` shares agent calls already made in this request."""
+        ctx = await self.context(question, org_id=org_id, scope=scope, fetches=fetches)
+        html = await llm.complete(self.client, ctx.messages)
         lead = "Answer prepared with citations."
-        return QAAnswer(lead=lead, answer_html=html, citations=citations[:10])
+        return QAAnswer(lead=lead, answer_html=html, citations=ctx.citations)
+
+    def stream(self, ctx: QAContext) -> AsyncIterator[str]:
+        """Answer HTML for a prepared context, as it is generated."""
+        return llm.stream(self.client, ctx.messages)
@@ -0,0 +1,265 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Awaitable, Callable, Dict, Mapping, Optional
+
+import httpx
+from tenacity import AsyncRetrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+# Upstream overload/unavailability: retried, and (except 429) counted against the host's breaker
+RETRYABLE_STATUS = frozenset({429, 502, 503, 504})
+
+# (host, event): retry, short_circuit, rate_limited
+ResilienceObserver = Callable[[str, str], None]
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+
+
+class CircuitOpenError(httpx.HTTPError):
+    """The host's circuit is open; the request was not sent."""
+
+
+class RateLimitedError(httpx.HTTPError):
+    """The host's request queue is longer than the caller is allowed to wait."""
+
+
+class RetryableStatus(Exception):
+    def __init__(self, response: httpx.Response) -> None:
+        super().__init__(f"HTTP {response.status_code}")
+        self.response = response
+
+
+class TokenBucket:
+    """Async token bucket: `rate` requests/second with bursts of up to `burst`.
+
+    Callers reserve a token up front and sleep until it is due, so waiters are
+    served in arrival order. A caller that would wait longer than `max_wait`
+    seconds gets RateLimitedError instead of joining the queue.
+    """
+
+    def __init__(self, rate: float, burst: int = 10, max_wait: float = 2.0) -> None:
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_wait = max_wait
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self.waiting = 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        self._refill()
+        wait = (1.0 - self._tokens) / self.rate if self._tokens < 1.0 else 0.0
+        if wait > self.max_wait:
+            raise RateLimitedError(f"rate limit queue exceeds {self.max_wait:.1f}s")
+        self._tokens -= 1.0
+        if wait > 0:
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                self.waiting -= 1
+
+
+class CircuitBreaker:
+    """Opens after `failure_threshold` consecutive failures and fails fast for
+    `reset_timeout` seconds; then lets a single probe through (half-open), whose
+    outcome closes or re-opens the circuit."""
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+
+    def before(self) -> None:
+        if self.state == OPEN:
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError("circuit open")
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self._probing:
+                raise CircuitOpenError("circuit half-open; probe in flight")
+            self._probing = True
+
+    def release(self) -> None:
+        """Give back a half-open probe slot when the request ended without an outcome."""
+        self._probing = False
+
+    def success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def failure(self) -> None:
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self._opened_at = time.monotonic()
+        self._probing = False
+
+
+def _is_retryable(exc: BaseException) -> bool:
+    # A timed-out attempt already used the caller's whole per-request timeout; retrying
+    # it would multiply the wait by `attempts`
+    return isinstance(exc, RetryableStatus) or (
+        isinstance(exc, httpx.TransportError)
+        and not isinstance(exc, (CircuitOpenError, RateLimitedError, httpx.TimeoutException))
+    )
+
+
+class _RetryWait:
+    """Full-jitter exponential backoff, stretched to honor a 429's Retry-After (capped)."""
+
+    def __init__(self, multiplier: float, max_wait: float) -> None:
+        self.max_wait = max_wait
+        self._jitter = wait_random_exponential(multiplier=multiplier, max=max_wait)
+
+    def __call__(self, retry_state) -> float:
+        wait = self._jitter(retry_state)
+        exc = retry_state.outcome.exception() if retry_state.outcome else None
+        if isinstance(exc, RetryableStatus):
+            try:
+                wait = max(wait, min(float(exc.response.headers.get("retry-after", 0)), self.max_wait))
+            except ValueError:
+                pass
+        return wait
+
+
+class HostResilience:
+    """Per-host token buckets and circuit breakers plus jittered retries, shared by all agents.
+
+    `rates` overrides `default_rate` (requests/second) for specific hosts; a
+    rate of 0 disables limiting. Transport errors and 429/502/503/504 are
+    retried up to `attempts` times; the final retryable response is returned
+    to the caller as-is. Timeouts and other 5xx responses count as breaker
+    failures but are not retried. A 429 is the host pacing us, not failing, so it leaves the breaker
+    as it was.
+    """
+
+    def __init__(
+        self,
+        default_rate: float = 10.0,
+        burst: int = 10,
+        rates: Optional[Mapping[str, float]] = None,
+        max_queue_wait: float = 2.0,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        attempts: int = 3,
+        backoff: float = 0.2,
+        max_backoff: float = 5.0,
+        observer: Optional[ResilienceObserver] = None,
+    ) -> None:
+        self.default_rate = default_rate
+        self.burst = burst
+        self.rates = dict(rates or {})
+        self.max_queue_wait = max_queue_wait
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.attempts = max(1, attempts)
+        self._wait = _RetryWait(backoff, max_backoff)
+        self.observer = observer
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def _observe(self, host: str, event: str) -> None:
+        if self.observer is not None:
+            self.observer(host, event)
+
+    def bucket(self, host: str) -> TokenBucket:
+        b = self.buckets.get(host)
+        if b is None:
+            b = self.buckets[host] = TokenBucket(self.rates.get(host, self.default_rate), self.burst, self.max_queue_wait)
+        return b
+
+    def breaker(self, host: str) -> CircuitBreaker:
+        b = self.breakers.get(host)
+        if b is None:
+            b = self.breakers[host] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+        return b
+
+    async def call(self, host: str, send: Callable[[], Awaitable[httpx.Response]]) -> httpx.Response:
+        breaker, bucket = self.breaker(host), self.bucket(host)
+
+        def before_sleep(retry_state) -> None:
+            self._observe(host, "retry")
+
+        retrying = AsyncRetrying(
+            stop=stop_after_attempt(self.attempts),
+            wait=self._wait,
+            retry=retry_if_exception(_is_retryable),
+            before_sleep=before_sleep,
+            reraise=True,
+        )
+        previous: Optional[httpx.Response] = None
+        try:
+            async for attempt in retrying:
+                if previous is not None:
+                    # Release the retried response's connection (matters for streamed bodies)
+                    await previous.aclose()
+                    previous = None
+                with attempt:
+                    try:
+                        breaker.before()
+                    except CircuitOpenError:
+                        self._observe(host, "short_circuit")
+                        raise
+                    try:
+                        await bucket.acquire()
+                        resp = await send()
+                    except RateLimitedError:
+                        self._observe(host, "rate_limited")
+                        breaker.release()
+                        raise
+                    except httpx.TransportError:
+                        breaker.failure()
+                        raise
+                    except BaseException:
+                        # e.g. cancelled by a caller's deadline
+                        breaker.release()
+                        raise
+                    if resp.status_code in RETRYABLE_STATUS:
+                        if resp.status_code == 429:
+                            breaker.release()
+                        else:
+                            breaker.failure()
+                        previous = resp
+                        raise RetryableStatus(resp)
+                    # Other 5xx aren't worth retrying, but they are still the host failing
+                    if resp.status_code >= 500:
+                        breaker.failure()
+                    else:
+                        breaker.success()
+                    return resp
+        except RetryableStatus as e:
+            return e.response
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Per-host breaker state and rate-limit queue depth, for metrics."""
+        hosts = set(self.breakers) | set(self.buckets)
+        return {
+            h: {
+                "state": self.breakers[h].state if h in self.breakers else CLOSED,
+                "waiting": self.buckets[h].waiting if h in self.buckets else 0,
+            }
+            for h in hosts
+        }
+
+
+__all__ = [
+    "CircuitBreaker",
+    "CircuitOpenError",
+    "HostResilience",
+    "RETRYABLE_STATUS",
+    "RateLimitedError",
+    "TokenBucket",
+]
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Dict, List
+from typing import Dict, List, Optional
 
-import httpx
+from .http import HttpClients
+from .sanctions_index import SanctionsIndex, SanctionsMatch
 
 
 @dataclass
@@ -13,31 +14,41 @@ class SanctionFlag:
     score: float
     source_url: str
 
+    @classmethod
+    def from_match(cls, m: SanctionsMatch) -> "SanctionFlag":
+        return cls(name=m.entity.name, list=",".join(m.entity.datasets), score=m.score, source_url=m.entity.source_url)
+
 
 class SanctionsAgent:
+    def __init__(self, http: Optional[HttpClients] = None, index: Optional[SanctionsIndex] = None) -> None:
+        self.http = http or HttpClients(pooled=False)
+        # Offline mode: screen against a local bulk list instead of the match API
+        self.index = index
+
     async def check(self, name: str) -> List[SanctionFlag]:
         """Best-effort match against OpenSanctions. Returns empty on failure.
 
         This is a very light-touch MVP; production should use proper APIs and allowlists.
         """
+        if self.index is not None:
+            return [SanctionFlag.from_match(m) for m in self.index.screen(name)]
         url = "https://api.opensanctions.org/match/default"
         try:
-            async with httpx.AsyncClient(timeout=10.0) as client:
-                r = await client.post(url, json={"queries": [{"q": name}]})
-                if r.status_code != 200:
-                    return []
-                data = r.json()
-                out: List[SanctionFlag] = []
-                for res in data.get("responses", []):
-                    for m in res.get("matches", [])[:3]:
-                        out.append(
-                            SanctionFlag(
-                                name=m.get("entity", {}).get("name", ""),
-                                list=",".join(m.get("entity", {}).get("datasets", [])),
-                                score=float(m.get("score", 0.0)),
-                                source_url=m.get("entity", {}).get("first_seen", "https://opensanctions.org"),
-                            )
+            r = await self.http.post("sanctions", url, json={"queries": [{"q": name}]})
+            if r.status_code != 200:
+                return []
+            data = r.json()
+            out: List[SanctionFlag] = []
+            for res in data.get("responses", []):
+                for m in res.get("matches", [])[:3]:
+                    out.append(
+                        SanctionFlag(
+                            name=m.get("entity", {}).get("name", ""),
+                            list=",".join(m.get("entity", {}).get("datasets", [])),
+                            score=float(m.get("score", 0.0)),
+                            source_url=m.get("entity", {}).get("first_seen", "https://opensanctions.org"),
                         )
-                return out
+                    )
+            return out
         except Exception:
             return []
@@ -0,0 +1,339 @@
+from __future__ import annotations
+
+import csv
+import difflib
+import gzip
+import io
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from rapidfuzz import fuzz  # type: ignore
+except Exception:  # pragma: no cover
+    fuzz = None  # type: ignore
+
+# OpenSanctions "targets.simple.csv" and FollowTheMoney entity lines (optionally gzipped)
+LIST_SUFFIXES = (".csv", ".json", ".jsonl", ".ndjson")
+
+# FtM schemata that name a screenable party; other records (Sanction, Address, ...) are skipped
+_PARTY_SCHEMATA = frozenset({"Person", "Organization", "Company", "LegalEntity", "PublicBody", "Vessel", "Airplane"})
+_NAME_PROPS = ("name", "alias", "weakAlias", "previousName")
+
+_TOKEN = re.compile(r"[^\W_]+")
+# Dropped from names unless nothing else is left ("ACME Holdings Ltd" == "Acme Holdings")
+_LEGAL_FORMS = frozenset(
+    """
+    ltd limited llc inc incorporated corp corporation co company plc gmbh ag kg sa sas sarl srl spa bv nv oy ab
+    as asa pjsc ojsc cjsc jsc pao oao zao ooo llp lp pte pty
+    """.split()
+)
+
+
+def normalize_name(name: str) -> str:
+    """Accent-folded, lowercased tokens with punctuation and legal-form suffixes removed."""
+    folded = "".join(c for c in unicodedata.normalize("NFKD", name) if not unicodedata.combining(c)).lower()
+    tokens = _TOKEN.findall(folded)
+    kept = [t for t in tokens if t not in _LEGAL_FORMS]
+    return " ".join(kept or tokens)
+
+
+def name_grams(normalized: str) -> List[str]:
+    """Distinct padded character trigrams of each token (token order does not matter)."""
+    grams = set()
+    for tok in normalized.split():
+        padded = f" {tok} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return sorted(grams)
+
+
+def _ratio(a: str, b: str) -> float:
+    if fuzz is not None:
+        return fuzz.ratio(a, b) / 100.0
+    return difflib.SequenceMatcher(None, a, b, autojunk=False).ratio()
+
+
+def name_similarity(a: str, b: str) -> float:
+    """Fuzzy similarity of two normalized names in [0, 1].
+
+    The better of the token-sorted ratio and, when both names have at least two
+    tokens, the token-set ratio, so "putin vladimir" matches "vladimir
+    vladimirovich putin" while a lone "ali" does not match every "ali ...".
+    """
+    ta, tb = a.split(), b.split()
+    score = _ratio(" ".join(sorted(ta)), " ".join(sorted(tb)))
+    if min(len(ta), len(tb)) >= 2:
+        sa, sb = set(ta), set(tb)
+        common = " ".join(sorted(sa & sb))
+        if common:
+            ra = (common + " " + " ".join(sorted(sa - sb))).strip()
+            rb = (common + " " + " ".join(sorted(sb - sa))).strip()
+            score = max(score, _ratio(common, ra), _ratio(common, rb), _ratio(ra, rb))
+    return score
+
+
+@dataclass(frozen=True)
+class SanctionedEntity:
+    id: str
+    name: str
+    schema: str
+    datasets: Tuple[str, ...]
+    aliases: Tuple[str, ...] = ()
+    url: str = ""
+
+    @property
+    def source_url(self) -> str:
+        return self.url or f"https://www.opensanctions.org/entities/{self.id}/"
+
+
+@dataclass
+class SanctionsMatch:
+    entity: SanctionedEntity
+    matched_name: str
+    score: float
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.entity.id,
+            "name": self.entity.name,
+            "matched_name": self.matched_name,
+            "schema": self.entity.schema,
+            "datasets": list(self.entity.datasets),
+            "score": round(self.score, 4),
+            "source_url": self.entity.source_url,
+        }
+
+
+def _open_text(path: Path) -> io.TextIOBase:
+    if path.suffix == ".gz":
+        return io.TextIOWrapper(gzip.open(path, "rb"), encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _split_list(value: str) -> List[str]:
+    return [v.strip() for v in (value or "").split(";") if v.strip()]
+
+
+def _read_csv(fh) -> Iterator[SanctionedEntity]:
+    csv.field_size_limit(1 << 24)
+    for row in csv.DictReader(fh):
+        name = (row.get("name") or row.get("caption") or "").strip()
+        if not name or not row.get("id"):
+            continue
+        yield SanctionedEntity(
+            id=row["id"],
+            name=name,
+            schema=row.get("schema") or "",
+            datasets=tuple(_split_list(row.get("dataset") or row.get("datasets") or "")),
+            aliases=tuple(a for a in _split_list(row.get("aliases") or "") if a != name),
+        )
+
+
+def _read_ftm(fh) -> Iterator[SanctionedEntity]:
+    for line in fh:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError:
+            continue
+        if rec.get("schema") not in _PARTY_SCHEMATA or not rec.get("id"):
+            continue
+        props = rec.get("properties") or {}
+        names = [n for p in _NAME_PROPS for n in props.get(p, [])]
+        name = rec.get("caption") or (names[0] if names else "")
+        if not name:
+            continue
+        yield SanctionedEntity(
+            id=rec["id"],
+            name=name,
+            schema=rec["schema"],
+            datasets=tuple(rec.get("datasets") or ()),
+            aliases=tuple(dict.fromkeys(n for n in names if n != name)),
+            url=(props.get("sourceUrl") or [""])[0],
+        )
+
+
+def read_list_file(path: str | os.PathLike) -> Iterator[SanctionedEntity]:
+    """Entities from a bulk list file: simple CSV, or FtM JSON lines (`.gz` allowed)."""
+    path = Path(path)
+    base = path.with_suffix("") if path.suffix == ".gz" else path
+    reader = _read_csv if base.suffix == ".csv" else _read_ftm
+    with _open_text(path) as fh:
+        yield from reader(fh)
+
+
+class _Shard:
+    """Name index over one list file: exact normalized names plus a trigram blocking index."""
+
+    def __init__(self, entities: Iterable[SanctionedEntity]) -> None:
+        self.entities: List[SanctionedEntity] = []
+        self.names: List[str] = []  # normalized name variants
+        self.raw_names: List[str] = []
+        owners: List[int] = []
+        self.exact: Dict[str, List[int]] = {}
+        postings: Dict[str, List[int]] = {}
+        sizes: List[int] = []
+        for ent in entities:
+            eidx = len(self.entities)
+            self.entities.append(ent)
+            seen = set()
+            for raw in (ent.name, *ent.aliases):
+                norm = normalize_name(raw)
+                if not norm or norm in seen:
+                    continue
+                seen.add(norm)
+                nidx = len(self.names)
+                self.names.append(norm)
+                self.raw_names.append(raw)
+                owners.append(eidx)
+                self.exact.setdefault(norm, []).append(nidx)
+                grams = name_grams(norm)
+                sizes.append(len(grams))
+                for g in grams:
+                    postings.setdefault(g, []).append(nidx)
+        self.ids = frozenset(e.id for e in self.entities)
+        self.owner = np.asarray(owners, dtype=np.int32)
+        self.gram_counts = np.asarray(sizes, dtype=np.int32)
+        self.postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+
+    def candidates(self, norm: str, grams: Sequence[str], min_overlap: float, limit: int) -> np.ndarray:
+        """Name ids whose trigram Dice coefficient with the query is at least `min_overlap`, best first."""
+        lists = [self.postings[g] for g in grams if g in self.postings]
+        exact = self.exact.get(norm, [])
+        if not lists:
+            return np.asarray(exact, dtype=np.int32)
+        postings = np.concatenate(lists)
+        shared = np.bincount(postings, minlength=len(self.names))
+        # Dice >= t needs at least t*q/(2-t) shared grams (a name can't share more than it has),
+        # which drops most names that only share a common gram or two before any per-name work
+        need = math.ceil(min_overlap * len(grams) / (2.0 - min_overlap))
+        ids = np.unique(postings[shared[postings] >= need])
+        dice = 2.0 * shared[ids] / (len(grams) + self.gram_counts[ids])
+        keep = dice >= min_overlap
+        ids, dice = ids[keep], dice[keep]
+        if len(ids) > limit:
+            top = np.argpartition(-dice, limit - 1)[:limit]
+            ids, dice = ids[top], dice[top]
+        ids = ids[np.argsort(-dice, kind="stable")].astype(np.int32)
+        if exact:
+            ids = np.concatenate([np.asarray(exact, dtype=np.int32), ids[~np.isin(ids, exact)]])
+        return ids
+
+
+class SanctionsIndex:
+    """Offline sanctions screening over bulk list files in `directory`.
+
+    Each file becomes its own shard, so `reload()` only parses files that are
+    new or changed (by size and mtime) and drops shards whose file is gone;
+    readers keep using the previous shard set until the swap. Write new files
+    atomically (download, then rename into the directory): names starting with
+    "." or ending in ".tmp"/".part" are ignored.
+
+    Screening normalizes the name, blocks on character trigrams (Dice >=
+    `min_overlap`), re-scores the best `max_candidates` name variants with
+    `name_similarity` and keeps those scoring >= `threshold`. When the same
+    entity id appears in several files, the most recently modified one wins.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        threshold: float = 0.85,
+        max_candidates: int = 25,
+        min_overlap: float = 0.5,
+    ) -> None:
+        self.directory = Path(directory)
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.min_overlap = min_overlap
+        self._files: Dict[str, Tuple[int, int]] = {}
+        # Newest file first, for id precedence
+        self._shards: List[Tuple[str, _Shard]] = []
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return sum(len(s.entities) for _, s in self._shards)
+
+    @property
+    def files(self) -> List[str]:
+        return [name for name, _ in self._shards]
+
+    def _list_files(self) -> Dict[str, Tuple[int, int]]:
+        out: Dict[str, Tuple[int, int]] = {}
+        if not self.directory.is_dir():
+            return out
+        for p in self.directory.iterdir():
+            name = p.name
+            base = name[:-3] if name.endswith(".gz") else name
+            if name.startswith(".") or not base.endswith(LIST_SUFFIXES) or not p.is_file():
+                continue
+            st = p.stat()
+            out[name] = (st.st_mtime_ns, st.st_size)
+        return out
+
+    def reload(self) -> Dict[str, List[str]]:
+        """Pick up new, changed and removed list files. Returns the file names per change."""
+        with self._lock:
+            current = self._list_files()
+            shards = dict(self._shards)
+            changes: Dict[str, List[str]] = {"added": [], "updated": [], "removed": []}
+            for name in sorted(set(self._files) - set(current)):
+                shards.pop(name, None)
+                changes["removed"].append(name)
+            for name, sig in sorted(current.items()):
+                if self._files.get(name) == sig:
+                    continue
+                try:
+                    shards[name] = _Shard(read_list_file(self.directory / name))
+                except (OSError, UnicodeDecodeError, csv.Error):
+                    # Half-written or unreadable: keep the previous shard, retry next time
+                    current[name] = self._files.get(name, (0, 0))
+                    continue
+                changes["updated" if name in self._files else "added"].append(name)
+            self._files = current
+            self._shards = sorted(shards.items(), key=lambda kv: current[kv[0]][0], reverse=True)
+            return changes
+
+    def screen(self, name: str, limit: int = 3, threshold: Optional[float] = None) -> List[SanctionsMatch]:
+        """Best matches for `name`, at most one per entity, highest score first."""
+        threshold = self.threshold if threshold is None else threshold
+        norm = normalize_name(name)
+        if not norm:
+            return []
+        grams = name_grams(norm)
+        best: Dict[str, SanctionsMatch] = {}
+        shards = [s for _, s in self._shards]
+        for i, shard in enumerate(shards):
+            for nidx in shard.candidates(norm, grams, self.min_overlap, self.max_candidates).tolist():
+                ent = shard.entities[shard.owner[nidx]]
+                if any(ent.id in newer.ids for newer in shards[:i]):
+                    continue
+                score = 1.0 if shard.names[nidx] == norm else name_similarity(norm, shard.names[nidx])
+                if score >= threshold and (ent.id not in best or score > best[ent.id].score):
+                    best[ent.id] = SanctionsMatch(ent, shard.raw_names[nidx], score)
+        return sorted(best.values(), key=lambda m: (-m.score, m.entity.id))[:limit]
+
+    def screen_many(
+        self, names: Sequence[str], limit: int = 3, threshold: Optional[float] = None
+    ) -> List[List[SanctionsMatch]]:
+        return [self.screen(n, limit=limit, threshold=threshold) for n in names]
+
+
+__all__ = [
+    "SanctionedEntity",
+    "SanctionsIndex",
+    "SanctionsMatch",
+    "name_similarity",
+    "normalize_name",
+    "read_list_file",
+]
@@ -1,11 +1,16 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, List
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 
+from ..search.analysis import term_hash
+
 
 @dataclass
 class SocialResult:
@@ -13,18 +18,197 @@ class SocialResult:
     events: List[Dict[str, float]]
     online_component: float
     embeds: List[Dict[str, str]]
+    spikes: List[Dict[str, float]] = field(default_factory=list)
+
+
+@dataclass
+class SpikeEvent:
+    date: str
+    count: float
+    baseline: float
+    z: float
+
+    def to_dict(self) -> dict:
+        return {"date": self.date, "count": self.count, "baseline": round(self.baseline, 3), "z": round(self.z, 3)}
+
+
+class SignalState:
+    """Rolling state of one org's signal; every `update` is O(1).
+
+    Baseline mean and variance are exponentially weighted (`alpha`). Once
+    `warmup` observations are in, a value more than `threshold` standard
+    deviations above the baseline is a spike; it enters the baseline clipped at
+    that bound, so one burst does not mask the next. The last `window`
+    observations and their spike flags sit in ring buffers with a running spike
+    count, which gives the online component without rescanning. `simulated`
+    marks state filled by SocialAgent's simulation rather than real observations.
+    """
+
+    __slots__ = (
+        "alpha", "threshold", "warmup", "window", "mean", "var", "n", "last_date", "spikes", "rng", "simulated",
+        "_values", "_dates", "_flags", "_head", "_spike_count",
+    )
+
+    def __init__(
+        self,
+        alpha: float = 0.1,
+        threshold: float = 3.0,
+        window: int = 30,
+        warmup: int = 7,
+        max_spikes: int = 50,
+        rng: Optional[np.random.Generator] = None,
+    ) -> None:
+        self.alpha = alpha
+        self.threshold = threshold
+        self.warmup = warmup
+        self.window = max(1, window)
+        self.mean = 0.0
+        self.var = 0.0
+        self.n = 0
+        self.last_date: Optional[str] = None
+        self.spikes: Deque[SpikeEvent] = deque(maxlen=max_spikes)
+        # Per-org simulation stream (see SocialAgent); continues across scans
+        self.rng = rng
+        self.simulated = False
+        self._values = np.zeros(self.window)
+        self._dates: List[Optional[str]] = [None] * self.window
+        self._flags = np.zeros(self.window, dtype=bool)
+        self._head = 0
+        self._spike_count = 0
+
+    def update(self, value: float, date: str) -> Optional[SpikeEvent]:
+        std = math.sqrt(self.var)
+        z = (value - self.mean) / std if std > 0 else 0.0
+        spike = self.n >= self.warmup and z >= self.threshold
+        x = min(value, self.mean + self.threshold * std) if spike else value
+        if self.n == 0:
+            self.mean = x
+        else:
+            diff = x - self.mean
+            incr = self.alpha * diff
+            self.mean += incr
+            self.var = (1.0 - self.alpha) * (self.var + diff * incr)
+        self.n += 1
+
+        i = self._head
+        self._spike_count += int(spike) - int(self._flags[i])
+        self._values[i], self._dates[i], self._flags[i] = value, date, spike
+        self._head = (i + 1) % self.window
+        self.last_date = date
+        if not spike:
+            return None
+        event = SpikeEvent(date, float(value), self.mean, z)
+        self.spikes.append(event)
+        return event
+
+    @property
+    def filled(self) -> int:
+        return min(self.n, self.window)
+
+    @property
+    def spike_ratio(self) -> float:
+        return self._spike_count / self.filled if self.filled else 0.0
+
+    @property
+    def online_component(self) -> float:
+        return float(min(100.0, 10 + 80 * self.spike_ratio))
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, float]]:
+        """Buffered observations, oldest first."""
+        k = self.filled if limit is None else min(limit, self.filled)
+        idx = [(self._head - k + j) % self.window for j in range(k)]
+        return [{"date": self._dates[i], "count": float(self._values[i])} for i in idx]
+
+
+class SocialSignals:
+    """Per-org SignalState registry; states are created on first observation.
+
+    Observations are daily and arrive in date order. The first real one for an
+    org replaces any simulated state, so the two never share a baseline.
+    """
+
+    def __init__(
+        self,
+        alpha: float = 0.1,
+        threshold: float = 3.0,
+        window: int = 30,
+        warmup: int = 7,
+        seed: int = 0,
+    ) -> None:
+        self.alpha = alpha
+        self.threshold = threshold
+        self.window = window
+        self.warmup = warmup
+        self.seed = seed
+        self._states: Dict[str, SignalState] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._states
+
+    def _new_state(self, key: str) -> SignalState:
+        # Seeded from the key's stable hash: the same org replays the same simulated stream
+        rng = np.random.default_rng([self.seed, term_hash(key)])
+        return SignalState(self.alpha, self.threshold, self.window, self.warmup, rng=rng)
+
+    def state(self, key: str) -> SignalState:
+        st = self._states.get(key)
+        if st is None:
+            with self._lock:
+                st = self._states.get(key)
+                if st is None:
+                    st = self._states[key] = self._new_state(key)
+        return st
+
+    def observe(self, key: str, value: float, day: pd.Timestamp) -> Optional[SpikeEvent]:
+        """Feed one real daily value; raises ValueError for a day before the last observed one."""
+        day = _day(pd.Timestamp(day))
+        with self._lock:
+            st = self._states.get(key)
+            if st is None or st.simulated:
+                st = self._states[key] = self._new_state(key)
+            if st.last_date is not None and day < pd.Timestamp(st.last_date):
+                raise ValueError(f"{day.date()} is before the last observation ({st.last_date[:10]})")
+            return st.update(value, day.isoformat())
+
+
+def _day(ts: pd.Timestamp) -> pd.Timestamp:
+    """Midnight of `ts` as a naive UTC timestamp, so stored and requested dates compare."""
+    if ts.tzinfo is not None:
+        ts = ts.tz_convert("UTC").tz_localize(None)
+    return ts.normalize()
+
+
+def _simulate(rng: np.random.Generator, days: int) -> np.ndarray:
+    """Poisson mention counts with an occasional burst, drawn from the org's own generator."""
+    counts = rng.poisson(lam=10, size=days).astype(float)
+    bursts = rng.random(days) < 0.05
+    counts[bursts] += rng.integers(30, 80, size=int(bursts.sum()))
+    return counts
 
 
 class SocialAgent:
-    async def scan(self, query: str, days: int = 60) -> SocialResult:
-        # MVP: simulate a time series of mention counts with occasional spikes
-        idx = pd.date_range(end=pd.Timestamp.utcnow(), periods=days, freq="D")
-        base = np.random.poisson(lam=10, size=days)
-        # inject a couple spikes
-        for i in np.random.choice(range(days), size=min(3, max(1, days // 20)), replace=False):
-            base[i] += np.random.randint(30, 80)
-        events = [{"date": d.isoformat(), "count": int(c)} for d, c in zip(idx, base)]
-        spike_ratio = float(np.mean(base > (np.mean(base) + 2 * np.std(base))))
-        online_component = float(min(100.0, 10 + 80 * spike_ratio))
-        embeds = [{"id": f"social-{i}", "text": f"{query} social signal {e['count']}"} for i, e in enumerate(events[-5:])]
-        return SocialResult(query=query, events=events[-30:], online_component=online_component, embeds=embeds)
+    def __init__(self, signals: Optional[SocialSignals] = None) -> None:
+        self.signals = signals or SocialSignals()
+
+    async def scan(self, query: str, days: int = 60, now: Optional[pd.Timestamp] = None) -> SocialResult:
+        # MVP: simulated daily mention counts, for orgs without real observations.
+        # Only days after the last simulated one are generated and fed to the
+        # org's rolling state.
+        end = _day(now if now is not None else pd.Timestamp.now(tz="UTC"))
+        state = self.signals.state(query)
+        if state.n == 0 or state.simulated:
+            state.simulated = True
+            start = end - pd.Timedelta(days=days - 1)
+            if state.last_date is not None:
+                start = max(start, _day(pd.Timestamp(state.last_date)) + pd.Timedelta(days=1))
+            idx = pd.date_range(start=start, end=end, freq="D")
+            for d, c in zip(idx, _simulate(state.rng, len(idx))):
+                state.update(float(c), d.isoformat())
+        events = state.recent(30)
+        embeds = [{"id": f"social-{i}", "text": f"{query} social signal {e['count']:.0f}"} for i, e in enumerate(events[-5:])]
+        first = pd.Timestamp(events[0]["date"]) if events else None
+        spikes = [s.to_dict() for s in state.spikes if pd.Timestamp(s.date) >= first] if events else []
+        return SocialResult(
+            query=query, events=events, online_component=state.online_component, embeds=embeds, spikes=spikes
+        )
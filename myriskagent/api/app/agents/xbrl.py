@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import ijson  # type: ignore
+except Exception:  # pragma: no cover
+    ijson = None  # type: ignore
+
+# metric -> "taxonomy:Concept" candidates, most preferred first
+DEFAULT_CONCEPTS: Dict[str, Tuple[str, ...]] = {
+    "revenue": (
+        "us-gaap:Revenues",
+        "us-gaap:RevenueFromContractWithCustomerExcludingAssessedTax",
+        "us-gaap:SalesRevenueNet",
+        "ifrs-full:Revenue",
+    ),
+    "net_income": ("us-gaap:NetIncomeLoss", "ifrs-full:ProfitLoss"),
+    "operating_income": ("us-gaap:OperatingIncomeLoss", "ifrs-full:ProfitLossFromOperatingActivities"),
+    "assets": ("us-gaap:Assets", "ifrs-full:Assets"),
+    "assets_current": ("us-gaap:AssetsCurrent", "ifrs-full:CurrentAssets"),
+    "liabilities": ("us-gaap:Liabilities", "ifrs-full:Liabilities"),
+    "liabilities_current": ("us-gaap:LiabilitiesCurrent", "ifrs-full:CurrentLiabilities"),
+    "cash": ("us-gaap:CashAndCashEquivalentsAtCarryingValue", "ifrs-full:CashAndCashEquivalents"),
+    "equity": ("us-gaap:StockholdersEquity", "ifrs-full:Equity"),
+    "long_term_debt": ("us-gaap:LongTermDebtNoncurrent", "us-gaap:LongTermDebt", "ifrs-full:NoncurrentFinancialLiabilities"),
+}
+
+ANNUAL_FORMS = frozenset({"10-K", "10-K/A", "20-F", "20-F/A", "40-F", "40-F/A"})
+
+FACT_SCHEMA = pa.schema(
+    [
+        ("metric", pa.dictionary(pa.int16(), pa.string())),
+        ("taxonomy", pa.dictionary(pa.int16(), pa.string())),
+        ("concept", pa.dictionary(pa.int16(), pa.string())),
+        ("unit", pa.dictionary(pa.int16(), pa.string())),
+        ("start", pa.date32()),
+        ("end", pa.date32()),
+        ("val", pa.float64()),
+        ("fy", pa.int32()),
+        ("fp", pa.string()),
+        ("form", pa.string()),
+        ("filed", pa.date32()),
+        ("accn", pa.string()),
+        ("frame", pa.string()),
+    ]
+)
+_FIELDS = ("start", "end", "val", "fy", "fp", "form", "filed", "accn", "frame")
+
+
+def normalize_cik(value: str) -> str:
+    """EDGAR's 10-digit CIK for numeric input; anything else is passed through upper-cased."""
+    value = value.strip()
+    digits = value[3:] if value.upper().startswith("CIK") else value
+    return digits.zfill(10) if digits.isdigit() else value.upper()
+
+
+def _concept_index(concepts: Mapping[str, Sequence[str]]) -> Dict[str, Dict[str, str]]:
+    """taxonomy -> concept -> metric."""
+    out: Dict[str, Dict[str, str]] = {}
+    for metric, names in concepts.items():
+        for name in names:
+            taxonomy, _, concept = name.partition(":")
+            out.setdefault(taxonomy, {})[concept] = metric
+    return out
+
+
+def _iter_facts_streaming(fh, wanted: Dict[str, Dict[str, str]]) -> Iterator[Tuple[str, str, str, str, dict]]:
+    """(metric, taxonomy, concept, unit, fact) for wanted concepts, from parse events.
+
+    Only the current fact is ever materialized; concepts that are not wanted are
+    skipped at the event level.
+    """
+    taxonomy = concept = metric = unit = None
+    tax_prefix = units_prefix = item_prefix = None
+    row: Optional[dict] = None
+    for prefix, event, value in ijson.parse(fh, use_float=True):
+        if event == "map_key":
+            if prefix == "facts":
+                taxonomy, tax_prefix, metric = value, f"facts.{value}", None
+            elif prefix == tax_prefix:
+                concept = value
+                metric = wanted.get(taxonomy, {}).get(value)
+                units_prefix = f"{tax_prefix}.{value}.units"
+                item_prefix = None
+            elif metric is not None and prefix == units_prefix:
+                unit, item_prefix = value, f"{units_prefix}.{value}.item"
+            continue
+        if metric is None or item_prefix is None or not prefix.startswith(item_prefix):
+            continue
+        if prefix == item_prefix:
+            if event == "start_map":
+                row = {}
+            elif event == "end_map" and row is not None:
+                yield metric, taxonomy, concept, unit, row
+                row = None
+        elif row is not None:
+            row[prefix[len(item_prefix) + 1 :]] = value
+
+
+def _iter_facts_loaded(fh, wanted: Dict[str, Dict[str, str]]) -> Iterator[Tuple[str, str, str, str, dict]]:
+    # Fallback without ijson: the whole document is parsed into memory
+    data = json.load(fh)
+    for taxonomy, concepts in (data.get("facts") or {}).items():
+        for concept, body in concepts.items():
+            metric = wanted.get(taxonomy, {}).get(concept)
+            if metric is None:
+                continue
+            for unit, items in (body.get("units") or {}).items():
+                for item in items:
+                    yield metric, taxonomy, concept, unit, item
+
+
+def _entity_name(path: Path) -> str:
+    # entityName precedes "facts" in EDGAR's output; only the head of the file is read
+    with open(path, "rb") as fh:
+        m = re.search(rb'"entityName"\s*:\s*"((?:[^"\\]|\\.)*)"', fh.read(4096))
+    return json.loads(b'"' + m.group(1) + b'"') if m else ""
+
+
+class _ColumnBuffer:
+    def __init__(self) -> None:
+        self.cols: Dict[str, list] = {name: [] for name in FACT_SCHEMA.names}
+
+    def __len__(self) -> int:
+        return len(self.cols["val"])
+
+    def add(self, metric: str, taxonomy: str, concept: str, unit: str, fact: dict) -> None:
+        c = self.cols
+        c["metric"].append(metric)
+        c["taxonomy"].append(taxonomy)
+        c["concept"].append(concept)
+        c["unit"].append(unit)
+        for name in _FIELDS:
+            c[name].append(fact.get(name))
+
+    def table(self) -> pa.Table:
+        arrays = []
+        for field in FACT_SCHEMA:
+            values = self.cols[field.name]
+            if pa.types.is_date32(field.type):
+                arrays.append(pa.array(values, pa.string()).cast(pa.date32()))
+            elif field.name == "val":
+                arrays.append(pa.array([None if v is None else float(v) for v in values], pa.float64()))
+            elif field.name == "fy":
+                arrays.append(pa.array(values, pa.int32()))
+            elif pa.types.is_dictionary(field.type):
+                arrays.append(pa.array(values, pa.string()).dictionary_encode().cast(field.type))
+            else:
+                arrays.append(pa.array([None if v is None else str(v) for v in values], pa.string()))
+        return pa.Table.from_arrays(arrays, schema=FACT_SCHEMA)
+
+
+class FactStore:
+    """Per-company XBRL fact tables on disk: `<directory>/CIK<cik>.parquet`.
+
+    `ingest` extracts the `concepts` (metric -> "taxonomy:Concept" candidates,
+    see DEFAULT_CONCEPTS) from a downloaded EDGAR companyfacts document and
+    writes them as Parquet row groups of `batch_rows` facts. With ijson installed
+    the document is parsed as a stream, so memory stays bounded by one row group
+    however large the filer is; without it the document is loaded whole.
+
+    A JSON sidecar keeps the HTTP validators and fetch time, so refreshes are
+    conditional and skipped entirely within `max_age` seconds.
+    """
+
+    def __init__(
+        self,
+        directory: str | os.PathLike,
+        concepts: Optional[Mapping[str, Sequence[str]]] = None,
+        max_age: float = 24 * 3600.0,
+        batch_rows: int = 50_000,
+    ) -> None:
+        self.directory = Path(directory)
+        self.concepts = {k: tuple(v) for k, v in (concepts or DEFAULT_CONCEPTS).items()}
+        self._wanted = _concept_index(self.concepts)
+        self.max_age = max_age
+        self.batch_rows = batch_rows
+
+    def path(self, cik: str) -> Path:
+        return self.directory / f"CIK{normalize_cik(cik)}.parquet"
+
+    def _meta_path(self, cik: str) -> Path:
+        return self.path(cik).with_suffix(".json")
+
+    def has(self, cik: str) -> bool:
+        return self.path(cik).exists()
+
+    def meta(self, cik: str) -> dict:
+        try:
+            return json.loads(self._meta_path(cik).read_text())
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def is_fresh(self, cik: str, now: Optional[float] = None) -> bool:
+        fetched = self.meta(cik).get("fetched_at")
+        return self.has(cik) and fetched is not None and (now or time.time()) - fetched < self.max_age
+
+    def validators(self, cik: str) -> Dict[str, str]:
+        """Conditional-request headers for re-downloading this company's facts."""
+        if not self.has(cik):
+            return {}
+        meta, out = self.meta(cik), {}
+        if meta.get("etag"):
+            out["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            out["If-Modified-Since"] = meta["last_modified"]
+        return out
+
+    @staticmethod
+    @contextmanager
+    def _replacing(path: Path) -> Iterator[Path]:
+        """Yield a unique temp path beside `path`, moved over it when the block succeeds.
+
+        The API and the scheduler may refresh the same company at once; each
+        writes its own file, and the last rename wins.
+        """
+        fd, name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        os.close(fd)
+        tmp = Path(name)
+        try:
+            yield tmp
+            os.replace(tmp, path)
+        finally:
+            tmp.unlink(missing_ok=True)
+
+    def _write_meta(self, cik: str, meta: dict) -> None:
+        with self._replacing(self._meta_path(cik)) as tmp:
+            tmp.write_text(json.dumps(meta))
+
+    def touch(self, cik: str, headers: Optional[Mapping[str, str]] = None) -> None:
+        """Record a 304: the stored table is current as of now."""
+        meta = self.meta(cik)
+        meta["fetched_at"] = time.time()
+        for key, header in (("etag", "etag"), ("last_modified", "last-modified")):
+            if headers and headers.get(header):
+                meta[key] = headers[header]
+        self._write_meta(cik, meta)
+
+    def ingest(self, cik: str, source: str | os.PathLike, headers: Optional[Mapping[str, str]] = None) -> int:
+        """Extract facts from a companyfacts file into the company's table; returns the row count."""
+        source = Path(source)
+        path = self.path(cik)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rows = 0
+        buf = _ColumnBuffer()
+        with self._replacing(path) as tmp:
+            with open(source, "rb") as fh, pq.ParquetWriter(tmp, FACT_SCHEMA, compression="zstd") as writer:
+                facts = _iter_facts_streaming(fh, self._wanted) if ijson is not None else _iter_facts_loaded(fh, self._wanted)
+                for fact in facts:
+                    buf.add(*fact)
+                    if len(buf) >= self.batch_rows:
+                        writer.write_table(buf.table())
+                        rows += len(buf)
+                        buf = _ColumnBuffer()
+                if len(buf):
+                    writer.write_table(buf.table())
+                    rows += len(buf)
+        meta = {"cik": normalize_cik(cik), "entity_name": _entity_name(source), "rows": rows, "fetched_at": time.time()}
+        if headers:
+            meta["etag"] = headers.get("etag")
+            meta["last_modified"] = headers.get("last-modified")
+        self._write_meta(cik, meta)
+        return rows
+
+    def read(self, cik: str, metrics: Optional[Sequence[str]] = None) -> pd.DataFrame:
+        """The company's facts (optionally only `metrics`), or an empty frame if none are stored."""
+        if not self.has(cik):
+            return pd.DataFrame(columns=FACT_SCHEMA.names)
+        filters = [("metric", "in", list(metrics))] if metrics else None
+        df = pq.read_table(self.path(cik), filters=filters).to_pandas()
+        for col in ("metric", "taxonomy", "concept", "unit"):
+            df[col] = df[col].astype(str)
+        return df
+
+    def annual(self, cik: str) -> pd.DataFrame:
+        """Fiscal-year values per metric: rows indexed by period end, one column per metric."""
+        return annual_table(self.read(cik), self.concepts)
+
+
+def annual_table(facts: pd.DataFrame, concepts: Mapping[str, Sequence[str]] = DEFAULT_CONCEPTS) -> pd.DataFrame:
+    """Pivot annual-report facts to one value per (period end, metric).
+
+    Duration facts must span roughly a year (so quarterly figures repeated in a
+    10-K are dropped); restated values resolve to the latest filing, and when
+    several concepts map to a metric the most preferred one wins.
+    """
+    if facts.empty:
+        return pd.DataFrame()
+    df = facts[facts["form"].isin(ANNUAL_FORMS)].copy()
+    df["end"] = pd.to_datetime(df["end"])
+    start = pd.to_datetime(df["start"])
+    days = (df["end"] - start).dt.days
+    df = df[start.isna() | days.between(330, 400)]
+    if df.empty:
+        return pd.DataFrame()
+    rank = {(m, name.split(":", 1)[1]): i for m, names in concepts.items() for i, name in enumerate(names)}
+    df["rank"] = [rank.get(k, len(rank)) for k in zip(df["metric"], df["concept"])]
+    df = df.sort_values(["metric", "end", "rank", "filed"], ascending=[True, True, True, False])
+    df = df.drop_duplicates(["metric", "end"], keep="first")
+    return df.pivot(index="end", columns="metric", values="val").sort_index()
+
+
+def fundamental_features(annual: pd.DataFrame) -> Dict[str, float]:
+    """Balance-sheet and income ratios from the latest fiscal year (and growth vs the prior one)."""
+    if annual.empty:
+        return {}
+    latest = annual.iloc[-1]
+
+    def ratio(num: str, den: str) -> Optional[float]:
+        a, b = latest.get(num), latest.get(den)
+        if a is None or b is None or pd.isna(a) or pd.isna(b) or b == 0:
+            return None
+        return float(a / b)
+
+    out: Dict[str, float] = {}
+    for name, num, den in (
+        ("leverage", "liabilities", "assets"),
+        ("current_ratio", "assets_current", "liabilities_current"),
+        ("cash_to_liabilities", "cash", "liabilities_current"),
+        ("net_margin", "net_income", "revenue"),
+        ("debt_to_equity", "long_term_debt", "equity"),
+    ):
+        v = ratio(num, den)
+        if v is not None and np.isfinite(v):
+            out[name] = v
+    if "revenue" in annual:
+        rev = annual["revenue"].dropna()
+        if len(rev) >= 2 and rev.iloc[-2] != 0:
+            out["revenue_growth"] = float(rev.iloc[-1] / rev.iloc[-2] - 1.0)
+    return out
+
+
+__all__ = [
+    "DEFAULT_CONCEPTS",
+    "FACT_SCHEMA",
+    "FactStore",
+    "annual_table",
+    "fundamental_features",
+    "normalize_cik",
+]
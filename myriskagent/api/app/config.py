@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from functools import lru_cache
-from typing import Literal, Optional
+from typing import Dict, List, Literal, Optional
 from urllib.parse import quote_plus
 
 from pydantic import Field
@@ -25,7 +25,40 @@ class Settings(BaseSettings):
     redis_url: str = Field(default="redis://localhost:6379/0", alias="REDIS_URL")
 
     # Vectors
-    vector_backend: Literal["pgvector", "chroma"] = Field(default="pgvector", alias="VECTOR_BACKEND")
+    vector_backend: Literal["pgvector", "chroma", "ann", "memory"] = Field(default="pgvector", alias="VECTOR_BACKEND")
+    # auto: Postgres full-text search when VECTOR_BACKEND=pgvector, else the in-process BM25 index
+    keyword_backend: Literal["auto", "postgres", "memory"] = Field(default="auto", alias="KEYWORD_BACKEND")
+    vector_global_segment: bool = Field(default=False, alias="VECTOR_GLOBAL_SEGMENT")
+    vector_quantization: Literal["none", "int8", "pq"] = Field(default="none", alias="VECTOR_QUANTIZATION")
+    # Unset: 4 for int8, 32 for pq (PQ codes alone rank too coarsely for a shallow re-rank)
+    vector_rerank_factor: Optional[int] = Field(default=None, alias="VECTOR_RERANK_FACTOR")
+    vector_spill_dir: Optional[str] = Field(default=None, alias="VECTOR_SPILL_DIR")
+    # Search result cache (LRU + TTL, invalidated per org on upsert); size 0 disables
+    search_cache_size: int = Field(default=1024, alias="SEARCH_CACHE_SIZE")
+    search_cache_ttl_s: float = Field(default=300.0, alias="SEARCH_CACHE_TTL_S")
+    # Long documents are indexed as overlapping token chunks; 0 disables chunking
+    chunk_max_tokens: int = Field(default=512, alias="CHUNK_MAX_TOKENS")
+    chunk_overlap_tokens: int = Field(default=64, alias="CHUNK_OVERLAP_TOKENS")
+    embed_batch_size: int = Field(default=64, alias="EMBED_BATCH_SIZE")
+    hybrid_keyword_depth: int = Field(default=50, alias="HYBRID_KEYWORD_DEPTH")
+    hybrid_vector_depth: int = Field(default=50, alias="HYBRID_VECTOR_DEPTH")
+    hybrid_max_depth: int = Field(default=200, alias="HYBRID_MAX_DEPTH")
+    hybrid_rrf_k: int = Field(default=60, alias="HYBRID_RRF_K")
+    near_dup_threshold: float = Field(default=0.8, alias="NEAR_DUP_THRESHOLD")
+    # Search result snippets: UTF-8 byte cap per result, and the token window for query-biased snippets
+    snippet_max_bytes: int = Field(default=320, alias="SNIPPET_MAX_BYTES")
+    snippet_window_tokens: int = Field(default=32, alias="SNIPPET_WINDOW_TOKENS")
+    # Keyword catalog keeps at most this many documents per org (oldest ingest evicted); 0 = unbounded
+    catalog_retention_per_org: int = Field(default=100000, alias="CATALOG_RETENTION_PER_ORG")
+    # Shared text analyzer for BM25, hash embeddings and highlighting
+    analyzer_stopwords: bool = Field(default=False, alias="ANALYZER_STOPWORDS")
+    analyzer_stem: bool = Field(default=False, alias="ANALYZER_STEM")
+    ann_nlist: int = Field(default=64, alias="ANN_NLIST")
+    ann_nprobe: int = Field(default=8, alias="ANN_NPROBE")
+    ann_index_prefix: str = Field(default="vectors/ann", alias="ANN_INDEX_PREFIX")
+    # Snapshots of the in-memory store + keyword corpus (VECTOR_BACKEND=memory); 0 disables
+    search_snapshot_interval_s: int = Field(default=300, alias="SEARCH_SNAPSHOT_INTERVAL_S")
+    search_snapshot_prefix: str = Field(default="snapshots/search", alias="SEARCH_SNAPSHOT_PREFIX")
 
     # Object storage
     object_store_uri: str = Field(default="file:///data", alias="OBJECT_STORE_URI")
@@ -36,6 +69,64 @@ class Settings(BaseSettings):
     # External APIs
     newsapi_key: Optional[str] = Field(default=None, alias="NEWSAPI_KEY")
     alphavantage_key: Optional[str] = Field(default=None, alias="ALPHAVANTAGE_KEY")
+    # Pooled outbound HTTP for the agents: limits are per upstream host
+    http_max_connections_per_host: int = Field(default=10, alias="HTTP_MAX_CONNECTIONS_PER_HOST")
+    http_max_keepalive_per_host: int = Field(default=10, alias="HTTP_MAX_KEEPALIVE_PER_HOST")
+    http_keepalive_expiry_s: float = Field(default=30.0, alias="HTTP_KEEPALIVE_EXPIRY_S")
+    http_connect_timeout_s: float = Field(default=5.0, alias="HTTP_CONNECT_TIMEOUT_S")
+    http2: bool = Field(default=True, alias="HTTP2")
+    # Per-agent read timeouts overriding the defaults, e.g. {"news": 8, "filings": 30}
+    http_timeouts: Dict[str, float] = Field(default_factory=dict, alias="HTTP_TIMEOUTS")
+    # /ask fetches scoped sources concurrently; each gets this long (seconds) before it is skipped
+    ask_source_deadlines: Dict[str, float] = Field(default_factory=lambda: {"news": 4.0, "filings": 6.0}, alias="ASK_SOURCE_DEADLINES")
+    ask_default_deadline_s: float = Field(default=5.0, alias="ASK_DEFAULT_DEADLINE_S")
+    # Per-host rate limits (requests/second; HTTP_RATE_LIMITS overrides by host, 0 = unlimited),
+    # circuit breaking and jittered retries for the agents' outbound requests
+    http_rate_default: float = Field(default=10.0, alias="HTTP_RATE_DEFAULT")
+    http_rate_burst: int = Field(default=10, alias="HTTP_RATE_BURST")
+    http_rate_limits: Dict[str, float] = Field(default_factory=dict, alias="HTTP_RATE_LIMITS")
+    http_rate_max_wait_s: float = Field(default=2.0, alias="HTTP_RATE_MAX_WAIT_S")
+    http_breaker_failures: int = Field(default=5, alias="HTTP_BREAKER_FAILURES")
+    http_breaker_reset_s: float = Field(default=30.0, alias="HTTP_BREAKER_RESET_S")
+    http_retry_attempts: int = Field(default=3, alias="HTTP_RETRY_ATTEMPTS")
+    http_retry_max_wait_s: float = Field(default=5.0, alias="HTTP_RETRY_MAX_WAIT_S")
+    # Local daily price store (default: <tmp>/myriskagent-prices) and batch finance feature windows (days)
+    price_store_dir: Optional[str] = Field(default=None, alias="PRICE_STORE_DIR")
+    finance_return_windows: List[int] = Field(default_factory=lambda: [30], alias="FINANCE_RETURN_WINDOWS")
+    finance_vol_windows: List[int] = Field(default_factory=lambda: [30], alias="FINANCE_VOL_WINDOWS")
+    # 0 = drawdown over the full stored history
+    finance_drawdown_window: int = Field(default=0, alias="FINANCE_DRAWDOWN_WINDOW")
+    finance_fetch_concurrency: int = Field(default=8, alias="FINANCE_FETCH_CONCURRENCY")
+    # Ingestion scheduler (`python -m app.scheduler`): polls enabled sources every SCHEDULER_INTERVAL_S
+    # (or the source's params.interval_s) +/- SCHEDULER_JITTER, and posts new items to SCHEDULER_API_URL
+    scheduler_concurrency: int = Field(default=4, alias="SCHEDULER_CONCURRENCY")
+    scheduler_interval_s: float = Field(default=3600.0, alias="SCHEDULER_INTERVAL_S")
+    scheduler_jitter: float = Field(default=0.1, alias="SCHEDULER_JITTER")
+    scheduler_refresh_s: float = Field(default=60.0, alias="SCHEDULER_REFRESH_S")
+    scheduler_api_url: str = Field(default="http://localhost:8000", alias="SCHEDULER_API_URL")
+    # 0 disables the scheduler's own /metrics listener
+    scheduler_metrics_port: int = Field(default=9101, alias="SCHEDULER_METRICS_PORT")
+    # Social signal anomaly detection: EWMA baseline weight, spike z-score, rolling window and warmup
+    # (observations), and the base seed of the per-org simulated streams
+    social_ewma_alpha: float = Field(default=0.1, alias="SOCIAL_EWMA_ALPHA")
+    social_spike_z: float = Field(default=3.0, alias="SOCIAL_SPIKE_Z")
+    social_window: int = Field(default=30, alias="SOCIAL_WINDOW")
+    social_warmup: int = Field(default=7, alias="SOCIAL_WARMUP")
+    social_seed: int = Field(default=0, alias="SOCIAL_SEED")
+    # Offline sanctions screening: directory of bulk list files (OpenSanctions targets.simple.csv or
+    # FtM JSON lines), re-scanned for new/changed files every SANCTIONS_RELOAD_INTERVAL_S (0 = startup only)
+    sanctions_list_dir: Optional[str] = Field(default=None, alias="SANCTIONS_LIST_DIR")
+    sanctions_reload_interval_s: int = Field(default=60, alias="SANCTIONS_RELOAD_INTERVAL_S")
+    sanctions_match_threshold: float = Field(default=0.85, alias="SANCTIONS_MATCH_THRESHOLD")
+    # Per-company XBRL fact tables extracted from EDGAR companyfacts (default: <tmp>/myriskagent-xbrl)
+    xbrl_facts_dir: Optional[str] = Field(default=None, alias="XBRL_FACTS_DIR")
+    xbrl_facts_max_age_s: float = Field(default=86400.0, alias="XBRL_FACTS_MAX_AGE_S")
+    # On-disk cache of agent responses; AGENT_CACHE_MAX_MB=0 disables
+    agent_cache_dir: Optional[str] = Field(default=None, alias="AGENT_CACHE_DIR")
+    agent_cache_max_mb: int = Field(default=256, alias="AGENT_CACHE_MAX_MB")
+    agent_cache_swr_s: float = Field(default=300.0, alias="AGENT_CACHE_SWR_S")
+    # Per-agent TTLs in seconds overriding the defaults, e.g. {"news": 300}; 0 disables an agent
+    agent_cache_ttls: Dict[str, float] = Field(default_factory=dict, alias="AGENT_CACHE_TTLS")
 
     # LLMs
     openai_api_key: Optional[str] = Field(default=None, alias="OPENAI_API_KEY")
@@ -1,6 +1,6 @@
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date as date_type, datetime, timezone
 from typing import Optional
 
 from fastapi import Depends, FastAPI, UploadFile, File, HTTPException, Query, Request, Response
@@ -12,31 +12,53 @@ from pydantic import BaseModel
 from sqlmodel import SQLModel, create_engine, Session, select
 
 from .config import get_settings, Settings
-from .search.vector import InMemoryVectorStore, DocumentUpsert, PgVectorStore, ChromaVectorStore  # updated import
+from .search.vector import InMemoryVectorStore, DocumentUpsert, PgVectorStore, ChromaVectorStore, content_ref, document_key  # updated import
+from .search.ann import AnnVectorStore
+from .search.aio import AsyncPgVectorStore, AsyncStore, AsyncVectorStore, as_async
+from .search.fts import PostgresFTS
+from .search.cache import CorpusGenerations, QueryCache
+from .search.chunking import TokenChunker
+from .search.snapshot import SearchSnapshots
+from .search.dedup import NearDuplicateIndex
 from .agents.provider_outlier import ProviderOutlierAgent
-from .agents.narrator import NarratorAgent
+from .agents.narrator import NarratorAgent, parse_report
 from .agents.qa import QAAssistantAgent
 from .agents.evidence import EvidenceAgent
 from .storage.io import ObjectStore, build_evidence_zip_bytes
-from .risk.engine import compute_family_scores, combine_scores  # NEW: use engine
+from .risk.engine import compute_family_scores, combine_scores, financial_health_from_facts  # NEW: use engine
 from .agents.news import NewsAgent
 from .agents.filings import FilingsAgent
+from .agents.finance import FinanceAgent
+from .agents.xbrl import FactStore
+from .agents.prices import PriceStore
 from .agents.sanctions import SanctionsAgent
-from .search.keyword import bm25_score
+from .agents.sanctions_index import SanctionsIndex
+from .search.keyword import InvertedIndex
+from .search.catalog import DocumentCatalog
+from .search.snippets import cap_bytes, lead_snippet, query_snippet
+from .search.analysis import ENGLISH_STOPWORDS, AnalyzedText, Analyzer, default_analyzer, set_default_analyzer
+from .search.fusion import reciprocal_rank_fusion
 from .telemetry import init_tracing, get_tracer
 from .risk.explain import explain_scores
-from .agents.social import SocialAgent
-from .models import ProviderAggregate as DBAgg, ProviderOutlier as DBOut
+from .agents.social import SocialAgent, SocialSignals
+from .agents.http import HttpClients
+from .agents.cache import ResponseCache
+from .agents.fanout import RequestFetches, fan_out
+from .agents.resilience import HostResilience
+from .models import Org as DBOrg, ProviderAggregate as DBAgg, ProviderOutlier as DBOut, Source as DBSource
 
 # Prometheus
-from prometheus_client import Counter, Histogram, generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
 
 # Data
 import io
 import pandas as pd
 import numpy as np
 import asyncio
+import json
 import os
+import tempfile
+import time
 
 
 app = FastAPI(title="MyRiskAgent API", version="0.1.0")
@@ -55,12 +77,39 @@ app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 
 # Simple vector store (configured at startup)
-VECTOR_STORE: InMemoryVectorStore | PgVectorStore | None = None
+VECTOR_STORE: InMemoryVectorStore | PgVectorStore | ChromaVectorStore | AnnVectorStore | None = None
+# Awaitable interface over VECTOR_STORE used by request handlers
+ASYNC_STORE: Optional[AsyncStore] = None
 
 # Basic request counter
 REQUEST_COUNTER = Counter("mra_requests_total", "Total HTTP requests", ["path", "method", "status"])
 REQUEST_LATENCY = Histogram("mra_request_latency_seconds", "Request latency in seconds", ["path", "method"])
 REQUEST_ERRORS = Counter("mra_requests_errors_total", "HTTP 5xx error responses", ["path", "method", "status"])
+NEAR_DUPS_SUPPRESSED = Counter("mra_near_duplicates_suppressed_total", "Near-duplicate documents skipped at ingest")
+SEARCH_CACHE_REQUESTS = Counter("mra_search_cache_requests_total", "Search result cache lookups", ["endpoint", "result"])
+SEARCH_CACHE_SAVED = Counter("mra_search_cache_saved_seconds_total", "Compute time avoided by search cache hits", ["endpoint"])
+SEARCH_CACHE_HIT_RATIO = Gauge("mra_search_cache_hit_ratio", "Search result cache hit ratio since startup")
+HTTP_CLIENT_REQUESTS = Counter(
+    "mra_http_client_requests_total", "Outbound agent requests by whether a pooled connection was reused", ["host", "connection"]
+)
+AGENT_CACHE_REQUESTS = Counter(
+    "mra_agent_cache_requests_total", "Agent response cache outcomes (hit, stale, revalidated, miss, stale-error)", ["agent", "outcome"]
+)
+HTTP_CLIENT_EVENTS = Counter(
+    "mra_http_client_events_total", "Outbound retries, circuit short-circuits and rate-limit rejections", ["host", "event"]
+)
+HTTP_CIRCUIT_STATE = Gauge("mra_http_circuit_state", "Circuit breaker state per upstream host (0 closed, 1 half-open, 2 open)", ["host"])
+HTTP_RATE_QUEUE = Gauge("mra_http_rate_limit_queue_depth", "Requests waiting on a host's rate limiter", ["host"])
+SANCTIONS_ENTITIES = Gauge("mra_sanctions_index_entities", "Entities in the local sanctions list index")
+SANCTIONS_SCREENED = Counter("mra_sanctions_screened_total", "Names screened against the local sanctions index", ["result"])
+HTTP_CLIENT_CONNECT = Histogram("mra_http_client_connect_seconds", "TCP + TLS setup time for new outbound connections", ["host"])
+# Request start to the first generated token sent on an SSE endpoint (REQUEST_LATENCY only covers the headers there)
+STREAM_TTFB = Histogram(
+    "mra_stream_ttfb_seconds",
+    "Time to the first generated token on streaming endpoints",
+    ["endpoint"],
+    buckets=(0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0),
+)
 
 # Agents configured at startup
 NARRATOR: Optional[NarratorAgent] = None
@@ -69,8 +118,32 @@ EVIDENCE: Optional[EvidenceAgent] = None
 # In-memory claims store for MVP
 CLAIMS_BY_ORG: dict[int, pd.DataFrame] = {}
 
-# In-memory documents for keyword search (MVP)
-DOCS: list[dict] = []
+# In-memory documents for keyword search: by id, by key and per-org recency
+CATALOG = DocumentCatalog()
+# Per-org counters bumped on every ingest: part of search cache keys, and snapshots
+# are skipped when the total has not moved
+GENERATIONS = CorpusGenerations()
+# Search result cache (configured at startup; None when SEARCH_CACHE_SIZE=0)
+SEARCH_CACHE: Optional[QueryCache] = None
+# Pooled HTTP clients shared by the external-data agents (created at startup)
+HTTP_CLIENTS: Optional[HttpClients] = None
+# Per-company XBRL fact tables written by FilingsAgent, read by finance features and risk scoring
+FACT_STORE: Optional[FactStore] = None
+# Daily closes appended by FinanceAgent, read back as a wide matrix for batch features
+PRICE_STORE: Optional[PriceStore] = None
+# Local sanctions list index (SANCTIONS_LIST_DIR; None screens via the remote match API)
+SANCTIONS_INDEX: Optional[SanctionsIndex] = None
+# Per-org rolling social signal state (EWMA baseline + recent window); reconfigured at startup
+SOCIAL_SIGNALS = SocialSignals()
+# BM25 inverted index over title + content of CATALOG records
+KEYWORD_INDEX = InvertedIndex()
+# id -> analyzed content, kept for highlighting (process-local; rebuilt on restore)
+DOC_TOKENS: dict[int, AnalyzedText] = {}
+# Postgres full-text backend over the document table (set at startup, see KEYWORD_BACKEND)
+KEYWORD_FTS: Optional[PostgresFTS] = None
+
+# Near-duplicate clustering applied before embedding (None when disabled)
+NEAR_DUPS: Optional[NearDuplicateIndex] = None
 
 VERSION = "0.1.0"
 
@@ -114,44 +187,223 @@ def get_engine(settings: Settings = Depends(get_settings)):
     return engine
 
 
-async def _scheduler_loop():
+def _upsert_keyword_docs(docs: list[DocumentUpsert]) -> list[dict]:
+    """Mirror documents into the keyword catalog and index, replacing entries with the same key.
+
+    Returns the records evicted by the catalog's per-org retention, already
+    dropped from the keyword index.
+    """
+    evicted: list[dict] = []
+    for d in docs:
+        rec, dropped = CATALOG.upsert(d)
+        _drop_keyword_docs(dropped)
+        evicted.extend(dropped)
+        _index_keyword_doc(rec, d.tokens)
+    return evicted
+
+
+def _drop_keyword_docs(records: list[dict]) -> None:
+    for rec in records:
+        KEYWORD_INDEX.remove(rec["id"])
+        DOC_TOKENS.pop(rec["id"], None)
+
+
+async def _evict_documents(records: list[dict]) -> None:
+    """Delete catalog records past retention from the vector store and near-duplicate index too.
+
+    The near-duplicates an evicted document suppressed are dropped with it: they
+    are as old as their cluster, so re-ingesting them would outlive retention.
+    """
+    if not records:
+        return
+    docs = [
+        DocumentUpsert(id=None, org_id=r["org_id"], title=r.get("title"), url=r.get("url"), content=r.get("content") or "")
+        for r in records
+    ]
+    if NEAR_DUPS is not None:
+        for d in docs:
+            NEAR_DUPS.remove(document_key(d))
+    if ASYNC_STORE is not None:
+        await ASYNC_STORE.delete_documents(docs)
+
+
+def _index_keyword_doc(rec: dict, tokens: Optional[AnalyzedText] = None) -> None:
+    analyzer = default_analyzer()
+    if tokens is None:
+        tokens = analyzer.analyze(rec.get("content") or "")
+    DOC_TOKENS[rec["id"]] = tokens
+    title_ids = analyzer.analyze(rec.get("title") or "").ids
+    KEYWORD_INDEX.add_tokens(rec["id"], rec["org_id"], np.concatenate([title_ids, tokens.ids]))
+
+
+async def _ingest_documents(docs: list[DocumentUpsert]) -> int:
+    """Upsert into the vector store and the keyword corpus; idempotent per (org_id, url).
+
+    Near-duplicates of an already indexed document are not embedded; their URLs
+    are kept as alternates of the canonical copy.
+    """
+    if ASYNC_STORE is None or not docs:
+        return 0
+    orgs = [d.org_id for d in docs]
+    try:
+        if NEAR_DUPS is not None:
+            before = NEAR_DUPS.suppressed
+            docs = NEAR_DUPS.filter(docs)
+            NEAR_DUPS_SUPPRESSED.inc(NEAR_DUPS.suppressed - before)
+            if not docs:
+                return 0
+        # Analyze once; the keyword index and the hashing embedder reuse the token arrays
+        analyzer = default_analyzer()
+        for d in docs:
+            if d.tokens is None:
+                d.tokens = analyzer.analyze(d.content)
+        count = await ASYNC_STORE.upsert_documents(docs)
+        await _evict_documents(_upsert_keyword_docs(docs))
+        return count
+    finally:
+        # Also bumped when only alternates changed, since results carry alternate_urls
+        GENERATIONS.bump(orgs)
+
+
+def _snapshots(settings: Settings) -> SearchSnapshots:
+    return SearchSnapshots(ObjectStore(base_uri=settings.object_store_uri), settings.search_snapshot_prefix)
+
+
+def _restore_keyword_docs(records: list[dict]) -> None:
+    CATALOG.restore(records)
+    for rec in CATALOG:
+        _index_keyword_doc(rec)
+
+
+_SNAPSHOT_GENERATION = 0
+# The shutdown write can overlap a periodic one; they run one at a time so an older
+# capture never lands after a newer one
+_SNAPSHOT_LOCK = asyncio.Lock()
+
+
+async def _write_snapshot() -> None:
+    """Snapshot the in-memory store and keyword corpus if they changed since the last one."""
+    global _SNAPSHOT_GENERATION
+    async with _SNAPSHOT_LOCK:
+        if not isinstance(VECTOR_STORE, InMemoryVectorStore) or GENERATIONS.total == _SNAPSHOT_GENERATION:
+            return
+        generation = GENERATIONS.total
+        snaps = _snapshots(get_settings())
+        # Loop-owned state is copied here; the store is copied between its own calls, in
+        # a worker thread (quantized segments read their spill file), then written
+        keyword_docs = list(CATALOG)
+        near_dups = NEAR_DUPS.to_dict() if NEAR_DUPS is not None else None
+        state = await ASYNC_STORE.run(snaps.capture, VECTOR_STORE, keyword_docs, near_dups)
+        await asyncio.to_thread(snaps.write, state)
+        _SNAPSHOT_GENERATION = generation
+
+
+async def _snapshot_loop(interval_s: int):
     while True:
+        await asyncio.sleep(interval_s)
         try:
-            # Fetch recent news for default org context and upsert
-            agent = NewsAgent(api_key=get_settings().newsapi_key)
-            res = await agent.search("ACME")
-            if VECTOR_STORE is not None:
-                docs = [
-                    DocumentUpsert(id=None, org_id=1, title=it.get("text"), url=it.get("id"), content=it.get("text", ""))
-                    for it in res.embeds
-                ]
-                if docs:
-                    VECTOR_STORE.upsert_documents(docs)
-                    # mirror to in-memory DOCS for keyword search
-                    for it in res.embeds:
-                        DOCS.append({
-                            "id": len(DOCS) + 1,
-                            "org_id": 1,
-                            "title": it.get("text"),
-                            "url": it.get("id"),
-                            "content": it.get("text", ""),
-                        })
+            await _write_snapshot()
         except Exception:
-            # Best-effort scheduler; ignore errors
+            # Best-effort; the next interval retries
             pass
-        # Sleep for 1 hour
-        await asyncio.sleep(3600)
+
+
+async def _reload_sanctions() -> None:
+    if SANCTIONS_INDEX is None:
+        return
+    # Parsing and indexing a list file is CPU-bound; keep it off the event loop
+    await asyncio.to_thread(SANCTIONS_INDEX.reload)
+    SANCTIONS_ENTITIES.set(len(SANCTIONS_INDEX))
+
+
+async def _sanctions_reload_loop(interval_s: int):
+    while True:
+        await asyncio.sleep(interval_s)
+        try:
+            await _reload_sanctions()
+        except Exception:
+            # Best-effort; the previous lists stay loaded
+            pass
+
+
+def _in_memory_store(settings: Settings) -> InMemoryVectorStore:
+    return InMemoryVectorStore(
+        global_segment=settings.vector_global_segment,
+        quantization=settings.vector_quantization,
+        rerank_factor=settings.vector_rerank_factor,
+        spill_dir=settings.vector_spill_dir,
+    )
+
+
+def _observe_http_request(host: str, reused: bool, connect_s: float) -> None:
+    HTTP_CLIENT_REQUESTS.labels(host=host, connection="reused" if reused else "new").inc()
+    if not reused:
+        HTTP_CLIENT_CONNECT.labels(host=host).observe(connect_s)
+
+
+def _observe_agent_cache(agent: str, outcome: str) -> None:
+    AGENT_CACHE_REQUESTS.labels(agent=agent, outcome=outcome).inc()
+
+
+def _observe_http_event(host: str, event: str) -> None:
+    HTTP_CLIENT_EVENTS.labels(host=host, event=event).inc()
+
+
+_CIRCUIT_STATES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+def _refresh_http_gauges() -> None:
+    if HTTP_CLIENTS is None or HTTP_CLIENTS.resilience is None:
+        return
+    for host, st in HTTP_CLIENTS.resilience.snapshot().items():
+        HTTP_CIRCUIT_STATE.labels(host=host).set(_CIRCUIT_STATES[st["state"]])
+        HTTP_RATE_QUEUE.labels(host=host).set(st["waiting"])
+
+
+def _agent_cache(settings: Settings) -> Optional[ResponseCache]:
+    if settings.agent_cache_max_mb <= 0:
+        return None
+    directory = settings.agent_cache_dir or os.path.join(tempfile.gettempdir(), "myriskagent-agent-cache")
+    return ResponseCache(
+        directory,
+        max_bytes=settings.agent_cache_max_mb * 1024 * 1024,
+        ttls=settings.agent_cache_ttls,
+        stale_while_revalidate=settings.agent_cache_swr_s,
+    )
 
 
 @app.on_event("startup")
 async def startup_event():
-    global NARRATOR, EVIDENCE, VECTOR_STORE, DOCS
+    global HTTP_CLIENTS, FACT_STORE, PRICE_STORE, SANCTIONS_INDEX, SOCIAL_SIGNALS, NARRATOR, EVIDENCE, VECTOR_STORE, ASYNC_STORE, CATALOG, KEYWORD_INDEX, KEYWORD_FTS, NEAR_DUPS, SEARCH_CACHE, _SNAPSHOT_GENERATION
     settings = get_settings()
 
     # Initialize tracing if configured
     init_tracing("myriskagent-api", settings.otel_exporter_otlp_endpoint)
     tracer = get_tracer("startup")
 
+    HTTP_CLIENTS = HttpClients(
+        max_connections_per_host=settings.http_max_connections_per_host,
+        max_keepalive_per_host=settings.http_max_keepalive_per_host,
+        keepalive_expiry=settings.http_keepalive_expiry_s,
+        connect_timeout=settings.http_connect_timeout_s,
+        http2=settings.http2,
+        timeouts=settings.http_timeouts,
+        observer=_observe_http_request,
+        cache=_agent_cache(settings),
+        cache_observer=_observe_agent_cache,
+        resilience=HostResilience(
+            default_rate=settings.http_rate_default,
+            burst=settings.http_rate_burst,
+            rates=settings.http_rate_limits,
+            max_queue_wait=settings.http_rate_max_wait_s,
+            failure_threshold=settings.http_breaker_failures,
+            reset_timeout=settings.http_breaker_reset_s,
+            attempts=settings.http_retry_attempts,
+            max_backoff=settings.http_retry_max_wait_s,
+            observer=_observe_http_event,
+        ),
+    )
+
     engine = create_engine(settings.sqlalchemy_database_uri, echo=False)
     try:
         SQLModel.metadata.create_all(engine)
@@ -171,31 +423,123 @@ async def startup_event():
                 VECTOR_STORE = PgVectorStore(settings.sqlalchemy_database_uri)
             elif settings.vector_backend == "chroma":
                 VECTOR_STORE = ChromaVectorStore(persist_dir=os.getenv("CHROMA_PERSIST_DIR"))
+            elif settings.vector_backend == "ann":
+                VECTOR_STORE = AnnVectorStore.load(
+                    ObjectStore(base_uri=settings.object_store_uri),
+                    settings.ann_index_prefix,
+                    nlist=settings.ann_nlist,
+                    nprobe=settings.ann_nprobe,
+                )
             else:
-                VECTOR_STORE = InMemoryVectorStore()
+                VECTOR_STORE = _in_memory_store(settings)
         except Exception:
-            VECTOR_STORE = InMemoryVectorStore()
+            VECTOR_STORE = _in_memory_store(settings)
+        chunker = (
+            TokenChunker(max_tokens=settings.chunk_max_tokens, overlap=settings.chunk_overlap_tokens)
+            if settings.chunk_max_tokens > 0
+            else None
+        )
+        ASYNC_STORE = as_async(VECTOR_STORE, settings.sqlalchemy_database_uri, chunker=chunker, batch_size=settings.embed_batch_size)
+
+    if settings.keyword_backend == "postgres" or (settings.keyword_backend == "auto" and isinstance(VECTOR_STORE, PgVectorStore)):
+        if isinstance(ASYNC_STORE, AsyncPgVectorStore):
+            KEYWORD_FTS = PostgresFTS(ASYNC_STORE.engine, snippet_max_bytes=settings.snippet_max_bytes)
+        elif isinstance(VECTOR_STORE, PgVectorStore):
+            KEYWORD_FTS = PostgresFTS(VECTOR_STORE.engine, snippet_max_bytes=settings.snippet_max_bytes)
+        else:
+            KEYWORD_FTS = PostgresFTS(engine, snippet_max_bytes=settings.snippet_max_bytes)
+
+    set_default_analyzer(
+        Analyzer(stopwords=ENGLISH_STOPWORDS if settings.analyzer_stopwords else None, stem=settings.analyzer_stem)
+    )
+    NEAR_DUPS = NearDuplicateIndex(threshold=settings.near_dup_threshold) if settings.near_dup_threshold > 0 else None
+    SEARCH_CACHE = QueryCache(settings.search_cache_size, settings.search_cache_ttl_s) if settings.search_cache_size > 0 else None
 
     with tracer.start_as_current_span("seed_documents"):
         seed_docs = [
             {"id": 1, "org_id": 1, "title": "ACME Q4 Results", "url": "https://example.com/acme-q4", "content": "ACME reported steady margins and lower debt."},
             {"id": 2, "org_id": 1, "title": "ACME Litigation Update", "url": "https://example.com/acme-litigation", "content": "A minor litigation was settled with no material impact."},
         ]
-        DOCS = seed_docs.copy()
-        if VECTOR_STORE is not None:
-            VECTOR_STORE.upsert_documents([
-                DocumentUpsert(id=None, org_id=d["org_id"], title=d["title"], url=d["url"], content=d["content"]) for d in seed_docs
-            ])
+        CATALOG = DocumentCatalog(retention_per_org=settings.catalog_retention_per_org)
+        DOC_TOKENS.clear()
+        KEYWORD_INDEX = InvertedIndex()
+        if isinstance(VECTOR_STORE, InMemoryVectorStore):
+            # Segments are memory-mapped on first query; no re-embedding
+            with tracer.start_as_current_span("restore_snapshot"):
+                try:
+                    restored = _snapshots(settings).restore(VECTOR_STORE, NEAR_DUPS)
+                except Exception:
+                    restored = None
+                if restored is not None:
+                    _restore_keyword_docs(restored)
+        else:
+            restored = None
+        await _ingest_documents([
+            DocumentUpsert(id=None, org_id=d["org_id"], title=d["title"], url=d["url"], content=d["content"]) for d in seed_docs
+        ])
+        if restored is not None:
+            # Seeds are already in the snapshot; don't rewrite it on the first interval
+            _SNAPSHOT_GENERATION = GENERATIONS.total
 
     # Agents
     NARRATOR = NarratorAgent(openai_api_key=settings.openai_api_key)
     EVIDENCE = EvidenceAgent(store=ObjectStore(base_uri=settings.object_store_uri))
 
-    asyncio.create_task(_scheduler_loop())
+    FACT_STORE = FactStore(
+        settings.xbrl_facts_dir or os.path.join(tempfile.gettempdir(), "myriskagent-xbrl"),
+        max_age=settings.xbrl_facts_max_age_s,
+    )
+
+    PRICE_STORE = PriceStore(settings.price_store_dir or os.path.join(tempfile.gettempdir(), "myriskagent-prices"))
+
+    SOCIAL_SIGNALS = SocialSignals(
+        alpha=settings.social_ewma_alpha,
+        threshold=settings.social_spike_z,
+        window=settings.social_window,
+        warmup=settings.social_warmup,
+        seed=settings.social_seed,
+    )
+
+    if settings.sanctions_list_dir:
+        SANCTIONS_INDEX = SanctionsIndex(settings.sanctions_list_dir, threshold=settings.sanctions_match_threshold)
+        try:
+            await _reload_sanctions()
+        except Exception:
+            pass
+        if settings.sanctions_reload_interval_s > 0:
+            asyncio.create_task(_sanctions_reload_loop(settings.sanctions_reload_interval_s))
+
+    if settings.search_snapshot_interval_s > 0:
+        asyncio.create_task(_snapshot_loop(settings.search_snapshot_interval_s))
+
+
+async def _persist_vector_store() -> None:
+    """Save file-backed vector indexes to the object store (no-op for other backends).
+
+    Serializing and uploading the index runs in a worker thread, between store calls.
+    """
+    if isinstance(VECTOR_STORE, AnnVectorStore) and isinstance(ASYNC_STORE, AsyncVectorStore):
+        settings = get_settings()
+        await ASYNC_STORE.run(VECTOR_STORE.save, ObjectStore(base_uri=settings.object_store_uri), settings.ann_index_prefix)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    try:
+        await _persist_vector_store()
+        await _write_snapshot()
+    except Exception:
+        # Persisting is best-effort; the index is rebuilt from sources if missing
+        pass
+    if ASYNC_STORE is not None:
+        await ASYNC_STORE.aclose()
+    if HTTP_CLIENTS is not None:
+        await HTTP_CLIENTS.aclose()
 
 
 @app.get("/metrics")
 async def metrics():
+    _refresh_http_gauges()
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
@@ -278,13 +622,76 @@ async def ingest_claims(file: UploadFile = File(...), org_id: int = Query(1)):
     return {"org_id": org_id, "received_rows": int(len(df)), "outliers": outliers}
 
 
+def _register_source(req: IngestExternalRequest) -> Optional[int]:
+    try:
+        engine = create_engine(get_settings().sqlalchemy_database_uri, echo=False)
+        with Session(engine) as s:
+            row = DBSource(org_id=req.org_id, type=req.type, endpoint=req.endpoint, params=req.params)
+            s.add(row)
+            s.commit()
+            return row.id
+    except Exception:
+        return None
+
+
 @app.post("/ingest/external")
 async def ingest_external(req: IngestExternalRequest):
-    return {"registered": True, "source": req.model_dump()}
+    # Registered sources are polled by the scheduler process (python -m app.scheduler)
+    source_id = await asyncio.to_thread(_register_source, req)
+    return {"registered": source_id is not None, "id": source_id, "source": req.model_dump()}
+
+
+class IngestDocument(BaseModel):
+    org_id: int
+    title: Optional[str] = None
+    url: Optional[str] = None
+    content: str
+    published_at: Optional[str] = None
+
+
+class IngestDocumentsRequest(BaseModel):
+    documents: list[IngestDocument]
+
+
+@app.post("/ingest/documents")
+async def ingest_documents(req: IngestDocumentsRequest):
+    if ASYNC_STORE is None:
+        raise HTTPException(status_code=500, detail="Vector store not initialized")
+    docs = [DocumentUpsert(id=None, **d.model_dump()) for d in req.documents]
+    count = await _ingest_documents(docs)
+    if count:
+        await _persist_vector_store()
+    return {"received": len(docs), "upserted": count}
 
 
 class RecomputeRequest(BaseModel):
     params: Optional[dict[str, float]] = None
+    # EDGAR CIK whose stored XBRL facts drive Financial Health (default: the org's ticker)
+    cik: Optional[str] = None
+
+
+def _org_cik(org_id: int) -> Optional[str]:
+    try:
+        engine = create_engine(get_settings().sqlalchemy_database_uri, echo=False)
+        with Session(engine) as s:
+            org = s.get(DBOrg, org_id)
+            return org.ticker if org is not None else None
+    except Exception:
+        return None
+
+
+async def _org_fundamentals(org_id: int, cik: Optional[str]) -> dict[str, float]:
+    """Ratios from locally stored XBRL facts (no download); empty when none are stored."""
+    if FACT_STORE is None:
+        return {}
+    cik = cik or await asyncio.to_thread(_org_cik, org_id)
+    if not cik:
+        return {}
+    agent = _finance_agent(get_settings())
+    try:
+        return await asyncio.to_thread(agent.fundamentals, cik)
+    except Exception:
+        return {}
 
 
 @app.post("/risk/recompute/{org_id}/{period}")
@@ -297,6 +704,10 @@ async def risk_recompute(org_id: int, period: str, req: Optional[RecomputeReques
         features = pd.DataFrame(base + trend, columns=[f"f{i}" for i in range(6)])
     with tracer.start_as_current_span("compute_scores"):
         fam = compute_family_scores(features)
+        fundamentals = await _org_fundamentals(org_id, req.cik if req else None)
+        from_facts = financial_health_from_facts(fundamentals)
+        if from_facts is not None:
+            fam["Financial Health Risk"] = from_facts
 
     # Optional what-if weights
     alpha = (req.params.get("alpha") if (req and req.params) else 1.0) or 1.0
@@ -318,7 +729,38 @@ async def risk_recompute(org_id: int, period: str, req: Optional[RecomputeReques
         "Operational and Outlier Risk": {"score": float(rew_fam["Operational and Outlier Risk"][0]), "confidence": float(rew_fam["Operational and Outlier Risk"][1])},
         "Combined Index": {"score": float(combined_score), "confidence": float(combined_conf)},
     }
-    return {"org_id": org_id, "period": period, "scores": scores}
+    out = {"org_id": org_id, "period": period, "scores": scores}
+    if fundamentals:
+        out["fundamentals"] = fundamentals
+    return out
+
+
+def _finance_agent(settings: Settings) -> FinanceAgent:
+    return FinanceAgent(
+        api_key=settings.alphavantage_key,
+        http=HTTP_CLIENTS,
+        facts=FACT_STORE,
+        prices=PRICE_STORE,
+        return_windows=settings.finance_return_windows,
+        vol_windows=settings.finance_vol_windows,
+        drawdown_window=settings.finance_drawdown_window,
+        fetch_concurrency=settings.finance_fetch_concurrency,
+    )
+
+
+class FinanceFeaturesRequest(BaseModel):
+    tickers: list[str]
+    # Fetch dates missing from the local price store first
+    refresh: bool = True
+
+
+@app.post("/finance/features")
+async def finance_features(req: FinanceFeaturesRequest):
+    """Returns, rolling volatility and max drawdown for many tickers from the local price store."""
+    agent = _finance_agent(get_settings())
+    feats = await agent.portfolio_features(req.tickers, refresh=req.refresh)
+    feats = feats.astype(object).where(feats.notna(), None)
+    return {"count": len(feats), "features": {t: row.to_dict() for t, row in feats.iterrows()}}
 
 
 @app.get("/risk/drivers/{org_id}/{period}")
@@ -537,38 +979,162 @@ async def export_providers_csv(org_id: int = Query(...)):
     return StreamingResponse(_io_for_pdf.BytesIO(csv_bytes), media_type="text/csv", headers=headers)
 
 
+async def _cached_search(endpoint: str, key: tuple, org_id: Optional[int], compute):
+    """Serve a search from SEARCH_CACHE or run `compute` (returning (results, cacheable)).
+
+    Keys include the org's corpus generation, so any upsert to the org invalidates them.
+    """
+    if SEARCH_CACHE is None:
+        results, _ = await compute()
+        return results
+    full_key = (endpoint, *key, org_id, GENERATIONS.get(org_id))
+    hit = SEARCH_CACHE.get(full_key)
+    if hit is not None:
+        SEARCH_CACHE_REQUESTS.labels(endpoint, "hit").inc()
+        SEARCH_CACHE_SAVED.labels(endpoint).inc(hit[1])
+        SEARCH_CACHE_HIT_RATIO.set(SEARCH_CACHE.hit_ratio)
+        return hit[0]
+    SEARCH_CACHE_REQUESTS.labels(endpoint, "miss").inc()
+    SEARCH_CACHE_HIT_RATIO.set(SEARCH_CACHE.hit_ratio)
+    start = asyncio.get_event_loop().time()
+    results, cacheable = await compute()
+    if cacheable:
+        SEARCH_CACHE.put(full_key, results, asyncio.get_event_loop().time() - start)
+    return results
+
+
+def _cap_snippets(results: list[dict]) -> None:
+    max_bytes = get_settings().snippet_max_bytes
+    for r in results:
+        r["snippet"] = cap_bytes(r.get("snippet") or r.get("title") or "", max_bytes)
+
+
 @app.get("/docs/search")
 async def docs_search(q: str, org_id: Optional[int] = None):
-    if VECTOR_STORE is None:
+    if ASYNC_STORE is None:
         raise HTTPException(status_code=500, detail="Vector store not initialized")
-    results = VECTOR_STORE.search(q, org_id=org_id, k=5)
-    for r in results:
-        r.setdefault("snippet", r.get("title") or "")
+
+    async def compute():
+        results = await ASYNC_STORE.search(q, org_id=org_id, k=5)
+        if NEAR_DUPS is not None:
+            NEAR_DUPS.annotate(results)
+        _cap_snippets(results)
+        return results, True
+
+    results = await _cached_search("vector", (q.strip(), 5, get_settings().vector_backend), org_id, compute)
     return {"query": q, "org_id": org_id, "results": results}
 
 
+def _keyword_search(q: str, org_id: Optional[int], limit: int) -> list[dict]:
+    top = []
+    settings = get_settings()
+    q_ids = set(default_analyzer().lookup(q).tolist())
+    # Rarer query terms pull the snippet window towards them
+    weights = {t: KEYWORD_INDEX.idf(t, org_id) for t in q_ids}
+    for doc_id, score in KEYWORD_INDEX.search(q, org_id=org_id, k=limit):
+        d = CATALOG.get(doc_id)
+        tokens = DOC_TOKENS.get(doc_id)
+        content = d.get("content") or ""
+        if tokens is not None:
+            snip = query_snippet(content, tokens, q_ids, settings.snippet_max_bytes, settings.snippet_window_tokens, weights)
+        else:
+            snip = lead_snippet(content, settings.snippet_max_bytes)
+        top.append(
+            {
+                "id": d.get("id"),
+                "org_id": d.get("org_id"),
+                "title": d.get("title"),
+                "url": d.get("url"),
+                "snippet": snip.text,
+                # [start, end) character spans of query terms in the snippet
+                "highlights": snip.highlights,
+                "score": score,
+            }
+        )
+        if not d.get("url"):
+            top[-1]["ref"] = content_ref(content)
+    if NEAR_DUPS is not None:
+        NEAR_DUPS.annotate(top)
+    return top
+
+
+async def _keyword_results(q: str, org_id: Optional[int], limit: int) -> list[dict]:
+    """Keyword search on Postgres FTS when configured, else the in-process BM25 index."""
+    if KEYWORD_FTS is not None:
+        try:
+            results = await KEYWORD_FTS.search(q, org_id=org_id, k=limit)
+        except Exception:
+            # e.g. migration 0003 not applied yet; the in-process index still covers ingested docs
+            return _keyword_search(q, org_id, limit)
+        if NEAR_DUPS is not None:
+            NEAR_DUPS.annotate(results)
+        return results
+    return _keyword_search(q, org_id, limit)
+
+
+def _keyword_backend() -> str:
+    return "postgres" if KEYWORD_FTS is not None else "memory"
+
+
 @app.get("/docs/search/keyword")
 async def docs_search_keyword(q: str, org_id: Optional[int] = None):
-    # Collect in-memory docs for this org (or all)
-    corpus = [(str(d.get("id")), f"{d.get('title','')}\n{d.get('content','')}") for d in DOCS if org_id is None or d.get("org_id") == org_id]
-    ranked = bm25_score(q, corpus)
-    # Map back to doc entries
-    top = []
-    for doc_id, score in ranked[:10]:
-        for d in DOCS:
-            if str(d.get("id")) == doc_id:
-                top.append({"id": d.get("id"), "title": d.get("title"), "url": d.get("url"), "snippet": d.get("content"), "score": score})
-                break
-    return {"query": q, "org_id": org_id, "results": top}
+    async def compute():
+        return await _keyword_results(q, org_id, limit=10), True
+
+    results = await _cached_search("keyword", (q.strip(), 10, _keyword_backend()), org_id, compute)
+    return {"query": q, "org_id": org_id, "results": results}
+
+
+@app.get("/docs/search/hybrid")
+async def docs_search_hybrid(
+    q: str,
+    org_id: Optional[int] = None,
+    k: int = Query(10, ge=1, le=100),
+    keyword_depth: Optional[int] = Query(None, ge=1),
+    vector_depth: Optional[int] = Query(None, ge=1),
+):
+    """Keyword (BM25) and vector retrieval run concurrently, fused with reciprocal rank fusion.
+
+    The vector leg (embedding request + search) is started first; the keyword leg
+    (in-process index or Postgres FTS) runs while the embedding is in flight.
+    """
+    if ASYNC_STORE is None:
+        raise HTTPException(status_code=500, detail="Vector store not initialized")
+    settings = get_settings()
+    kw_depth = min(keyword_depth or settings.hybrid_keyword_depth, settings.hybrid_max_depth)
+    vec_depth = min(vector_depth or settings.hybrid_vector_depth, settings.hybrid_max_depth)
+
+    async def compute():
+        vec_res, kw_res = await asyncio.gather(
+            ASYNC_STORE.search(q, org_id=org_id, k=vec_depth),
+            _keyword_results(q, org_id, kw_depth),
+            return_exceptions=True,
+        )
+        legs: dict[str, list[dict]] = {}
+        if not isinstance(kw_res, BaseException):
+            legs["keyword"] = kw_res
+        if not isinstance(vec_res, BaseException):
+            legs["vector"] = vec_res
+        if not legs:
+            raise HTTPException(status_code=500, detail="Search failed")
+        results = reciprocal_rank_fusion(legs, k=settings.hybrid_rrf_k, limit=k)
+        if NEAR_DUPS is not None:
+            NEAR_DUPS.annotate(results)
+        _cap_snippets(results)
+        # Don't cache a result that is missing one of the legs
+        return results, len(legs) == 2
+
+    backend = f"{settings.vector_backend}+{_keyword_backend()}"
+    results = await _cached_search("hybrid", (q.strip(), k, kw_depth, vec_depth, backend), org_id, compute)
+    return {"query": q, "org_id": org_id, "results": results}
 
 
 @app.get("/docs/recent")
 async def docs_recent(org_id: Optional[int] = None, limit: int = 10):
-    items = [d for d in DOCS if org_id is None or d.get("org_id") == org_id]
-    items = items[-limit:]
+    max_bytes = get_settings().snippet_max_bytes
     results = [
-        {"id": d.get("id"), "title": d.get("title"), "url": d.get("url"), "snippet": d.get("content")[:300]}
-        for d in items
+        {"id": d.get("id"), "title": d.get("title"), "url": d.get("url"), "snippet": lead_snippet(d.get("content") or "", max_bytes).text}
+        for d in reversed(CATALOG.recent(org_id, limit))
     ]
     return {"org_id": org_id, "results": results}
 
@@ -579,70 +1145,153 @@ class AskRequest(BaseModel):
     scope: list[str] = []
 
 
-@app.post("/ask")
-async def ask(req: AskRequest):
-    if VECTOR_STORE is None:
-        raise HTTPException(status_code=500, detail="Vector store not initialized")
-    org_id = req.org_id
-    scopes = {s.lower() for s in (req.scope or [])}
-
-    # Honor scope: fetch recent news and/or filings, then upsert into search
+def _ask_sources(question: str, scopes: set[str]) -> dict:
+    """Agent calls for /ask keyed by scope: name -> (request memo key, factory)."""
+    sources = {}
     if "news" in scopes:
-        try:
-            agent = NewsAgent(api_key=get_settings().newsapi_key)
-            res = await agent.search(req.question or "")
-            docs = [
-                DocumentUpsert(
-                    id=None,
-                    org_id=org_id or 1,
-                    title=it.get("text"),
-                    url=it.get("id"),
-                    content=it.get("text", ""),
-                )
-                for it in (res.embeds or [])
-            ]
-            if docs:
-                VECTOR_STORE.upsert_documents(docs)
-        except Exception:
-            pass
+        news = NewsAgent(api_key=get_settings().newsapi_key, http=HTTP_CLIENTS)
+        sources["news"] = (("news", question), lambda: news.search(question))
     if "filings" in scopes:
-        try:
-            agent = FilingsAgent()
-            res = await agent.fetch(org=req.question or "", ticker=None)
-            docs = [
-                DocumentUpsert(
-                    id=None,
-                    org_id=org_id or 1,
-                    title=it.get("text"),
-                    url=it.get("id"),
-                    content=it.get("text", ""),
-                )
-                for it in (res.embeds or [])
-            ]
-            if docs:
-                VECTOR_STORE.upsert_documents(docs)
-        except Exception:
-            pass
+        filings = FilingsAgent(http=HTTP_CLIENTS, facts=FACT_STORE)
+        sources["filings"] = (("filings", question, None), lambda: filings.fetch(org=question, ticker=None))
+    return sources
+
 
-    # LLM-backed QA with strict citations
+async def _refresh_ask_sources(req: AskRequest, fetches: RequestFetches) -> list[dict]:
+    """Fetch the scoped sources within their deadlines and ingest what returned; per-source summaries."""
+    settings = get_settings()
+    scopes = {s.lower() for s in (req.scope or [])}
+    outcomes = await fan_out(
+        fetches, _ask_sources(req.question or "", scopes), settings.ask_source_deadlines, settings.ask_default_deadline_s
+    )
+    docs = [
+        DocumentUpsert(id=None, org_id=req.org_id or 1, title=it.get("text"), url=it.get("id"), content=it.get("text", ""))
+        for o in outcomes.values()
+        if o.status == "ok"
+        for it in (o.result.embeds or [])
+    ]
     try:
-        qa = QAAssistantAgent(vector_store=VECTOR_STORE, news_api_key=get_settings().newsapi_key)
-        res = await qa.answer(req.question, org_id=org_id, scope=list(scopes))
-        return {"answer": res.answer_html, "citations": res.citations}
-    except Exception as e:
-        # Fallback: minimal vector-only citations
-        results = VECTOR_STORE.search(req.question, org_id=org_id, k=3)
-        citations = [
-            {"id": str(r.get("id")), "title": r.get("title") or "", "url": r.get("url") or ""}
-            for r in results
-        ]
-        return {"answer": "", "citations": citations, "error": str(e)}
+        await _ingest_documents(docs)
+    except Exception:
+        pass
+    return [o.summary() for o in outcomes.values()]
 
 
-@app.post("/report/executive/{org_id}/{period}")
-async def report_executive(org_id: int, period: str):
-    if NARRATOR is None:
-        raise HTTPException(status_code=500, detail="Narrator not initialized")
+def _qa_agent() -> QAAssistantAgent:
+    settings = get_settings()
+    return QAAssistantAgent(
+        vector_store=ASYNC_STORE,
+        news_api_key=settings.newsapi_key,
+        near_dups=NEAR_DUPS,
+        http=HTTP_CLIENTS,
+        client=NARRATOR.client if NARRATOR is not None else None,
+    )
+
+
+async def _vector_citations(question: str, org_id: Optional[int]) -> list[dict]:
+    # Fallback when the LLM is unavailable: minimal vector-only citations
+    results = await ASYNC_STORE.search(question, org_id=org_id, k=3)
+    return [{"id": str(r.get("id")), "title": r.get("title") or "", "url": r.get("url") or ""} for r in results]
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+_SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+@app.post("/ask")
+async def ask(req: AskRequest):
+    """Answer a question from the index, refreshed first by the scoped sources.
+
+    Scoped sources are fetched concurrently, each within its deadline
+    (ASK_SOURCE_DEADLINES); whatever returned in time is ingested, and QA reuses
+    those fetches instead of repeating them. `sources` reports per-source status
+    and timing.
+    """
+    if ASYNC_STORE is None:
+        raise HTTPException(status_code=500, detail="Vector store not initialized")
+    fetches = RequestFetches()
+    try:
+        sources = await _refresh_ask_sources(req, fetches)
+        # LLM-backed QA with strict citations
+        try:
+            res = await _qa_agent().answer(req.question, org_id=req.org_id, scope=req.scope, fetches=fetches)
+            return {"answer": res.answer_html, "citations": res.citations, "sources": sources}
+        except Exception as e:
+            citations = await _vector_citations(req.question, req.org_id)
+            return {"answer": "", "citations": citations, "sources": sources, "error": str(e)}
+    finally:
+        await fetches.aclose()
+
+
+@app.post("/ask/stream")
+async def ask_stream(req: AskRequest):
+    """Server-sent events variant of /ask.
+
+    Events, in order: `sources` (as in /ask), `citations`, one `token` per
+    generated chunk (`{text}`), then `done` (`{ttfb_ms, elapsed_ms}`). If
+    generation fails, an `error` event precedes `done`; if it cannot start,
+    `citations` are the vector-only fallback.
+    """
+    if ASYNC_STORE is None:
+        raise HTTPException(status_code=500, detail="Vector store not initialized")
+    start = time.perf_counter()
+
+    async def events():
+        fetches = RequestFetches()
+        try:
+            yield _sse("sources", await _refresh_ask_sources(req, fetches))
+            relay = _TokenRelay("ask", start)
+            try:
+                qa = _qa_agent()
+                ctx = await qa.context(req.question, org_id=req.org_id, scope=req.scope, fetches=fetches)
+            except Exception as e:
+                yield _sse("citations", await _vector_citations(req.question, req.org_id))
+                yield _sse("error", {"error": str(e)})
+                yield relay.done()
+                return
+            yield _sse("citations", ctx.citations)
+            async for frame in relay.events(qa.stream(ctx)):
+                yield frame
+            yield relay.done()
+        finally:
+            await fetches.aclose()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+class _TokenRelay:
+    """Relays generated text as SSE `token` events, recording time to first token in STREAM_TTFB."""
+
+    def __init__(self, endpoint: str, start: float) -> None:
+        self.endpoint = endpoint
+        self.start = start
+        self.ttfb: Optional[float] = None
+        self.parts: list[str] = []
+        self.error: Optional[str] = None
+
+    async def events(self, tokens):
+        try:
+            async for text in tokens:
+                if self.ttfb is None:
+                    self.ttfb = time.perf_counter() - self.start
+                    STREAM_TTFB.labels(endpoint=self.endpoint).observe(self.ttfb)
+                self.parts.append(text)
+                yield _sse("token", {"text": text})
+        except Exception as e:
+            self.error = str(e)
+            yield _sse("error", {"error": self.error})
+
+    def done(self) -> str:
+        return _sse("done", {
+            "ttfb_ms": self.ttfb * 1000.0 if self.ttfb is not None else None,
+            "elapsed_ms": (time.perf_counter() - self.start) * 1000.0,
+        })
+
+
+async def _report_inputs(org_id: int, period: str, query: str, k: int, mode: Optional[str] = None) -> dict:
     # Gather context: scores, drivers, top docs
     try:
         prof = await risk_recompute(org_id, period)
@@ -654,50 +1303,70 @@ async def report_executive(org_id: int, period: str):
         drv = {"drivers": [], "rationales": []}
     top_docs = []
     try:
-        if VECTOR_STORE is not None:
-            top_docs = VECTOR_STORE.search("executive summary", org_id=org_id, k=5)
+        if ASYNC_STORE is not None:
+            top_docs = await ASYNC_STORE.search(query, org_id=org_id, k=k)
     except Exception:
         top_docs = []
-    rep = await NARRATOR.build_reports({
+    inputs = {
         "org_id": org_id,
         "period": period,
         "scores": prof.get("scores", {}),
         "drivers": drv,
         "top_docs": top_docs,
-    })
+    }
+    if mode:
+        inputs["mode"] = mode
+    return inputs
+
+
+def _report_stream(endpoint: str, org_id: int, period: str, query: str, k: int, mode: Optional[str] = None):
+    """SSE report: `citations` (the top docs), `token` events, `report` (`{html, summary}`), then `done`."""
+    if NARRATOR is None:
+        raise HTTPException(status_code=500, detail="Narrator not initialized")
+    start = time.perf_counter()
+
+    async def events():
+        inputs = await _report_inputs(org_id, period, query, k, mode)
+        yield _sse("citations", [
+            {"id": str(d.get("id")), "title": d.get("title") or "", "url": d.get("url") or ""} for d in inputs["top_docs"]
+        ])
+        relay = _TokenRelay(endpoint, start)
+        async for frame in relay.events(NARRATOR.stream_reports(inputs)):
+            yield frame
+        if relay.error is None:
+            rep = parse_report("".join(relay.parts))
+            yield _sse("report", {"html": rep.html, "summary": rep.summary})
+        yield relay.done()
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers=_SSE_HEADERS)
+
+
+@app.post("/report/executive/{org_id}/{period}")
+async def report_executive(org_id: int, period: str):
+    if NARRATOR is None:
+        raise HTTPException(status_code=500, detail="Narrator not initialized")
+    rep = await NARRATOR.build_reports(await _report_inputs(org_id, period, "executive summary", 5))
     return {"html": rep.html, "summary": rep.summary}
 
 
+@app.post("/report/executive/{org_id}/{period}/stream")
+async def report_executive_stream(org_id: int, period: str):
+    return _report_stream("report_executive", org_id, period, "executive summary", 5)
+
+
 @app.post("/report/full/{org_id}/{period}")
 async def report_full(org_id: int, period: str):
     if NARRATOR is None:
         raise HTTPException(status_code=500, detail="Narrator not initialized")
-    # Gather context: scores, drivers, top docs
-    try:
-        prof = await risk_recompute(org_id, period)
-    except Exception:
-        prof = {"scores": {}}
-    try:
-        drv = await risk_drivers(org_id, period)
-    except Exception:
-        drv = {"drivers": [], "rationales": []}
-    top_docs = []
-    try:
-        if VECTOR_STORE is not None:
-            top_docs = VECTOR_STORE.search("full risk report", org_id=org_id, k=10)
-    except Exception:
-        top_docs = []
-    rep = await NARRATOR.build_reports({
-        "org_id": org_id,
-        "period": period,
-        "mode": "full",
-        "scores": prof.get("scores", {}),
-        "drivers": drv,
-        "top_docs": top_docs,
-    })
+    rep = await NARRATOR.build_reports(await _report_inputs(org_id, period, "full risk report", 10, mode="full"))
     return {"html": rep.html, "summary": rep.summary}
 
 
+@app.post("/report/full/{org_id}/{period}/stream")
+async def report_full_stream(org_id: int, period: str):
+    return _report_stream("report_full", org_id, period, "full risk report", 10, mode="full")
+
+
 @app.get("/report/pdf/{org_id}/{period}")
 async def report_pdf(org_id: int, period: str):
     try:
@@ -767,9 +1436,9 @@ class AgentFetchRequest(BaseModel):
 @app.post("/agents/news")
 async def agents_news(req: AgentFetchRequest):
     tracer = get_tracer("agents.news")
-    if VECTOR_STORE is None:
+    if ASYNC_STORE is None:
         raise HTTPException(status_code=500, detail="Vector store not initialized")
-    agent = NewsAgent(api_key=get_settings().newsapi_key)
+    agent = NewsAgent(api_key=get_settings().newsapi_key, http=HTTP_CLIENTS)
     q = req.query or req.org or ""
     with tracer.start_as_current_span("fetch_news"):
         res = await agent.search(q)
@@ -777,25 +1446,21 @@ async def agents_news(req: AgentFetchRequest):
     for it in res.embeds:
         docs.append(DocumentUpsert(id=None, org_id=1, title=it.get("text"), url=it.get("id"), content=it.get("text", "")))
     with tracer.start_as_current_span("upsert_docs"):
-        count = VECTOR_STORE.upsert_documents(docs)
-    for it in res.embeds:
-        DOCS.append({"id": len(DOCS) + 1, "org_id": 1, "title": it.get("text"), "url": it.get("id"), "content": it.get("text", "")})
+        count = await _ingest_documents(docs)
     return {"fetched": len(res.items), "upserted": count}
 
 @app.post("/agents/filings")
 async def agents_filings(req: AgentFetchRequest):
-    if VECTOR_STORE is None:
+    if ASYNC_STORE is None:
         raise HTTPException(status_code=500, detail="Vector store not initialized")
     if not req.ticker and not req.org:
         raise HTTPException(status_code=400, detail="ticker or org required")
-    agent = FilingsAgent()
+    agent = FilingsAgent(http=HTTP_CLIENTS, facts=FACT_STORE)
     res = await agent.fetch(org=req.org or req.ticker or "", ticker=req.ticker)
     docs = []
     for it in res.embeds:
         docs.append(DocumentUpsert(id=None, org_id=1, title=it.get("text"), url=it.get("id"), content=it.get("text", "")))
-    count = VECTOR_STORE.upsert_documents(docs)
-    for it in res.embeds:
-        DOCS.append({"id": len(DOCS) + 1, "org_id": 1, "title": it.get("text"), "url": it.get("id"), "content": it.get("text", "")})
+    count = await _ingest_documents(docs)
     return {"upserted": count, "snippets": len(res.snippets)}
 
 class SanctionsRequest(BaseModel):
@@ -803,16 +1468,67 @@ class SanctionsRequest(BaseModel):
 
 @app.post("/agents/sanctions")
 async def agents_sanctions(req: SanctionsRequest):
-    agent = SanctionsAgent()
+    agent = SanctionsAgent(http=HTTP_CLIENTS, index=SANCTIONS_INDEX)
     flags = await agent.check(req.name)
     return {"count": len(flags), "flags": [f.__dict__ for f in flags]}
 
+
+class SanctionsScreenRequest(BaseModel):
+    names: list[str]
+    threshold: Optional[float] = None
+    limit: int = 3
+
+
+_SCREEN_CHUNK = 500
+
+
+@app.post("/agents/sanctions/screen")
+async def agents_sanctions_screen(req: SanctionsScreenRequest):
+    """Screen a batch of names against the local lists; streams one NDJSON line per name, in input order."""
+    index = SANCTIONS_INDEX
+    if index is None:
+        raise HTTPException(status_code=503, detail="Sanctions list index not configured (SANCTIONS_LIST_DIR)")
+
+    async def lines():
+        for start in range(0, len(req.names), _SCREEN_CHUNK):
+            chunk = req.names[start : start + _SCREEN_CHUNK]
+            results = await asyncio.to_thread(index.screen_many, chunk, req.limit, req.threshold)
+            out = []
+            for offset, (name, matches) in enumerate(zip(chunk, results)):
+                SANCTIONS_SCREENED.labels(result="match" if matches else "clear").inc()
+                row = {"index": start + offset, "name": name, "matches": [m.to_dict() for m in matches]}
+                out.append(json.dumps(row) + "\n")
+            yield "".join(out)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @app.get("/social/{org_id}/recent")
 async def social_recent(org_id: int, days: int = 60):
-    agent = SocialAgent()
+    agent = SocialAgent(signals=SOCIAL_SIGNALS)
     res = await agent.scan(query=str(org_id), days=days)
     return {
         "org_id": org_id,
         "c_online": res.online_component,
         "events": res.events,
+        "spikes": res.spikes,
+    }
+
+
+class SocialObservation(BaseModel):
+    count: float
+    # UTC day of the count; defaults to today
+    date: Optional[date_type] = None
+
+
+@app.post("/social/{org_id}/observations")
+async def social_observe(org_id: int, obs: SocialObservation):
+    day = obs.date or datetime.now(timezone.utc).date()
+    try:
+        spike = SOCIAL_SIGNALS.observe(str(org_id), obs.count, pd.Timestamp(day))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {
+        "org_id": org_id,
+        "c_online": SOCIAL_SIGNALS.state(str(org_id)).online_component,
+        "spike": spike.to_dict() if spike else None,
     }
@@ -4,8 +4,8 @@ from datetime import datetime, date
 from typing import Optional, Literal
 
 from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import String, Integer, Float, DateTime, Boolean
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import JSON, String, Integer, Float, DateTime, Boolean, Computed, Index
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 
 try:
     from pgvector.sqlalchemy import Vector  # type: ignore
@@ -102,7 +102,37 @@ class Source(SQLModel, table=True):
     created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=False)))
 
 
+class SourceCursor(SQLModel, table=True):
+    """Scheduler progress per source: items published before `since` have been ingested.
+
+    Of the items published exactly at `since`, the ones in `boundary` (URLs) have been.
+    """
+
+    __tablename__ = "source_cursor"
+
+    source_id: int = Field(sa_column=Column(Integer, primary_key=True, autoincrement=False))
+    since: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=False)))
+    boundary: list = Field(default_factory=list, sa_column=Column(JSON, nullable=False, default=list))
+    last_success_at: Optional[datetime] = Field(default=None, sa_column=Column(DateTime(timezone=False)))
+    last_error: Optional[str] = Field(default=None, sa_column=Column(String(512)))
+    items_total: int = Field(default=0, sa_column=Column(Integer, nullable=False, default=0))
+    updated_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=False)))
+
+
+# Keep in sync with migration 0003
+DOCUMENT_TSV_EXPR = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+)
+
+
 class Document(SQLModel, table=True):
+    __table_args__ = (
+        Index("ix_document_search_tsv", "search_tsv", postgresql_using="gin"),
+        # One row per (org_id, url); upserts rely on it (migration 0005)
+        Index("ux_document_org_url", "org_id", "url", unique=True),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     org_id: int = Field(sa_column=Column(Integer, index=True, nullable=False))
     source_id: Optional[int] = Field(default=None, sa_column=Column(Integer, index=True))
@@ -115,3 +145,5 @@ class Document(SQLModel, table=True):
         sa_column=Column(Vector(1536)) if Vector is not None else None,  # type: ignore[arg-type]
     )
     created_at: datetime = Field(default_factory=datetime.utcnow, sa_column=Column(DateTime(timezone=False)))
+    # Generated by Postgres; never written by the application
+    search_tsv: Optional[str] = Field(default=None, sa_column=Column(TSVECTOR, Computed(DOCUMENT_TSV_EXPR, persisted=True)))
@@ -86,6 +86,32 @@ def compute_family_scores(features: pd.DataFrame) -> Dict[str, Tuple[float, floa
     }
 
 
+def financial_health_from_facts(fundamentals: Dict[str, float]) -> Tuple[float, float] | None:
+    """Financial Health score and confidence from reported fundamentals (see agents.xbrl).
+
+    Each available ratio maps linearly onto 0..1 risk between a healthy and a
+    distressed level; the score is their mean. Confidence grows with the number
+    of ratios. Returns None when no ratio is available.
+    """
+    bands = {
+        # ratio: (healthy, distressed)
+        "leverage": (0.4, 1.0),
+        "current_ratio": (2.0, 0.5),
+        "cash_to_liabilities": (0.5, 0.0),
+        "net_margin": (0.1, -0.2),
+        "revenue_growth": (0.05, -0.3),
+        "debt_to_equity": (0.5, 3.0),
+    }
+    parts = [
+        float(np.clip((fundamentals[k] - healthy) / (distressed - healthy), 0.0, 1.0))
+        for k, (healthy, distressed) in bands.items()
+        if k in fundamentals
+    ]
+    if not parts:
+        return None
+    return float(100.0 * np.mean(parts)), float(min(0.9, 0.5 + 0.08 * len(parts)))
+
+
 def combine_scores(scores: Dict[str, Tuple[float, float]]) -> Tuple[float, float]:
     # Weighted average by confidence
     if not scores:
@@ -0,0 +1,413 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import signal
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from sqlmodel import Session, SQLModel, create_engine, select
+
+from .agents.filings import FilingsAgent
+from .agents.http import HttpClients
+from .agents.news import NewsAgent
+from .agents.resilience import HostResilience
+from .agents.xbrl import FactStore, normalize_cik
+from .config import Settings, get_settings
+from .models import Source, SourceCursor
+
+SCHEDULER_RUNS = Counter("mra_scheduler_runs_total", "Source polls by outcome", ["source", "type", "status"])
+SCHEDULER_ITEMS = Counter("mra_scheduler_items_total", "New items handed to ingestion", ["source", "type"])
+SCHEDULER_RUN_SECONDS = Histogram("mra_scheduler_run_seconds", "Duration of one source poll (fetch + ingest)", ["type"])
+SCHEDULER_LAG = Gauge(
+    "mra_scheduler_source_lag_seconds", "Seconds since the source was last polled successfully", ["source", "type"]
+)
+SCHEDULER_CURSOR_AGE = Gauge(
+    "mra_scheduler_cursor_age_seconds", "Age of the newest item ingested from the source", ["source", "type"]
+)
+SCHEDULER_IN_FLIGHT = Gauge("mra_scheduler_in_flight", "Source polls currently fetching or ingesting")
+
+
+@dataclass
+class SourceJob:
+    id: int
+    org_id: int
+    type: str
+    endpoint: Optional[str] = None
+    params: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def query(self) -> str:
+        return str(self.params.get("query") or self.endpoint or "")
+
+
+@dataclass
+class FetchedItem:
+    title: str
+    url: str
+    content: str
+    # Naive UTC, like the timestamps in the database
+    published_at: datetime
+
+
+@dataclass
+class FetchResult:
+    items: List[FetchedItem]
+    # False when the fetcher stopped before reaching `since` (page limit); the cursor then stays put
+    complete: bool = True
+
+
+Fetcher = Callable[[SourceJob, Optional[datetime]], Awaitable[FetchResult]]
+Sink = Callable[[List[dict]], Awaitable[int]]
+
+
+def _utc(value: Any) -> Optional[datetime]:
+    """ISO timestamp or date as naive UTC; None when missing or unparseable."""
+    if not value:
+        return None
+    try:
+        dt = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def news_fetcher(agent: NewsAgent, max_pages: int = 10) -> Fetcher:
+    """Articles published since the cursor, paging back with NewsAPI's `to` bound.
+
+    Each full page moves `to` down to its oldest timestamp (inclusive, so
+    articles sharing it are re-read and deduped by URL) until a short page
+    shows nothing is left; that includes a last page at `since` itself, whose
+    ties the scheduler sorts out against the cursor's boundary. Stopping at `max_pages`, or on
+    a full page of one timestamp, returns an incomplete result. A source
+    without a cursor gets only the latest page rather than a deep backfill.
+    """
+
+    async def fetch(job: SourceJob, since: Optional[datetime]) -> FetchResult:
+        items: Dict[str, FetchedItem] = {}
+        until: Optional[datetime] = None
+        for _ in range(max_pages):
+            page = await agent.articles(job.query, since=since, until=until)
+            oldest: Optional[datetime] = None
+            for art in page:
+                published = _utc(art.get("publishedAt"))
+                if published is not None and art.get("url"):
+                    items.setdefault(art["url"], FetchedItem(art["title"], art["url"], art["title"], published))
+                    oldest = published if oldest is None else min(oldest, published)
+            if since is None or len(page) < agent.page_size or oldest is None:
+                return FetchResult(list(items.values()))
+            if until is not None and oldest >= until:
+                # A whole page at one timestamp: `to` cannot move past it
+                break
+            until = oldest
+        return FetchResult(list(items.values()), complete=False)
+
+    return fetch
+
+
+def filings_fetcher(agent: FilingsAgent) -> Fetcher:
+    """Latest fiscal-year summary of the source's CIK (`params["cik"]` or `endpoint`)."""
+
+    async def fetch(job: SourceJob, since: Optional[datetime]) -> FetchResult:
+        cik = str(job.params.get("cik") or job.endpoint or "")
+        if not cik:
+            return FetchResult([])
+        # Raises on download errors; FilingsAgent.fetch below then reads the fresh local table
+        await agent.refresh_facts(cik)
+        res = await agent.fetch(org=str(job.params.get("org") or cik), ticker=cik)
+        year_end = _utc(res.facts.get("fiscal_year_end"))
+        if year_end is None or not res.snippets:
+            return FetchResult([])
+        text = res.snippets[0]["text"]
+        return FetchResult([FetchedItem(text, f"sec-{normalize_cik(cik)}-{year_end.date().isoformat()}", text, year_end)])
+
+    return fetch
+
+
+class ApiSink:
+    """Posts documents to the API's /ingest/documents, which embeds and indexes them."""
+
+    def __init__(self, base_url: str, batch_size: int = 100, client: Optional[httpx.AsyncClient] = None) -> None:
+        self.url = base_url.rstrip("/") + "/ingest/documents"
+        self.batch_size = batch_size
+        self.client = client or httpx.AsyncClient(timeout=60.0)
+
+    async def __call__(self, docs: List[dict]) -> int:
+        upserted = 0
+        for i in range(0, len(docs), self.batch_size):
+            r = await self.client.post(self.url, json={"documents": docs[i : i + self.batch_size]})
+            r.raise_for_status()
+            upserted += int(r.json().get("upserted", 0))
+        return upserted
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
+
+
+class SqlSourceStore:
+    """Enabled rows of the `source` table, and their cursors in `source_cursor`."""
+
+    def __init__(self, engine) -> None:
+        self.engine = engine
+
+    def sources(self) -> List[SourceJob]:
+        with Session(self.engine) as s:
+            rows = s.exec(select(Source).where(Source.enabled == True)).all()  # noqa: E712
+            return [SourceJob(r.id, r.org_id, r.type, r.endpoint, dict(r.params or {})) for r in rows]
+
+    def cursors(self) -> Dict[int, SourceCursor]:
+        with Session(self.engine) as s:
+            return {c.source_id: c for c in s.exec(select(SourceCursor)).all()}
+
+    def save(self, cursor: SourceCursor) -> None:
+        with Session(self.engine) as s:
+            s.merge(cursor)
+            s.commit()
+
+
+class Scheduler:
+    """Polls enabled sources on jittered intervals, at most `concurrency` at a time.
+
+    Each source has a SourceCursor: its fetcher is asked for items since the
+    cursor, and items published after it, or at it but not in its `boundary`,
+    go to `sink`. The cursor then moves to the newest of them, with the URLs
+    published at that instant as the new boundary. An incomplete fetch is
+    ingested but keeps the cursor, so the gap behind it is fetched again; a
+    failed poll keeps the cursor and records the error. The interval is `params["interval_s"]` of the source, else
+    `interval`, spread by +/- `jitter` (a fraction); the source list is re-read
+    every `refresh_interval` seconds.
+    """
+
+    def __init__(
+        self,
+        store: SqlSourceStore,
+        fetchers: Dict[str, Fetcher],
+        sink: Sink,
+        concurrency: int = 4,
+        interval: float = 3600.0,
+        jitter: float = 0.1,
+        refresh_interval: float = 60.0,
+        rng: Optional[random.Random] = None,
+    ) -> None:
+        self.store = store
+        self.fetchers = fetchers
+        self.sink = sink
+        self.interval = interval
+        self.jitter = jitter
+        self.refresh_interval = refresh_interval
+        self.rng = rng or random.Random()
+        self.jobs: Dict[int, SourceJob] = {}
+        self.cursors: Dict[int, SourceCursor] = {}
+        self._due: Dict[int, float] = {}
+        self._running: Dict[int, asyncio.Task] = {}
+        self._sem = asyncio.Semaphore(max(1, concurrency))
+
+    def _base_interval(self, job: SourceJob) -> float:
+        return float(job.params.get("interval_s") or self.interval)
+
+    def _delay(self, job: SourceJob) -> float:
+        return self._base_interval(job) * (1.0 + self.jitter * self.rng.uniform(-1.0, 1.0))
+
+    async def refresh(self) -> None:
+        jobs = {j.id: j for j in await asyncio.to_thread(self.store.sources)}
+        stored = await asyncio.to_thread(self.store.cursors)
+        now = time.time()
+        for sid, job in jobs.items():
+            cursor = self.cursors.setdefault(sid, stored.get(sid) or SourceCursor(source_id=sid))
+            if sid not in self._due:
+                if cursor.last_success_at is not None:
+                    # Keep the schedule across restarts
+                    self._due[sid] = cursor.last_success_at.replace(tzinfo=timezone.utc).timestamp() + self._delay(job)
+                else:
+                    # Never polled: spread first polls over the jitter window instead of starting all at once
+                    self._due[sid] = now + self.rng.uniform(0.0, self.jitter * self._base_interval(job))
+        for sid in set(self.jobs) - set(jobs):
+            old = self.jobs[sid]
+            self._due.pop(sid, None)
+            self.cursors.pop(sid, None)
+            for gauge in (SCHEDULER_LAG, SCHEDULER_CURSOR_AGE):
+                try:
+                    gauge.remove(str(sid), old.type)
+                except KeyError:
+                    pass
+        self.jobs = jobs
+
+    async def poll(self, job: SourceJob) -> int:
+        """Fetch and ingest the source's new items; returns how many there were."""
+        labels = (str(job.id), job.type)
+        fetch = self.fetchers.get(job.type)
+        if fetch is None:
+            SCHEDULER_RUNS.labels(*labels, "unsupported").inc()
+            return 0
+        cursor = self.cursors.setdefault(job.id, SourceCursor(source_id=job.id))
+        new: List[FetchedItem] = []
+        async with self._sem:
+            SCHEDULER_IN_FLIGHT.inc()
+            start = time.perf_counter()
+            try:
+                result = await fetch(job, cursor.since)
+                boundary = set(cursor.boundary or [])
+                fresh: Dict[str, FetchedItem] = {}
+                for item in result.items:
+                    if (
+                        cursor.since is None
+                        or item.published_at > cursor.since
+                        or (item.published_at == cursor.since and item.url not in boundary)
+                    ):
+                        fresh.setdefault(item.url, item)
+                new = list(fresh.values())
+                if new:
+                    await self.sink([
+                        {
+                            "org_id": job.org_id,
+                            "title": it.title,
+                            "url": it.url,
+                            "content": it.content,
+                            "published_at": it.published_at.isoformat(),
+                        }
+                        for it in new
+                    ])
+                    cursor.items_total += len(new)
+                if new and result.complete:
+                    newest = max(it.published_at for it in new)
+                    at_newest = [it.url for it in new if it.published_at == newest]
+                    if cursor.since is None or newest > cursor.since:
+                        cursor.since, cursor.boundary = newest, at_newest
+                    else:
+                        cursor.boundary = list(cursor.boundary or []) + at_newest
+                cursor.last_success_at = datetime.utcnow()
+                cursor.last_error = None
+                status = "ok" if result.complete else "partial"
+            except Exception as e:
+                new = []
+                cursor.last_error = f"{type(e).__name__}: {e}"[:512]
+                status = "error"
+            finally:
+                SCHEDULER_IN_FLIGHT.dec()
+                SCHEDULER_RUN_SECONDS.labels(job.type).observe(time.perf_counter() - start)
+            cursor.updated_at = datetime.utcnow()
+            try:
+                await asyncio.to_thread(self.store.save, cursor)
+            except Exception:
+                # Kept in memory; written with the next poll of this source
+                pass
+        SCHEDULER_RUNS.labels(*labels, status).inc()
+        SCHEDULER_ITEMS.labels(*labels).inc(len(new))
+        return len(new)
+
+    def _dispatch(self, now: float) -> float:
+        """Start polls that are due; returns seconds until the next one is."""
+        for sid, due in list(self._due.items()):
+            if due <= now and sid not in self._running:
+                job = self.jobs[sid]
+                self._due[sid] = now + self._delay(job)
+                task = asyncio.create_task(self.poll(job))
+                self._running[sid] = task
+                task.add_done_callback(lambda _t, sid=sid: self._running.pop(sid, None))
+        return max(0.0, min(self._due.values(), default=now + self.refresh_interval) - now)
+
+    def observe_lag(self) -> None:
+        now = datetime.utcnow()
+        for sid, job in self.jobs.items():
+            cursor = self.cursors.get(sid)
+            if cursor is None:
+                continue
+            if cursor.last_success_at is not None:
+                SCHEDULER_LAG.labels(str(sid), job.type).set((now - cursor.last_success_at).total_seconds())
+            if cursor.since is not None:
+                SCHEDULER_CURSOR_AGE.labels(str(sid), job.type).set((now - cursor.since).total_seconds())
+
+    async def run(self, stop: Optional[asyncio.Event] = None) -> None:
+        stop = stop or asyncio.Event()
+        next_refresh = 0.0
+        while not stop.is_set():
+            if time.time() >= next_refresh:
+                try:
+                    await self.refresh()
+                except Exception:
+                    # Database unavailable: keep polling the sources already known
+                    pass
+                next_refresh = time.time() + self.refresh_interval
+            wait = min(self._dispatch(time.time()), max(0.0, next_refresh - time.time()))
+            self.observe_lag()
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=max(wait, 0.05))
+            except asyncio.TimeoutError:
+                pass
+        if self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+
+    async def run_once(self) -> int:
+        """Poll every enabled source once, regardless of schedule; returns new items."""
+        await self.refresh()
+        counts = await asyncio.gather(*(self.poll(job) for job in self.jobs.values()))
+        self.observe_lag()
+        return sum(counts)
+
+
+def _http_clients(settings: Settings) -> HttpClients:
+    return HttpClients(
+        resilience=HostResilience(
+            default_rate=settings.http_rate_default,
+            burst=settings.http_rate_burst,
+            rates=settings.http_rate_limits,
+            max_queue_wait=settings.http_rate_max_wait_s,
+            failure_threshold=settings.http_breaker_failures,
+            reset_timeout=settings.http_breaker_reset_s,
+            attempts=settings.http_retry_attempts,
+            max_backoff=settings.http_retry_max_wait_s,
+        ),
+    )
+
+
+async def main(once: bool = False) -> None:
+    settings = get_settings()
+    engine = create_engine(settings.sqlalchemy_database_uri, echo=False)
+    SQLModel.metadata.create_all(engine, tables=[SourceCursor.__table__])
+    http = _http_clients(settings)
+    facts = FactStore(
+        settings.xbrl_facts_dir or os.path.join(tempfile.gettempdir(), "myriskagent-xbrl"),
+        max_age=settings.xbrl_facts_max_age_s,
+    )
+    sink = ApiSink(settings.scheduler_api_url)
+    scheduler = Scheduler(
+        SqlSourceStore(engine),
+        {
+            "news": news_fetcher(NewsAgent(api_key=settings.newsapi_key, http=http)),
+            "filings": filings_fetcher(FilingsAgent(http=http, facts=facts)),
+        },
+        sink,
+        concurrency=settings.scheduler_concurrency,
+        interval=settings.scheduler_interval_s,
+        jitter=settings.scheduler_jitter,
+        refresh_interval=settings.scheduler_refresh_s,
+    )
+    try:
+        if once:
+            await scheduler.run_once()
+            return
+        if settings.scheduler_metrics_port:
+            start_http_server(settings.scheduler_metrics_port)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await scheduler.run(stop)
+    finally:
+        await sink.aclose()
+        await http.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Poll the enabled sources and ingest their new items.")
+    parser.add_argument("--once", action="store_true", help="poll every enabled source once and exit")
+    asyncio.run(main(once=parser.parse_args().once))
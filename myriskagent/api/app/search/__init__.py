@@ -1,11 +1,31 @@
 from .vector import PgVectorStore, InMemoryVectorStore, DocumentUpsert, hash_embed
-from .keyword import bm25_score, postgres_fts_query
+from .analysis import Analyzer
+from .catalog import DocumentCatalog
+from .keyword import InvertedIndex, bm25_score, postgres_fts_query
+from .ann import AnnVectorStore, IVFIndex
+from .dedup import NearDuplicateIndex
+from .fusion import reciprocal_rank_fusion
+from .snapshot import SearchSnapshots
+from .chunking import TokenChunker, collapse_chunks, search_parents
+from .fts import PostgresFTS
 
 __all__ = [
     "PgVectorStore",
     "InMemoryVectorStore",
     "DocumentUpsert",
     "hash_embed",
+    "Analyzer",
+    "DocumentCatalog",
+    "InvertedIndex",
     "bm25_score",
     "postgres_fts_query",
+    "AnnVectorStore",
+    "IVFIndex",
+    "NearDuplicateIndex",
+    "reciprocal_rank_fusion",
+    "SearchSnapshots",
+    "TokenChunker",
+    "collapse_chunks",
+    "search_parents",
+    "PostgresFTS",
 ]
@@ -0,0 +1,384 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import os
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Sequence, Union
+
+from sqlalchemy import event, text
+
+from .chunking import TokenChunker, batched, search_parents
+from .vector import (
+    ChromaVectorStore,
+    DocumentUpsert,
+    PgVectorStore,
+    _UPSERT_SQL,
+    _delete_sql,
+    content_hash,
+    content_ref,
+    hash_embed,
+    hash_embed_tokens,
+)
+
+try:
+    import openai  # type: ignore
+except Exception:  # pragma: no cover
+    openai = None  # type: ignore
+
+try:
+    from sqlalchemy.ext.asyncio import create_async_engine  # type: ignore
+    import asyncpg  # type: ignore  # noqa: F401
+    from pgvector.asyncpg import register_vector  # type: ignore
+except Exception:  # pragma: no cover
+    create_async_engine = None  # type: ignore
+    register_vector = None  # type: ignore
+
+AsyncEmbedder = Callable[[Sequence[str]], Awaitable[List[List[float]]]]
+
+# Inputs per embeddings request; the API accepts up to 2048
+_EMBED_BATCH = 128
+
+
+def _fit(vec: List[float], dim: int) -> List[float]:
+    vec = vec[:dim] if len(vec) >= dim else vec + [0.0] * (dim - len(vec))
+    n = math.sqrt(sum(v * v for v in vec)) or 1.0
+    return [v / n for v in vec]
+
+
+class _HashEmbedder:
+    """Async hashing embedder; documents with `tokens` are embedded from their analyzed ids."""
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+
+    async def __call__(self, texts: Sequence[str]) -> List[List[float]]:
+        return [hash_embed(t, self.dim) for t in texts]
+
+    def embed_tokens(self, analyzed) -> List[float]:
+        return hash_embed_tokens(analyzed, self.dim)
+
+
+async def _embed_documents(embed: AsyncEmbedder, docs: Sequence[DocumentUpsert]) -> List[List[float]]:
+    """Embed `docs` in order, reusing analyzed tokens when the embedder supports it."""
+    embed_tokens = getattr(embed, "embed_tokens", None)
+    out: List[Optional[List[float]]] = [None] * len(docs)
+    rest = []
+    for i, d in enumerate(docs):
+        if embed_tokens is not None and d.tokens is not None:
+            out[i] = embed_tokens(d.tokens)
+        else:
+            rest.append(i)
+    if rest:
+        for i, vec in zip(rest, await embed([docs[i].content for i in rest])):
+            out[i] = vec
+    return out  # type: ignore[return-value]
+
+
+def get_async_embedder(dim: int = 1536) -> AsyncEmbedder:
+    """Async counterpart of `get_embedder` that embeds a batch of texts per request.
+
+    Uses `openai.AsyncOpenAI`, so embedding calls never block the event loop.
+    OVERRIDE_HASH_EMBED=true uses the hashing fallback, as in `get_embedder`.
+    """
+    if os.getenv("OVERRIDE_HASH_EMBED", "").lower() in {"1", "true", "yes"}:
+        return _HashEmbedder(dim)
+
+    api_key = os.getenv("OPENAI_API_KEY")
+    if openai is None or not api_key:
+        raise RuntimeError("OPENAI_API_KEY is required for embeddings (no fallback)")
+    client = openai.AsyncOpenAI(api_key=api_key, base_url=os.getenv("OPENAI_BASE_URL") or None)
+    model = os.getenv("OPENAI_EMBEDDING_MODEL", "text-embedding-3-small")
+
+    async def _embed(texts: Sequence[str]) -> List[List[float]]:
+        out: List[List[float]] = []
+        for start in range(0, len(texts), _EMBED_BATCH):
+            batch = [t[:8000] for t in texts[start : start + _EMBED_BATCH]]
+            resp = await client.embeddings.create(model=model, input=batch)
+            out.extend(_fit(item.embedding, dim) for item in sorted(resp.data, key=lambda e: e.index))
+        return out
+
+    return _embed
+
+
+def _expand(docs: Sequence[DocumentUpsert], chunker: Optional[TokenChunker]) -> Iterator[DocumentUpsert]:
+    if chunker is None:
+        return iter(docs)
+    return (c for d in docs for c in chunker.expand(d))
+
+
+class AsyncVectorStore:
+    """Awaitable facade over a synchronous vector store.
+
+    Embeddings are computed with the async embedder and handed to the store, so
+    the only work left in the store is index maintenance and scoring.
+    `offload=True` runs that in a worker thread instead of on the event loop: for
+    stores that do their own blocking I/O (a Chroma client, or pgvector over
+    psycopg2 when asyncpg is unavailable), and for in-process stores whose
+    upserts can retrain an IVF index or whose searches read a spill file.
+    `exclusive=True` runs offloaded calls one at a time, for stores that are not
+    thread-safe; `run` executes other work on the store (saving it, copying it
+    for a snapshot) under the same rule.
+
+    With a `chunker`, long documents are indexed as overlapping chunks, streamed
+    through in batches of `batch_size`, and searches collapse chunk hits to their
+    parent document (fetching `overfetch` times more candidates to start with,
+    and more while fewer than `k` distinct parents come back).
+    """
+
+    def __init__(
+        self,
+        store,
+        embed: Optional[AsyncEmbedder] = None,
+        offload: bool = False,
+        exclusive: bool = False,
+        chunker: Optional[TokenChunker] = None,
+        batch_size: int = 64,
+        overfetch: int = 4,
+    ) -> None:
+        self.store = store
+        self.offload = offload
+        self._lock = asyncio.Lock() if exclusive else None
+        self.chunker = chunker
+        self.batch_size = batch_size
+        self.overfetch = overfetch
+        self._embed = embed or get_async_embedder(getattr(store, "dim", 1536))
+
+    async def run(self, fn, *args):
+        """Call `fn(*args)` the way store methods are called (inline, or in a worker thread)."""
+        if not self.offload:
+            return fn(*args)
+        if self._lock is None:
+            return await asyncio.to_thread(fn, *args)
+        async with self._lock:
+            return await asyncio.to_thread(fn, *args)
+
+    async def _upsert_batch(self, docs: List[DocumentUpsert]) -> None:
+        keys = getattr(self.store, "keys", None)
+        pending: Dict[str, DocumentUpsert] = {}
+        for d in docs:
+            if keys is None or keys.needs_embedding(d):
+                pending.setdefault(content_hash(d.content), d)
+        vectors = await _embed_documents(self._embed, list(pending.values())) if pending else []
+        embeddings = dict(zip(pending.keys(), vectors))
+        await self.run(self.store.upsert_documents, docs, embeddings)
+
+    async def upsert_documents(self, docs: Sequence[DocumentUpsert]) -> int:
+        if not docs:
+            return 0
+        for batch in batched(_expand(docs, self.chunker), self.batch_size):
+            await self._upsert_batch(batch)
+        return len(docs)
+
+    async def delete_documents(self, docs: Sequence[DocumentUpsert]) -> int:
+        """Remove `docs` and their chunks from the store; returns entries deleted."""
+        if not docs:
+            return 0
+        return await self.run(self.store.delete_documents, docs)
+
+    async def search(self, query: str, org_id: Optional[int], k: int = 5) -> List[dict]:
+        (q,) = await self._embed([query])
+        if self.chunker is None:
+            return await self.run(self.store.search, query, org_id, k, q)
+
+        async def fetch(limit: int) -> List[dict]:
+            return await self.run(self.store.search, query, org_id, limit, q)
+
+        return await search_parents(fetch, k, self.overfetch)
+
+    async def aclose(self) -> None:
+        return None
+
+
+def _as_datetime(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def async_database_uri(sqlalchemy_uri: str) -> str:
+    """Rewrite a Postgres SQLAlchemy URL to use the asyncpg driver."""
+    scheme, sep, rest = sqlalchemy_uri.partition("://")
+    if scheme.startswith("postgresql"):
+        scheme = "postgresql+asyncpg"
+    return f"{scheme}{sep}{rest}"
+
+
+class AsyncPgVectorStore:
+    """pgvector store on SQLAlchemy's async engine (asyncpg) with async embeddings.
+
+    Same schema and upsert semantics as `PgVectorStore`; with a `chunker`, long
+    documents become one row per chunk, as in `AsyncVectorStore`.
+    """
+
+    def __init__(
+        self,
+        sqlalchemy_uri: str,
+        embed: Optional[AsyncEmbedder] = None,
+        chunker: Optional[TokenChunker] = None,
+        batch_size: int = 64,
+        overfetch: int = 4,
+    ) -> None:
+        if create_async_engine is None or register_vector is None:
+            raise RuntimeError("asyncpg and pgvector are required for AsyncPgVectorStore")
+        self.dim = 1536
+        self.chunker = chunker
+        self.batch_size = batch_size
+        self.overfetch = overfetch
+        self.engine = create_async_engine(async_database_uri(sqlalchemy_uri), echo=False, pool_pre_ping=True)
+
+        @event.listens_for(self.engine.sync_engine, "connect")
+        def _register_vector(dbapi_conn, _record):  # pragma: no cover - needs a live database
+            dbapi_conn.run_async(register_vector)
+
+        self._embed = embed or get_async_embedder(self.dim)
+
+    async def upsert_documents(self, docs: Sequence[DocumentUpsert]) -> int:
+        if not docs:
+            return 0
+        for batch in batched(_expand(docs, self.chunker), self.batch_size):
+            await self._upsert_batch(batch)
+        return len(docs)
+
+    async def _upsert_batch(self, docs: List[DocumentUpsert]) -> None:
+        # Look up existing rows, embed new/changed content in one request, then write;
+        # no transaction is held open across the embedding call.
+        existing = []
+        async with self.engine.connect() as conn:
+            for d in docs:
+                # Same (org_id, url), or same content when there is no URL, updates in place
+                if d.url:
+                    row = (
+                        await conn.execute(
+                            text("select id, md5(content) = md5(:content) from document where org_id = :org_id and url = :url limit 1"),
+                            {"org_id": d.org_id, "url": d.url, "content": d.content},
+                        )
+                    ).first()
+                else:
+                    row = (
+                        await conn.execute(
+                            text("select id, true from document where org_id = :org_id and url is null and md5(content) = md5(:content) limit 1"),
+                            {"org_id": d.org_id, "content": d.content},
+                        )
+                    ).first()
+                existing.append(row)
+        pending: Dict[str, DocumentUpsert] = {}
+        for d, row in zip(docs, existing):
+            if not (row and row[1]):
+                pending.setdefault(content_hash(d.content), d)
+        vectors = dict(zip(pending.keys(), await _embed_documents(self._embed, list(pending.values())))) if pending else {}
+        async with self.engine.begin() as conn:
+            for d, row in zip(docs, existing):
+                published_at = _as_datetime(d.published_at)
+                if row and row[1]:
+                    await conn.execute(
+                        text("update document set title=:title, published_at=:published_at where id=:id"),
+                        {"title": d.title, "published_at": published_at, "id": row[0]},
+                    )
+                else:
+                    # The lookup ran on another connection; the upsert resolves a concurrent insert
+                    await conn.execute(
+                        text(_UPSERT_SQL),
+                        {
+                            "org_id": d.org_id,
+                            "title": d.title,
+                            "url": d.url,
+                            "published_at": published_at,
+                            "content": d.content,
+                            "embedding": vectors[content_hash(d.content)],
+                        },
+                    )
+
+    async def delete_documents(self, docs: Sequence[DocumentUpsert]) -> int:
+        deleted = 0
+        async with self.engine.begin() as conn:
+            for d in docs:
+                sql, params = _delete_sql(d)
+                deleted += (await conn.execute(text(sql), params)).rowcount or 0
+        return deleted
+
+    async def search(self, query: str, org_id: Optional[int], k: int = 5) -> List[dict]:
+        (q_emb,) = await self._embed([query])
+        org_filter = "and org_id = :org_id" if org_id is not None else ""
+        sql = text(
+            f"""
+            select id, org_id, title, url, published_at, left(content, 300) as snippet,
+                   case when url is null then content end as body,
+                   (embedding <=> :qvec) as distance
+            from document
+            where embedding is not null {org_filter}
+            order by embedding <=> :qvec asc
+            limit :k
+            """
+        )
+
+        async def fetch(limit: int) -> List[dict]:
+            params = {"qvec": q_emb, "k": limit}
+            if org_id is not None:
+                params["org_id"] = org_id
+            async with self.engine.connect() as conn:
+                rows = (await conn.execute(sql, params)).mappings().all()
+            return [
+                {
+                    "id": r["id"],
+                    "org_id": r["org_id"],
+                    "title": r["title"],
+                    "url": r["url"],
+                    "published_at": r["published_at"],
+                    "snippet": r["snippet"],
+                    "score": 1.0 - float(r["distance"] or 1.0),
+                    # URL-less rows are matched to other retrievers' hits by content
+                    **({"ref": content_ref(r["body"])} if r["body"] is not None else {}),
+                }
+                for r in rows
+            ]
+
+        if self.chunker is None:
+            return await fetch(k)
+        return await search_parents(fetch, k, self.overfetch)
+
+    async def aclose(self) -> None:
+        await self.engine.dispose()
+
+
+AsyncStore = Union[AsyncVectorStore, AsyncPgVectorStore]
+
+
+def as_async(
+    store,
+    sqlalchemy_uri: Optional[str] = None,
+    chunker: Optional[TokenChunker] = None,
+    batch_size: int = 64,
+) -> AsyncStore:
+    """Return the async interface for `store`.
+
+    pgvector gets a native asyncpg store (thread offload if asyncpg is not
+    installed); a Chroma client is offloaded to a worker thread; in-process
+    stores are offloaded too, one call at a time, so index retraining and
+    spill-file reads stay off the event loop. `chunker` enables chunked indexing.
+    """
+    if isinstance(store, (AsyncVectorStore, AsyncPgVectorStore)):
+        return store
+    if isinstance(store, PgVectorStore):
+        try:
+            return AsyncPgVectorStore(
+                sqlalchemy_uri or store.engine.url.render_as_string(hide_password=False), chunker=chunker, batch_size=batch_size
+            )
+        except RuntimeError:
+            return AsyncVectorStore(store, offload=True, chunker=chunker, batch_size=batch_size)
+    exclusive = not (isinstance(store, ChromaVectorStore) and not store.is_local)
+    return AsyncVectorStore(store, offload=True, exclusive=exclusive, chunker=chunker, batch_size=batch_size)
+
+
+__all__ = [
+    "AsyncEmbedder",
+    "AsyncPgVectorStore",
+    "AsyncStore",
+    "AsyncVectorStore",
+    "as_async",
+    "async_database_uri",
+    "get_async_embedder",
+]
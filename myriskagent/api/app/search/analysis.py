@@ -0,0 +1,215 @@
+from __future__ import annotations
+
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+_WORD = re.compile(r"[A-Za-z0-9_]+")
+
+# Small English list; only applied when an analyzer is built with stopwords
+ENGLISH_STOPWORDS: FrozenSet[str] = frozenset(
+    """
+    a about above after again against all am an and any are as at be because been before being below between
+    both but by can did do does doing down during each few for from further had has have having he her here
+    hers herself him himself his how i if in into is it its itself just me more most my myself no nor not now
+    of off on once only or other our ours ourselves out over own same she should so some such than that the
+    their theirs them themselves then there these they this those through to too under until up very was we
+    were what when where which while who whom why will with you your yours yourself yourselves
+    """.split()
+)
+
+
+def words(text: str) -> List[str]:
+    """Lowercased word tokens with no stopword removal or stemming."""
+    return _WORD.findall(text.lower())
+
+
+def term_hash(term: str) -> int:
+    # Stable across processes (unlike hash()), so persisted hash embeddings stay comparable after restarts
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+_VOWELS = "aeiou"
+
+
+def light_stem(term: str) -> str:
+    """Conservative suffix stripping (plurals, -ing, -ed); leaves short words alone."""
+    if len(term) <= 3 or term.isdigit():
+        return term
+    if term.endswith(("ies", "ied")) and len(term) > 4:
+        return term[:-3] + "y"
+    if term.endswith("sses"):
+        return term[:-2]
+    if term.endswith("s") and not term.endswith(("ss", "us", "is")):
+        return term[:-1]
+    for suffix in ("ing", "ed"):
+        if term.endswith(suffix) and len(term) - len(suffix) >= 3:
+            stem = term[: -len(suffix)]
+            # running -> run, stopped -> stop
+            if len(stem) > 3 and stem[-1] == stem[-2] and stem[-1] not in "lsz":
+                return stem[:-1]
+            # filed -> file, hoped -> hope (short consonant-vowel-consonant stems)
+            if len(stem) == 3 and stem[0] not in _VOWELS and stem[1] in _VOWELS and stem[2] not in _VOWELS + "wxy":
+                return stem + "e"
+            return stem
+    return term
+
+
+class Vocabulary:
+    """Interns terms to dense integer ids and caches each term's stable hash."""
+
+    def __init__(self) -> None:
+        self._ids: Dict[str, int] = {}
+        self._terms: List[str] = []
+        # Term hashes by id; capacity doubles as terms are interned
+        self._hashes = np.zeros(1024, dtype=np.uint64)
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def intern(self, term: str) -> int:
+        tid = self._ids.get(term)
+        if tid is None:
+            tid = len(self._terms)
+            if tid == self._hashes.shape[0]:
+                grown = np.zeros(2 * tid, dtype=np.uint64)
+                grown[:tid] = self._hashes
+                self._hashes = grown
+            self._hashes[tid] = term_hash(term)
+            self._ids[term] = tid
+            self._terms.append(term)
+        return tid
+
+    def get(self, term: str) -> Optional[int]:
+        return self._ids.get(term)
+
+    def hash_of(self, term: str) -> int:
+        tid = self._ids.get(term)
+        return int(self._hashes[tid]) if tid is not None else term_hash(term)
+
+    def term(self, tid: int) -> str:
+        return self._terms[tid]
+
+    def hashes(self, ids: np.ndarray) -> np.ndarray:
+        """uint64 term hashes for an array of ids."""
+        return self._hashes[ids]
+
+
+@dataclass(frozen=True)
+class AnalyzedText:
+    """Term ids of a text in order, with the character span of each in the source."""
+
+    ids: np.ndarray
+    starts: np.ndarray
+    ends: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def spans(self, term_ids: Iterable[int]) -> List[Tuple[int, int]]:
+        """Character spans of every occurrence of `term_ids`."""
+        mask = np.isin(self.ids, np.fromiter(term_ids, dtype=np.int32))
+        return list(zip(self.starts[mask].tolist(), self.ends[mask].tolist()))
+
+
+_EMPTY = np.zeros(0, dtype=np.int32)
+
+
+class Analyzer:
+    """Case folding, word tokenization, optional stopword removal and light stemming.
+
+    `analyze` interns terms into the shared `vocab`, so documents are analyzed once
+    at upsert and BM25, the hashing embedder and highlighting work on the id array.
+    Queries use `lookup`, which never grows the vocabulary: a term no document
+    contains cannot match anything.
+    """
+
+    def __init__(self, stopwords: Optional[Iterable[str]] = None, stem: bool = False, vocab: Optional[Vocabulary] = None) -> None:
+        self.stopwords: FrozenSet[str] = frozenset(stopwords or ())
+        self.stem = stem
+        self.vocab = vocab or Vocabulary()
+        self._normalized: Dict[str, Optional[str]] = {}
+
+    def _normalize(self, token: str) -> Optional[str]:
+        """Term for a raw token, or None for a stopword (memoized)."""
+        try:
+            return self._normalized[token]
+        except KeyError:
+            pass
+        term: Optional[str] = token.lower()
+        if term in self.stopwords:
+            term = None
+        elif self.stem:
+            term = light_stem(term)
+        if len(self._normalized) < 1_000_000:
+            self._normalized[token] = term
+        return term
+
+    def _tokens(self, text: str) -> Iterator[Tuple[str, int, int]]:
+        for m in _WORD.finditer(text):
+            term = self._normalize(m.group())
+            if term is not None:
+                yield term, m.start(), m.end()
+
+    def terms(self, text: str) -> List[str]:
+        return [t for t, _, _ in self._tokens(text)]
+
+    def analyze(self, text: str) -> AnalyzedText:
+        intern = self.vocab.intern
+        ids: List[int] = []
+        starts: List[int] = []
+        ends: List[int] = []
+        for term, s, e in self._tokens(text):
+            ids.append(intern(term))
+            starts.append(s)
+            ends.append(e)
+        if not ids:
+            return AnalyzedText(_EMPTY, _EMPTY, _EMPTY)
+        return AnalyzedText(np.array(ids, dtype=np.int32), np.array(starts, dtype=np.int32), np.array(ends, dtype=np.int32))
+
+    def lookup(self, text: str) -> np.ndarray:
+        """Ids of the known terms of `text`, in order (repeats kept)."""
+        get = self.vocab.get
+        ids = [tid for tid in (get(t) for t, _, _ in self._tokens(text)) if tid is not None]
+        return np.array(ids, dtype=np.int32) if ids else _EMPTY
+
+    def hashes(self, text: str) -> np.ndarray:
+        """Stable hashes of every term of `text`, interned or not."""
+        return np.array([self.vocab.hash_of(t) for t, _, _ in self._tokens(text)], dtype=np.uint64)
+
+
+_DEFAULT = Analyzer()
+
+
+def default_analyzer() -> Analyzer:
+    return _DEFAULT
+
+
+def set_default_analyzer(analyzer: Analyzer) -> None:
+    """Replace the process-wide analyzer; call before anything is indexed."""
+    global _DEFAULT
+    _DEFAULT = analyzer
+
+
+def hash_vector(hashes: np.ndarray, dim: int) -> List[float]:
+    """L2-normalized bag-of-buckets vector over term hashes."""
+    vec = np.bincount((hashes % np.uint64(dim)).astype(np.int64), minlength=dim).astype(np.float64)
+    norm = float(np.sqrt(vec @ vec)) or 1.0
+    return (vec / norm).tolist()
+
+
+__all__ = [
+    "ENGLISH_STOPWORDS",
+    "AnalyzedText",
+    "Analyzer",
+    "Vocabulary",
+    "default_analyzer",
+    "hash_vector",
+    "light_stem",
+    "set_default_analyzer",
+    "term_hash",
+    "words",
+]
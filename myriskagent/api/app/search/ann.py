@@ -0,0 +1,353 @@
+from __future__ import annotations
+
+import io
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.storage.io import ObjectStore
+
+from .vector import DocumentKeys, DocumentUpsert, Embeddings, _embedding_for, _with_refs, get_embedder
+
+
+def _normalize_rows(mat: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def spherical_kmeans(vecs: np.ndarray, n_clusters: int, n_iter: int = 10, seed: int = 0) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity and return unit centroids."""
+    rng = np.random.default_rng(seed)
+    n = vecs.shape[0]
+    n_clusters = max(1, min(n_clusters, n))
+    centroids = vecs[rng.choice(n, size=n_clusters, replace=False)].copy()
+    for _ in range(n_iter):
+        assign = np.argmax(vecs @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, vecs)
+        counts = np.bincount(assign, minlength=n_clusters)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random points so every list stays usable
+            sums[empty] = vecs[rng.choice(n, size=int(empty.sum()), replace=False)]
+        centroids = _normalize_rows(sums)
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted-file ANN index over unit vectors (cosine similarity).
+
+    Vectors are bucketed by their nearest k-means centroid; a query scans only the
+    `nprobe` closest buckets. Until enough vectors arrive to train centroids the
+    index answers by exhaustive scan. Centroids are retrained when the index has
+    grown by `retrain_growth` since the last training run. Removed rows stay in
+    place until they exceed `max_dead_fraction` of the stored rows; the index is
+    then compacted (and retrained, if trained), so retention churn at a steady
+    size does not grow memory or scan cost.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        nlist: int = 64,
+        nprobe: int = 8,
+        min_train_per_list: int = 4,
+        retrain_growth: float = 2.0,
+        max_dead_fraction: float = 0.25,
+        seed: int = 0,
+    ) -> None:
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train_per_list = min_train_per_list
+        self.retrain_growth = retrain_growth
+        self.max_dead_fraction = max_dead_fraction
+        self.seed = seed
+        self._vecs = np.zeros((0, dim), dtype=np.float32)
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._orgs = np.zeros(0, dtype=np.int64)
+        self._alive = np.zeros(0, dtype=bool)
+        self._assign = np.zeros(0, dtype=np.int32)
+        self._size = 0
+        self._row_by_id: Dict[int, int] = {}
+        self.centroids: Optional[np.ndarray] = None
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []
+        self._trained_at = 0
+
+    def __len__(self) -> int:
+        return len(self._row_by_id)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _reserve(self, extra: int) -> None:
+        need = self._size + extra
+        cap = self._vecs.shape[0]
+        if need <= cap:
+            return
+        new_cap = max(need, cap * 2, 64)
+        self._vecs = np.resize(self._vecs, (new_cap, self.dim))
+        self._ids = np.resize(self._ids, new_cap)
+        self._orgs = np.resize(self._orgs, new_cap)
+        self._alive = np.resize(self._alive, new_cap)
+        self._assign = np.resize(self._assign, new_cap)
+
+    def add(self, ids: Sequence[int], org_ids: Sequence[int], vecs: np.ndarray) -> None:
+        """Insert vectors; an id already present is overwritten in place."""
+        if len(ids) == 0:
+            return
+        vecs = _normalize_rows(np.asarray(vecs, dtype=np.float32).reshape(len(ids), self.dim))
+        # Last occurrence wins when a batch repeats an id
+        latest = {int(did): j for j, did in enumerate(ids)}
+        fresh = [j for did, j in latest.items() if did not in self._row_by_id]
+        for did, j in latest.items():
+            row = self._row_by_id.get(did)
+            if row is not None:
+                self._overwrite(row, int(org_ids[j]), vecs[j])
+        if not fresh:
+            return
+        self._reserve(len(fresh))
+        start = self._size
+        end = start + len(fresh)
+        self._vecs[start:end] = vecs[fresh]
+        self._ids[start:end] = np.asarray([ids[j] for j in fresh], dtype=np.int64)
+        self._orgs[start:end] = np.asarray([org_ids[j] for j in fresh], dtype=np.int64)
+        self._alive[start:end] = True
+        self._size = end
+        for row in range(start, end):
+            self._row_by_id[int(self._ids[row])] = row
+        if self.centroids is not None:
+            assign = np.argmax(vecs[fresh] @ self.centroids.T, axis=1).astype(np.int32)
+            self._assign[start:end] = assign
+            for row, lst in zip(range(start, end), assign):
+                self._lists[int(lst)].append(row)
+                self._list_arrays[int(lst)] = None
+        self._maybe_train()
+
+    def _overwrite(self, row: int, org_id: int, vec: np.ndarray) -> None:
+        self._vecs[row] = vec
+        self._orgs[row] = org_id
+        if self.centroids is None:
+            return
+        new_list = int(np.argmax(self.centroids @ vec))
+        old_list = int(self._assign[row])
+        if new_list != old_list:
+            self._lists[old_list].remove(row)
+            self._lists[new_list].append(row)
+            self._list_arrays[old_list] = None
+            self._list_arrays[new_list] = None
+            self._assign[row] = new_list
+
+    def remove(self, did: int) -> bool:
+        row = self._row_by_id.pop(did, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        if self._size - len(self._row_by_id) > self.max_dead_fraction * self._size:
+            self._reclaim()
+        return True
+
+    def _reclaim(self) -> None:
+        # Retraining also recentres the lists on what the index now holds; an index
+        # that shrank below the training threshold goes back to exhaustive scan.
+        if len(self._row_by_id) >= self.nlist * self.min_train_per_list:
+            self.train()
+            return
+        self._compact()
+        self.centroids = None
+        self._lists, self._list_arrays = [], []
+        self._trained_at = 0
+
+    def _maybe_train(self) -> None:
+        n_alive = len(self._row_by_id)
+        if n_alive < self.nlist * self.min_train_per_list:
+            return
+        if self.centroids is not None and n_alive < self._trained_at * self.retrain_growth:
+            return
+        self.train()
+
+    def train(self) -> None:
+        """(Re)train centroids on live vectors and compact away removed rows."""
+        self._compact()
+        if self._size == 0:
+            return
+        live = self._vecs[: self._size]
+        self.centroids = spherical_kmeans(live, self.nlist, seed=self.seed)
+        assign = np.argmax(live @ self.centroids.T, axis=1).astype(np.int32)
+        self._assign[: self._size] = assign
+        self._set_lists(assign)
+        self._trained_at = self._size
+
+    def _set_lists(self, assign: np.ndarray) -> None:
+        n_lists = self.centroids.shape[0] if self.centroids is not None else 0
+        self._lists = [[] for _ in range(n_lists)]
+        for row, lst in enumerate(assign):
+            self._lists[int(lst)].append(row)
+        self._list_arrays = [None] * n_lists
+
+    def _list_rows(self, lst: int) -> np.ndarray:
+        arr = self._list_arrays[lst]
+        if arr is None:
+            arr = np.asarray(self._lists[lst], dtype=np.int64)
+            self._list_arrays[lst] = arr
+        return arr
+
+    def _compact(self) -> None:
+        keep = np.flatnonzero(self._alive[: self._size])
+        if keep.size == self._size:
+            return
+        self._vecs = self._vecs[keep].copy()
+        self._ids = self._ids[keep].copy()
+        self._orgs = self._orgs[keep].copy()
+        self._alive = np.ones(keep.size, dtype=bool)
+        self._assign = self._assign[keep].copy()
+        self._size = int(keep.size)
+        self._row_by_id = {int(did): row for row, did in enumerate(self._ids)}
+
+    def _candidate_rows(self, q: np.ndarray, nprobe: int) -> np.ndarray:
+        if self.centroids is None or nprobe >= len(self._lists):
+            return np.arange(self._size)
+        probe = np.argsort(-(self.centroids @ q))[:nprobe]
+        return np.concatenate([self._list_rows(int(lst)) for lst in probe])
+
+    def search(
+        self, q: Sequence[float] | np.ndarray, k: int = 5, org_id: Optional[int] = None, nprobe: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """Return up to k (id, cosine score) pairs, best first."""
+        if self._size == 0 or k <= 0:
+            return []
+        qv = np.asarray(q, dtype=np.float32)
+        qv = qv / (np.linalg.norm(qv) or 1.0)
+        probes = nprobe or self.nprobe
+        while True:
+            rows = self._candidate_rows(qv, probes)
+            if rows.size:
+                mask = self._alive[rows]
+                if org_id is not None:
+                    mask &= self._orgs[rows] == org_id
+                rows = rows[mask]
+            # Widen the probe when a selective org filter leaves too few candidates
+            if rows.size >= k or self.centroids is None or probes >= len(self._lists):
+                break
+            probes *= 2
+        if rows.size == 0:
+            return []
+        scores = self._vecs[rows] @ qv
+        top = np.argpartition(-scores, min(k, rows.size) - 1)[:k] if rows.size > k else np.arange(rows.size)
+        top = top[np.argsort(-scores[top])]
+        return [(int(self._ids[rows[i]]), float(scores[i])) for i in top]
+
+    def to_bytes(self) -> bytes:
+        keep = np.flatnonzero(self._alive[: self._size])
+        buf = io.BytesIO()
+        np.savez(
+            buf,
+            vecs=self._vecs[keep],
+            ids=self._ids[keep],
+            orgs=self._orgs[keep],
+            centroids=self.centroids if self.centroids is not None else np.zeros((0, self.dim), dtype=np.float32),
+            params=np.asarray([self.dim, self.nlist, self.nprobe, self._trained_at], dtype=np.int64),
+        )
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, nprobe: Optional[int] = None) -> "IVFIndex":
+        with np.load(io.BytesIO(data)) as z:
+            dim, nlist, saved_nprobe, trained_at = (int(v) for v in z["params"])
+            idx = cls(dim=dim, nlist=nlist, nprobe=nprobe or saved_nprobe)
+            idx._vecs = z["vecs"].astype(np.float32)
+            idx._ids = z["ids"].astype(np.int64)
+            idx._orgs = z["orgs"].astype(np.int64)
+            centroids = z["centroids"]
+        idx._size = int(idx._ids.size)
+        idx._alive = np.ones(idx._size, dtype=bool)
+        idx._assign = np.zeros(idx._size, dtype=np.int32)
+        idx._row_by_id = {int(did): row for row, did in enumerate(idx._ids)}
+        if centroids.shape[0]:
+            idx.centroids = centroids.astype(np.float32)
+            assign = np.argmax(idx._vecs @ idx.centroids.T, axis=1).astype(np.int32) if idx._size else idx._assign
+            idx._assign = assign
+            idx._set_lists(assign)
+            idx._trained_at = trained_at
+        return idx
+
+
+class AnnVectorStore:
+    """Vector store backed by an in-process IVF index, persisted to the object store.
+
+    Intended for deployments without Postgres; selected with VECTOR_BACKEND=ann.
+    """
+
+    INDEX_FILE = "index.npz"
+    META_FILE = "meta.json"
+
+    def __init__(self, dim: int = 1536, nlist: int = 64, nprobe: int = 8) -> None:
+        self.dim = dim
+        self.index = IVFIndex(dim=dim, nlist=nlist, nprobe=nprobe)
+        self.meta: Dict[int, Tuple[int, str, Optional[str]]] = {}
+        self.keys = DocumentKeys()
+        self._embed = get_embedder(dim)
+
+    def upsert_documents(self, docs: Sequence[DocumentUpsert], embeddings: Optional[Embeddings] = None) -> int:
+        if not docs:
+            return 0
+        ids: List[int] = []
+        orgs: List[int] = []
+        vecs: List[List[float]] = []
+        for d in docs:
+            did, changed = self.keys.resolve(d)
+            self.meta[int(did)] = (d.org_id, d.title or "", d.url)
+            if changed:
+                ids.append(int(did))
+                orgs.append(d.org_id)
+                vecs.append(_embedding_for(d, embeddings, self._embed))
+        if ids:
+            self.index.add(ids, orgs, np.asarray(vecs, dtype=np.float32))
+        return len(docs)
+
+    def delete_documents(self, docs: Sequence[DocumentUpsert]) -> int:
+        deleted = 0
+        for d in docs:
+            for did in self.keys.forget(d):
+                self.meta.pop(int(did), None)
+                deleted += self.index.remove(int(did))
+        return deleted
+
+    def search(self, query: str, org_id: Optional[int], k: int = 5, query_vector: Optional[List[float]] = None) -> List[dict]:
+        q = query_vector if query_vector is not None else self._embed(query)
+        out = []
+        for did, score in self.index.search(q, k=k, org_id=org_id):
+            o, title, url = self.meta[did]
+            out.append({"id": did, "org_id": o, "title": title, "url": url, "score": score})
+        return _with_refs(out, self.keys)
+
+    def save(self, store: ObjectStore, prefix: str) -> str:
+        """Write the index and document metadata under `prefix` in the object store."""
+        meta = {
+            "keys": self.keys.to_dict(),
+            "docs": {str(did): [o, title, url] for did, (o, title, url) in self.meta.items()},
+        }
+        store.put_bytes(f"{prefix}/{self.INDEX_FILE}", self.index.to_bytes())
+        return store.put_text(f"{prefix}/{self.META_FILE}", json.dumps(meta))
+
+    @classmethod
+    def load(cls, store: ObjectStore, prefix: str, nlist: int = 64, nprobe: int = 8) -> "AnnVectorStore":
+        """Load a saved index from the object store, or return an empty one if none exists."""
+        inst = cls(nlist=nlist, nprobe=nprobe)
+        try:
+            data = store.get_bytes(f"{prefix}/{cls.INDEX_FILE}")
+            meta = json.loads(store.get_text(f"{prefix}/{cls.META_FILE}"))
+        except FileNotFoundError:
+            return inst
+        inst.index = IVFIndex.from_bytes(data, nprobe=nprobe)
+        inst.dim = inst.index.dim
+        inst.meta = {int(did): (int(v[0]), v[1], v[2]) for did, v in meta.get("docs", {}).items()}
+        inst.keys = DocumentKeys.from_dict(meta.get("keys", {}))
+        return inst
+
+
+__all__ = ["IVFIndex", "AnnVectorStore", "spherical_kmeans"]
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Hashable, Iterable, Optional, Tuple
+
+
+class CorpusGenerations:
+    """Per-org corpus version counters, bumped on every upsert to that org.
+
+    Including the generation in a cache key means an upsert implicitly
+    invalidates every cached result for the org (and cross-org results, which
+    use the total).
+    """
+
+    def __init__(self) -> None:
+        self._by_org: Counter = Counter()
+        self.total = 0
+
+    def bump(self, org_ids: Iterable[int]) -> None:
+        for org in set(org_ids):
+            self._by_org[org] += 1
+            self.total += 1
+
+    def get(self, org_id: Optional[int]) -> int:
+        return self.total if org_id is None else self._by_org[org_id]
+
+
+class QueryCache:
+    """LRU cache with a per-entry TTL for search results.
+
+    Each entry remembers how long it took to compute, so hits can report the
+    latency they saved.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl_s: float = 300.0) -> None:
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any, float]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def get(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        """Return (value, compute seconds) for a live entry, else None."""
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def put(self, key: Hashable, value: Any, cost_s: float) -> None:
+        if self.maxsize <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl_s, value, cost_s)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+__all__ = ["CorpusGenerations", "QueryCache"]
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+from collections import OrderedDict
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .vector import DocumentUpsert, content_ref, document_key
+
+DocKey = Tuple[int, str]
+
+
+def _record_key(rec: dict) -> DocKey:
+    # Same identity as document_key() for the upsert the record came from
+    return (rec["org_id"], rec.get("url") or content_ref(rec.get("content") or ""))
+
+
+class IdAllocator:
+    """Monotonic document ids, safe to call from any thread."""
+
+    def __init__(self, start: int = 1) -> None:
+        self._lock = threading.Lock()
+        self._next = start
+
+    def __call__(self) -> int:
+        with self._lock:
+            value = self._next
+            self._next += 1
+            return value
+
+    def advance_past(self, value: int) -> None:
+        """Never hand out `value` or anything below it."""
+        with self._lock:
+            self._next = max(self._next, value + 1)
+
+
+class DocumentCatalog:
+    """Keyword-corpus records by id, by document key, and per org in ingest order.
+
+    Each org keeps an ordered recency queue (id -> ingest sequence); re-ingesting a
+    document moves it to the tail, and once an org holds `retention_per_org`
+    documents the oldest are evicted and returned to the caller so it can drop
+    them from its indexes. Lookups by id or key are O(1); `recent` is O(k) for one
+    org and O(k log orgs) across orgs. `retention_per_org=0` keeps everything.
+    """
+
+    def __init__(self, retention_per_org: int = 0) -> None:
+        self.retention_per_org = retention_per_org
+        self.allocate_id = IdAllocator()
+        self._by_id: Dict[int, dict] = {}
+        self._by_key: Dict[DocKey, int] = {}
+        self._recent: Dict[int, "OrderedDict[int, int]"] = {}
+        self._seq = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __contains__(self, doc_id: int) -> bool:
+        return doc_id in self._by_id
+
+    def __iter__(self) -> Iterator[dict]:
+        """All records, oldest ingest first."""
+        queues = [((seq, did) for did, seq in q.items()) for q in self._recent.values()]
+        for _, did in heapq.merge(*queues):
+            yield self._by_id[did]
+
+    def get(self, doc_id: int) -> Optional[dict]:
+        return self._by_id.get(doc_id)
+
+    def by_key(self, key: DocKey) -> Optional[dict]:
+        did = self._by_key.get(key)
+        return self._by_id.get(did) if did is not None else None
+
+    def orgs(self) -> List[int]:
+        return list(self._recent)
+
+    def iter_org(self, org_id: int) -> Iterator[dict]:
+        """Records of one org, oldest ingest first."""
+        for did in self._recent.get(org_id, ()):
+            yield self._by_id[did]
+
+    def recent(self, org_id: Optional[int] = None, limit: int = 10) -> List[dict]:
+        """Up to `limit` most recently ingested records, newest first."""
+        if limit <= 0:
+            return []
+        if org_id is not None:
+            q = self._recent.get(org_id)
+            return [self._by_id[did] for did in islice(reversed(q), limit)] if q else []
+        queues = [((-seq, did) for did, seq in reversed(q.items())) for q in self._recent.values()]
+        return [self._by_id[did] for _, did in islice(heapq.merge(*queues), limit)]
+
+    def upsert(self, d: DocumentUpsert) -> Tuple[dict, List[dict]]:
+        """Insert or replace the record for `d`'s key; returns (record, evicted records)."""
+        key = document_key(d)
+        did = self._by_key.get(key)
+        if did is None:
+            did = self.allocate_id()
+            rec = {"id": did, "org_id": d.org_id}
+            self._by_id[did] = rec
+            self._by_key[key] = did
+        else:
+            rec = self._by_id[did]
+        rec.update({"title": d.title, "url": d.url, "content": d.content})
+        return rec, self._touch(rec)
+
+    def restore(self, records: Iterable[dict]) -> List[dict]:
+        """Load records (oldest first) keeping their ids; returns any evicted by retention."""
+        evicted: List[dict] = []
+        for rec in records:
+            self._by_id[rec["id"]] = rec
+            self._by_key[_record_key(rec)] = rec["id"]
+            self.allocate_id.advance_past(rec["id"])
+            evicted.extend(self._touch(rec))
+        return evicted
+
+    def _touch(self, rec: dict) -> List[dict]:
+        q = self._recent.setdefault(rec["org_id"], OrderedDict())
+        q[rec["id"]] = next(self._seq)
+        q.move_to_end(rec["id"])
+        evicted = []
+        while self.retention_per_org and len(q) > self.retention_per_org:
+            old_id, _ = q.popitem(last=False)
+            evicted.append(self._remove(old_id))
+        return evicted
+
+    def _remove(self, doc_id: int) -> dict:
+        rec = self._by_id.pop(doc_id)
+        key = _record_key(rec)
+        if self._by_key.get(key) == doc_id:
+            del self._by_key[key]
+        return rec
+
+    def clear(self) -> None:
+        self._by_id.clear()
+        self._by_key.clear()
+        self._recent.clear()
+
+
+__all__ = ["DocumentCatalog", "IdAllocator"]
@@ -0,0 +1,160 @@
+from __future__ import annotations
+
+import re
+from itertools import chain, islice
+from typing import Awaitable, Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .vector import DocumentUpsert, content_ref
+
+try:
+    import tiktoken  # type: ignore
+except Exception:  # pragma: no cover
+    tiktoken = None  # type: ignore
+
+_CHUNK_SUFFIX = re.compile(r"#chunk=(\d+)$")
+# Fallback tokens: a word plus surrounding whitespace, so decoding is a plain join
+_FALLBACK_TOKEN = re.compile(r"\s*\S+\s*|\s+")
+
+
+def chunk_url(parent: str, index: int) -> str:
+    return f"{parent}#chunk={index}"
+
+
+def split_chunk_url(url: Optional[str]) -> Tuple[Optional[str], Optional[int]]:
+    """Return (parent reference, chunk index); the index is None for unchunked documents."""
+    if not url:
+        return url, None
+    m = _CHUNK_SUFFIX.search(url)
+    if m is None:
+        return url, None
+    return url[: m.start()], int(m.group(1))
+
+
+class TokenChunker:
+    """Splits text into overlapping chunks of at most `max_tokens` tokens.
+
+    Text is consumed in `window_chars` windows cut at whitespace, and only the
+    tokens of the chunk being built are held, so memory stays bounded no matter
+    how long the input is. Uses tiktoken when the encoding is available and a
+    whitespace tokenizer otherwise.
+    """
+
+    def __init__(self, max_tokens: int = 512, overlap: int = 64, encoding: str = "cl100k_base", window_chars: int = 16384) -> None:
+        if not 0 <= overlap < max_tokens:
+            raise ValueError("overlap must be smaller than max_tokens")
+        self.max_tokens = max_tokens
+        self.overlap = overlap
+        self.window_chars = window_chars
+        self._enc = None
+        if tiktoken is not None:
+            try:
+                self._enc = tiktoken.get_encoding(encoding)
+            except Exception:
+                # Encoding files are fetched on first use; offline hosts use the fallback
+                self._enc = None
+
+    def _encode(self, text: str) -> List:
+        if self._enc is not None:
+            return self._enc.encode(text, disallowed_special=())
+        return _FALLBACK_TOKEN.findall(text)
+
+    def _decode(self, tokens: Sequence) -> str:
+        if self._enc is not None:
+            return self._enc.decode(list(tokens))
+        return "".join(tokens)
+
+    def _windows(self, text: str) -> Iterator[str]:
+        start, n = 0, len(text)
+        while start < n:
+            end = min(start + self.window_chars, n)
+            if end < n:
+                # Cut before whitespace so no token straddles two windows
+                cut = text.rfind(" ", start + 1, end)
+                if cut > start:
+                    end = cut
+            yield text[start:end]
+            start = end
+
+    def split(self, text: str | Iterable[str]) -> Iterator[str]:
+        """Yield chunk texts; `text` may be a string or an iterable of string pieces."""
+        pieces = self._windows(text) if isinstance(text, str) else (w for p in text for w in self._windows(p))
+        buf: List = []
+        emitted = False
+        for piece in pieces:
+            buf.extend(self._encode(piece))
+            while len(buf) >= self.max_tokens:
+                yield self._decode(buf[: self.max_tokens])
+                emitted = True
+                buf = buf[self.max_tokens - self.overlap :]
+        # A tail that is only the previous chunk's overlap adds nothing
+        if buf and (not emitted or len(buf) > self.overlap):
+            yield self._decode(buf)
+
+    def expand(self, d: DocumentUpsert) -> Iterator[DocumentUpsert]:
+        """Yield `d` unchanged when it fits in one chunk, else one upsert per chunk.
+
+        Chunk upserts carry the parent reference in their URL (`<url>#chunk=<i>`, or
+        `sha:<content hash>#chunk=<i>` without a URL) so search can collapse to the parent.
+        """
+        parts = self.split(d.content)
+        head = list(islice(parts, 2))
+        if len(head) < 2:
+            yield d
+            return
+        parent = d.url or content_ref(d.content)
+        for i, text in enumerate(chain(head, parts)):
+            yield DocumentUpsert(id=None, org_id=d.org_id, title=d.title, url=chunk_url(parent, i), content=text, published_at=d.published_at)
+
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    it = iter(items)
+    while True:
+        batch = list(islice(it, size))
+        if not batch:
+            return
+        yield batch
+
+
+def collapse_chunks(results: Sequence[dict], k: int) -> List[dict]:
+    """Keep the best-scoring hit per parent document (results must be best first).
+
+    Collapsed hits get the parent URL back (or, without one, its `sha:` reference
+    as `ref`) and a `chunk` index of the matching chunk.
+    """
+    out: List[dict] = []
+    seen = set()
+    for r in results:
+        parent, idx = split_chunk_url(r.get("url"))
+        key = (r.get("org_id"), parent) if parent else (r.get("org_id"), "id", r.get("id"))
+        if key in seen:
+            continue
+        seen.add(key)
+        if idx is not None:
+            if parent.startswith("sha:"):
+                r = {**r, "url": None, "ref": parent, "chunk": idx}
+            else:
+                r = {**r, "url": parent, "chunk": idx}
+        out.append(r)
+        if len(out) >= k:
+            break
+    return out
+
+
+async def search_parents(fetch: Callable[[int], Awaitable[List[dict]]], k: int, overfetch: int = 4) -> List[dict]:
+    """Top `k` parent documents from a chunk-level search.
+
+    `fetch(limit)` returns up to `limit` hits, best first. The limit starts at
+    `k * overfetch` and grows 4x while the hits collapse to fewer than `k`
+    parents and the corpus still had more to give, so one long document cannot
+    crowd out the rest.
+    """
+    limit = max(k * overfetch, k)
+    while True:
+        hits = await fetch(limit)
+        out = collapse_chunks(hits, k)
+        if len(out) >= k or len(hits) < limit:
+            return out
+        limit *= 4
+
+
+__all__ = ["TokenChunker", "batched", "chunk_url", "collapse_chunks", "search_parents", "split_chunk_url"]
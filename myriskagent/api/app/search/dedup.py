@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import hashlib
+from collections import defaultdict
+from dataclasses import replace
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from .analysis import words
+from .vector import DocumentUpsert, document_key
+
+# MinHash permutations are computed modulo a Mersenne prime; with 31-bit operands
+# a * x + b stays within uint64.
+_PRIME = np.uint64((1 << 31) - 1)
+
+DocKey = Tuple[int, str]
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Word k-shingles; texts shorter than `size` words form a single shingle."""
+    toks = words(text)
+    if not toks:
+        return set()
+    if len(toks) <= size:
+        return {" ".join(toks)}
+    return {" ".join(toks[i : i + size]) for i in range(len(toks) - size + 1)}
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 128, seed: int = 1) -> None:
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, items: Iterable[str]) -> np.ndarray:
+        hv = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in items),
+            dtype=np.uint64,
+        )
+        if hv.size == 0:
+            return np.full(self.num_perm, int(_PRIME), dtype=np.uint64)
+        hv %= _PRIME
+        return ((np.outer(hv, self._a) + self._b) % _PRIME).min(axis=0)
+
+
+class NearDuplicateIndex:
+    """Clusters near-duplicate documents per org with MinHash + LSH banding.
+
+    `filter` runs at upsert time: it returns only the documents that should be
+    embedded and indexed (one canonical copy per cluster) and keeps the
+    suppressed near-duplicates, whose URLs are reported as alternates of their
+    canonical document. When a canonical document is removed its duplicates are
+    handed back so they can be ingested, and clustered, again.
+    """
+
+    def __init__(self, threshold: float = 0.8, num_perm: int = 128, bands: int = 32, shingle_size: int = 3) -> None:
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self._hasher = MinHasher(num_perm)
+        self._sigs: Dict[DocKey, np.ndarray] = {}
+        self._buckets: Dict[Tuple[int, int, bytes], Set[DocKey]] = defaultdict(set)
+        self._canonical_of: Dict[DocKey, DocKey] = {}
+        # canonical key -> its suppressed documents, in arrival order
+        self._duplicates: Dict[DocKey, Dict[DocKey, DocumentUpsert]] = defaultdict(dict)
+        self.suppressed = 0
+
+    def __len__(self) -> int:
+        return len(self._sigs)
+
+    def _band_keys(self, org_id: int, sig: np.ndarray) -> List[Tuple[int, int, bytes]]:
+        return [(org_id, b, sig[b * self.rows : (b + 1) * self.rows].tobytes()) for b in range(self.bands)]
+
+    def _index(self, key: DocKey, sig: np.ndarray) -> None:
+        old = self._sigs.get(key)
+        if old is not None:
+            for bk in self._band_keys(key[0], old):
+                self._buckets[bk].discard(key)
+        self._sigs[key] = sig
+        for bk in self._band_keys(key[0], sig):
+            self._buckets[bk].add(key)
+
+    def _suppress(self, key: DocKey, canon: DocKey, d: DocumentUpsert) -> None:
+        self._canonical_of[key] = canon
+        self._duplicates[canon][key] = replace(d, tokens=None)
+        self.suppressed += 1
+
+    def find(self, org_id: int, sig: np.ndarray) -> Optional[DocKey]:
+        """Return the best canonical document in `org_id` at or above the similarity threshold."""
+        candidates: Set[DocKey] = set()
+        for bk in self._band_keys(org_id, sig):
+            candidates |= self._buckets.get(bk, set())
+        best, best_sim = None, self.threshold
+        for cand in candidates:
+            sim = float(np.mean(self._sigs[cand] == sig))
+            if sim >= best_sim:
+                best, best_sim = cand, sim
+        return best
+
+    def filter(self, docs: Sequence[DocumentUpsert]) -> List[DocumentUpsert]:
+        keep: List[DocumentUpsert] = []
+        for d in docs:
+            key = document_key(d)
+            if key in self._canonical_of:
+                self._suppress(key, self._canonical_of[key], d)
+                continue
+            sig = self._hasher.signature(shingles(d.content, self.shingle_size))
+            if key not in self._sigs:
+                canon = self.find(d.org_id, sig)
+                if canon is not None:
+                    self._suppress(key, canon, d)
+                    continue
+            self._index(key, sig)
+            keep.append(d)
+        return keep
+
+    def remove(self, key: DocKey) -> List[DocumentUpsert]:
+        """Forget a document and return the near-duplicates it suppressed.
+
+        The returned documents are no longer tracked; passing them through
+        `filter` again promotes the first to canonical and re-checks the rest.
+        """
+        sig = self._sigs.pop(key, None)
+        if sig is not None:
+            for bk in self._band_keys(key[0], sig):
+                bucket = self._buckets.get(bk)
+                if bucket is not None:
+                    bucket.discard(key)
+                    if not bucket:
+                        del self._buckets[bk]
+        canon = self._canonical_of.pop(key, None)
+        if canon is not None:
+            dups = self._duplicates.get(canon, {})
+            dups.pop(key, None)
+            if not dups:
+                self._duplicates.pop(canon, None)
+        released = list(self._duplicates.pop(key, {}).values())
+        for d in released:
+            self._canonical_of.pop(document_key(d), None)
+        return released
+
+    def alternates(self, org_id: Optional[int], url: Optional[str]) -> List[str]:
+        if org_id is None or not url:
+            return []
+        return [d.url for d in self._duplicates.get((org_id, url), {}).values() if d.url]
+
+    def to_dict(self) -> dict:
+        """JSON-serializable state (signatures and suppressed documents) for search snapshots."""
+        return {
+            "num_perm": self._hasher.num_perm,
+            "bands": self.bands,
+            "sigs": [[org, ref, sig.tolist()] for (org, ref), sig in self._sigs.items()],
+            "duplicates": [
+                [org, ref, d.title, d.url, d.content, d.published_at]
+                for (org, ref), dups in self._duplicates.items()
+                for d in dups.values()
+            ],
+        }
+
+    def restore(self, data: dict) -> None:
+        """Replace the index with a `to_dict` state; ignored if it was built with other hashing parameters."""
+        if data.get("num_perm") != self._hasher.num_perm or data.get("bands") != self.bands:
+            return
+        self._sigs.clear()
+        self._buckets.clear()
+        self._canonical_of.clear()
+        self._duplicates.clear()
+        for org, ref, sig in data.get("sigs", []):
+            self._index((int(org), ref), np.asarray(sig, dtype=np.uint64))
+        for org, ref, title, url, content, published_at in data.get("duplicates", []):
+            d = DocumentUpsert(id=None, org_id=int(org), title=title, url=url, content=content, published_at=published_at)
+            key = document_key(d)
+            self._canonical_of[key] = (int(org), ref)
+            self._duplicates[(int(org), ref)][key] = d
+
+    def canonical_url(self, org_id: Optional[int], url: str) -> str:
+        """Map a suppressed near-duplicate's URL to its canonical document's URL."""
+        if org_id is None:
+            return url
+        canon = self._canonical_of.get((org_id, url))
+        if canon is None or canon[1].startswith("sha:"):
+            return url
+        return canon[1]
+
+    def annotate(self, results: List[dict]) -> List[dict]:
+        """Attach `alternate_urls` to search results whose document has near-duplicates."""
+        for r in results:
+            alts = self.alternates(r.get("org_id"), r.get("url"))
+            if alts:
+                r["alternate_urls"] = alts
+        return results
+
+
+__all__ = ["shingles", "MinHasher", "NearDuplicateIndex"]
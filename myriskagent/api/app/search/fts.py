@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import asyncio
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from .chunking import search_parents
+from .keyword import postgres_fts_query
+from .snippets import cap_bytes
+from .vector import content_ref
+
+try:
+    from sqlalchemy.ext.asyncio import AsyncEngine  # type: ignore
+except Exception:  # pragma: no cover
+    AsyncEngine = None  # type: ignore
+
+# Plain-text headlines; the web client applies its own highlighting
+_HEADLINE_OPTS = 'StartSel="", StopSel="", MaxWords=35, MinWords=15, MaxFragments=2, FragmentDelimiter=" ... "'
+
+
+def _fts_sql(org_filter: str) -> str:
+    # Rank over the GIN-matched rows, then build headlines only for the top k
+    return f"""
+        with hits as (
+            select id, org_id, title, url, published_at, content,
+                   ts_rank_cd(search_tsv, q, 32) as score, q
+            from document, to_tsquery('english', :tsq) as q
+            where search_tsv @@ q {org_filter}
+            order by score desc
+            limit :k
+        )
+        select id, org_id, title, url, published_at, score,
+               case when url is null then content end as body,
+               ts_headline('english', coalesce(content, ''), q, :opts) as snippet
+        from hits
+        order by score desc
+        """
+
+
+class PostgresFTS:
+    """Keyword search over the `document` table's generated `search_tsv` column (migration 0003).
+
+    Ranks with ts_rank_cd (normalized by document length), filters by org and
+    returns ts_headline snippets. Queries require all terms first and fall back
+    to any term when nothing matches. Works on an async engine (asyncpg) or a
+    sync engine, which is run in a worker thread. Headlines are capped at
+    `snippet_max_bytes` UTF-8 bytes.
+    """
+
+    def __init__(self, engine, overfetch: int = 4, snippet_max_bytes: int = 320) -> None:
+        self.engine = engine
+        self.overfetch = overfetch
+        self.snippet_max_bytes = snippet_max_bytes
+
+    def _params(self, tsq: str, org_id: Optional[int], limit: int) -> dict:
+        params = {"tsq": tsq, "k": limit, "opts": _HEADLINE_OPTS}
+        if org_id is not None:
+            params["org_id"] = org_id
+        return params
+
+    def _search_sync(self, sql: str, params: dict) -> List[dict]:
+        with self.engine.connect() as conn:
+            return [dict(r) for r in conn.execute(text(sql), params).mappings().all()]
+
+    async def _run(self, sql: str, params: dict) -> List[dict]:
+        if AsyncEngine is not None and isinstance(self.engine, AsyncEngine):
+            async with self.engine.connect() as conn:
+                return [dict(r) for r in (await conn.execute(text(sql), params)).mappings().all()]
+        assert isinstance(self.engine, Engine)
+        return await asyncio.to_thread(self._search_sync, sql, params)
+
+    async def search(self, query: str, org_id: Optional[int], k: int = 10) -> List[dict]:
+        sql = _fts_sql("and org_id = :org_id" if org_id is not None else "")
+        results: List[dict] = []
+        for op in ("&", "|"):
+            tsq = postgres_fts_query(query, op)
+            if tsq == "''":
+                return []
+
+            async def fetch(limit: int) -> List[dict]:
+                rows = await self._run(sql, self._params(tsq, org_id, limit))
+                return [
+                    {
+                        "id": r["id"],
+                        "org_id": r["org_id"],
+                        "title": r["title"],
+                        "url": r["url"],
+                        "published_at": r["published_at"],
+                        "snippet": cap_bytes(r["snippet"] or "", self.snippet_max_bytes),
+                        "score": float(r["score"] or 0.0),
+                        # URL-less rows are matched to other retrievers' hits by content
+                        **({"ref": content_ref(r["body"])} if r["body"] is not None else {}),
+                    }
+                    for r in rows
+                ]
+
+            # Chunked documents are stored one row per chunk
+            results = await search_parents(fetch, k, self.overfetch)
+            if results:
+                break
+        return results
+
+
+__all__ = ["PostgresFTS"]
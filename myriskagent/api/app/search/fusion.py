@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+from typing import Callable, Dict, Hashable, List, Mapping, Optional, Sequence
+
+
+def result_key(r: dict) -> Hashable:
+    """Identity used to merge hits for the same document coming from different retrievers.
+
+    Matches document_key: (org_id, url), or (org_id, `ref`) for hits without a URL,
+    which every retriever fills with the `sha:<content hash>` reference.
+    """
+    ref = r.get("url") or r.get("ref")
+    if ref:
+        return (r.get("org_id"), ref)
+    return (r.get("org_id"), "title", r.get("title") or "", str(r.get("id")))
+
+
+def reciprocal_rank_fusion(
+    ranked: Mapping[str, Sequence[dict]],
+    k: int = 60,
+    limit: Optional[int] = None,
+    key: Callable[[dict], Hashable] = result_key,
+) -> List[dict]:
+    """Fuse ranked result lists with reciprocal rank fusion (score = sum 1 / (k + rank)).
+
+    `ranked` maps a retriever name to its results, best first. Hits for the same
+    document are merged into one entry; `ranks` records where each retriever
+    placed it.
+    """
+    merged: Dict[Hashable, dict] = {}
+    for name, results in ranked.items():
+        for rank, r in enumerate(results, start=1):
+            doc_key = key(r)
+            entry = merged.get(doc_key)
+            if entry is None:
+                entry = merged[doc_key] = {**r, "score": 0.0, "ranks": {}}
+            else:
+                for field, value in r.items():
+                    if entry.get(field) in (None, "") and field not in ("score", "ranks"):
+                        entry[field] = value
+            if name not in entry["ranks"]:
+                entry["ranks"][name] = rank
+                entry["score"] += 1.0 / (k + rank)
+    out = sorted(merged.values(), key=lambda e: e["score"], reverse=True)
+    return out[:limit] if limit is not None else out
+
+
+__all__ = ["reciprocal_rank_fusion", "result_key"]
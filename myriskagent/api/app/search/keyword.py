@@ -1,13 +1,17 @@
 from __future__ import annotations
 
+import heapq
 import math
-import re
 from collections import Counter, defaultdict
-from typing import Iterable, List, Tuple
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .analysis import AnalyzedText, Analyzer, default_analyzer, words
 
 
 def tokenize(text: str) -> List[str]:
-    return [t for t in re.findall(r"[A-Za-z0-9_]+", text.lower()) if t]
+    return default_analyzer().terms(text)
 
 
 def bm25_score(query: str, documents: Iterable[Tuple[str, str]], k1: float = 1.5, b: float = 0.75):
@@ -42,9 +46,166 @@ def bm25_score(query: str, documents: Iterable[Tuple[str, str]], k1: float = 1.5
     return sorted(scores.items(), key=lambda x: x[1], reverse=True)
 
 
-def postgres_fts_query(query: str) -> str:
-    """Return a tsquery string for Postgres FTS (simple parsing)."""
-    terms = tokenize(query)
+class InvertedIndex:
+    """Incrementally maintained BM25 index: term id -> org -> {doc_id: term frequency}.
+
+    Document lengths and per-org corpus statistics are cached, so a query only
+    touches the postings of its terms. Top-k retrieval uses MaxScore pruning:
+    once the k-th best score exceeds the summed upper bounds of the remaining
+    query terms, documents that only contain those terms are never scored.
+    Statistics (N, df, avgdl) are computed within the org being searched, or
+    over all orgs when `org_id` is None, matching `bm25_score` on that subset.
+
+    Terms are the analyzer's interned ids; `add_tokens` indexes an already
+    analyzed text, so callers that keep the token array never re-tokenize.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, analyzer: Optional[Analyzer] = None) -> None:
+        self.k1 = k1
+        self.b = b
+        self.analyzer = analyzer or default_analyzer()
+        self._postings: Dict[int, Dict[int, Dict[Hashable, int]]] = defaultdict(dict)
+        # Upper bound on any document's tf for a term (not lowered on removal; still a valid bound)
+        self._max_tf: Dict[int, int] = {}
+        self._doc_len: Dict[Hashable, int] = {}
+        self._doc_org: Dict[Hashable, int] = {}
+        self._doc_terms: Dict[Hashable, Tuple[int, ...]] = {}
+        self._org_docs: Counter = Counter()
+        self._org_len: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._doc_len)
+
+    def __contains__(self, doc_id: Hashable) -> bool:
+        return doc_id in self._doc_len
+
+    def add(self, doc_id: Hashable, org_id: int, text: str) -> None:
+        """Index a document, replacing any previous version with the same id."""
+        self.add_tokens(doc_id, org_id, self.analyzer.analyze(text).ids)
+
+    def add_tokens(self, doc_id: Hashable, org_id: int, ids: np.ndarray | AnalyzedText) -> None:
+        """Index a document from its term ids (or analyzed text), replacing any previous version."""
+        if isinstance(ids, AnalyzedText):
+            ids = ids.ids
+        self.remove(doc_id)
+        terms, counts = np.unique(ids, return_counts=True)
+        terms_l, counts_l = terms.tolist(), counts.tolist()
+        for term, n in zip(terms_l, counts_l):
+            self._postings[term].setdefault(org_id, {})[doc_id] = n
+            if n > self._max_tf.get(term, 0):
+                self._max_tf[term] = n
+        dl = len(ids)
+        self._doc_len[doc_id] = dl
+        self._doc_org[doc_id] = org_id
+        self._doc_terms[doc_id] = tuple(terms_l)
+        self._org_docs[org_id] += 1
+        self._org_len[org_id] += dl
+
+    def remove(self, doc_id: Hashable) -> None:
+        if doc_id not in self._doc_len:
+            return
+        org = self._doc_org.pop(doc_id)
+        for term in self._doc_terms.pop(doc_id):
+            by_org = self._postings[term]
+            plist = by_org[org]
+            plist.pop(doc_id, None)
+            if not plist:
+                del by_org[org]
+                if not by_org:
+                    del self._postings[term]
+                    self._max_tf.pop(term, None)
+        self._org_docs[org] -= 1
+        self._org_len[org] -= self._doc_len.pop(doc_id)
+
+    def _lists(self, term: int, org_id: Optional[int]) -> List[Dict[Hashable, int]]:
+        by_org = self._postings.get(term)
+        if not by_org:
+            return []
+        if org_id is not None:
+            plist = by_org.get(org_id)
+            return [plist] if plist else []
+        return list(by_org.values())
+
+    def idf(self, term: int, org_id: Optional[int] = None) -> float:
+        """BM25 idf of a term id within `org_id` (or all orgs); 0.0 for unseen terms."""
+        n_docs = self._org_docs[org_id] if org_id is not None else len(self._doc_len)
+        df = sum(len(p) for p in self._lists(term, org_id))
+        if df == 0:
+            return 0.0
+        return math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, org_id: Optional[int] = None, k: int = 10) -> List[Tuple[Hashable, float]]:
+        """Return up to k (doc_id, score) pairs, best first."""
+        if k <= 0:
+            return []
+        if org_id is not None:
+            n_docs, total_len = self._org_docs[org_id], self._org_len[org_id]
+        else:
+            n_docs, total_len = len(self._doc_len), sum(self._org_len.values())
+        if n_docs == 0:
+            return []
+        avgdl = total_len / n_docs or 1.0
+        k1, b = self.k1, self.b
+
+        terms = []  # (upper bound, weight, term, postings lists)
+        for term, qtf in Counter(self.analyzer.lookup(query).tolist()).items():
+            lists = self._lists(term, org_id)
+            df = sum(len(p) for p in lists)
+            if df == 0:
+                continue
+            # Repeated query terms count once per occurrence, as in bm25_score
+            w = qtf * math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            max_tf = self._max_tf[term]
+            ub = w * (max_tf * (k1 + 1)) / (max_tf + k1 * (1 - b))
+            terms.append((ub, w, term, lists))
+        if not terms:
+            return []
+        terms.sort(key=lambda t: t[0], reverse=True)
+        # remaining[i] = summed upper bounds of terms i.. (lowest bounds last)
+        remaining = [0.0] * (len(terms) + 1)
+        for i in range(len(terms) - 1, -1, -1):
+            remaining[i] = remaining[i + 1] + terms[i][0]
+
+        heap: List[Tuple[float, int, Hashable]] = []
+        seen = set()
+        for i, (_, w, _, lists) in enumerate(terms):
+            # Unscored docs only contain terms i.., so they cannot beat the current k-th score
+            if len(heap) == k and remaining[i] <= heap[0][0]:
+                break
+            for plist in lists:
+                for doc_id, tf in plist.items():
+                    if doc_id in seen:
+                        continue
+                    seen.add(doc_id)
+                    org = self._doc_org[doc_id]
+                    norm = k1 * (1 - b + b * self._doc_len[doc_id] / avgdl)
+                    # Terms before i were scanned in full without meeting this doc
+                    score = w * (tf * (k1 + 1)) / (tf + norm)
+                    pruned = False
+                    for j in range(i + 1, len(terms)):
+                        if len(heap) == k and score + remaining[j] <= heap[0][0]:
+                            pruned = True
+                            break
+                        tf_j = self._postings[terms[j][2]].get(org, {}).get(doc_id)
+                        if tf_j:
+                            score += terms[j][1] * (tf_j * (k1 + 1)) / (tf_j + norm)
+                    if pruned:
+                        continue
+                    entry = (score, -len(seen), doc_id)
+                    if len(heap) < k:
+                        heapq.heappush(heap, entry)
+                    elif score > heap[0][0]:
+                        heapq.heapreplace(heap, entry)
+        return [(doc_id, score) for score, _, doc_id in sorted(heap, reverse=True)]
+
+
+def postgres_fts_query(query: str, operator: str = "&") -> str:
+    """Return a tsquery string for Postgres FTS (simple parsing).
+
+    Terms are joined with `operator`: "&" requires all terms, "|" any of them.
+    """
+    # Postgres applies its own stemming, so terms are passed unstemmed
+    terms = words(query)
     if not terms:
         return "''"
-    return " & ".join(terms)
+    return f" {operator} ".join(terms)
@@ -0,0 +1,446 @@
+from __future__ import annotations
+
+import tempfile
+import weakref
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Rows scored per block when decoding approximate scores; keeps the float32 upcast cache-sized
+_BLOCK = 1024
+
+
+def _kmeans(x: np.ndarray, k: int, n_iter: int = 8, seed: int = 0) -> np.ndarray:
+    """Plain (Euclidean) Lloyd's k-means used to train PQ sub-codebooks."""
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, x.shape[0]))
+    cent = x[rng.choice(x.shape[0], size=k, replace=False)].copy()
+    for _ in range(n_iter):
+        d = (x * x).sum(1, keepdims=True) - 2 * x @ cent.T + (cent * cent).sum(1)
+        assign = np.argmin(d, axis=1)
+        sums = np.zeros_like(cent)
+        np.add.at(sums, assign, x)
+        counts = np.bincount(assign, minlength=k)
+        nonempty = counts > 0
+        cent[nonempty] = sums[nonempty] / counts[nonempty, None]
+    return cent.astype(np.float32)
+
+
+class Int8Codec:
+    """Symmetric per-vector scalar quantization to int8 (dim + 4 bytes per vector)."""
+
+    name = "int8"
+
+    def __init__(self, dim: int) -> None:
+        self.dim = dim
+        self.trained = True
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.dim + 4
+
+    def alloc(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        return np.zeros((n, self.dim), dtype=np.int8), np.zeros(n, dtype=np.float32)
+
+    def encode(self, vecs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        scale = np.abs(vecs).max(axis=1) / 127.0
+        scale[scale == 0] = 1.0
+        codes = np.clip(np.rint(vecs / scale[:, None]), -127, 127).astype(np.int8)
+        return codes, scale.astype(np.float32)
+
+    def scores(self, q: np.ndarray, codes: np.ndarray, aux: np.ndarray) -> np.ndarray:
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        for s in range(0, codes.shape[0], _BLOCK):
+            block = codes[s : s + _BLOCK].astype(np.float32)
+            out[s : s + _BLOCK] = (block @ q) * aux[s : s + _BLOCK]
+        return out
+
+
+class PQCodec:
+    """Product quantization: `m` sub-vectors, each coded as one of 256 centroids (m bytes per vector).
+
+    Sub-codebooks are trained once `train_size` vectors are available; approximate
+    inner products use per-query lookup tables (asymmetric distance computation).
+    """
+
+    name = "pq"
+
+    def __init__(self, dim: int, m: int = 96, train_size: int = 1024) -> None:
+        # Use the largest sub-vector count <= m that divides dim
+        while m > 1 and dim % m:
+            m -= 1
+        self.dim = dim
+        self.m = m
+        self.dsub = dim // m
+        self.train_size = train_size
+        self.codebooks: Optional[np.ndarray] = None  # (m, ksub, dsub)
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    @property
+    def bytes_per_vector(self) -> int:
+        return self.m
+
+    def alloc(self, n: int) -> Tuple[np.ndarray, np.ndarray]:
+        return np.zeros((n, self.m), dtype=np.uint8), np.zeros(0, dtype=np.float32)
+
+    def train(self, vecs: np.ndarray) -> None:
+        sub = vecs.reshape(vecs.shape[0], self.m, self.dsub)
+        books = [_kmeans(sub[:, j, :], 256, seed=j) for j in range(self.m)]
+        ksub = max(b.shape[0] for b in books)
+        self.codebooks = np.zeros((self.m, ksub, self.dsub), dtype=np.float32)
+        for j, b in enumerate(books):
+            self.codebooks[j, : b.shape[0]] = b
+            # Pad short codebooks with a duplicate; argmin ties resolve to the real centroid
+            self.codebooks[j, b.shape[0] :] = b[0]
+
+    def encode(self, vecs: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        assert self.codebooks is not None
+        sub = vecs.reshape(vecs.shape[0], self.m, self.dsub)
+        codes = np.empty((vecs.shape[0], self.m), dtype=np.uint8)
+        for j in range(self.m):
+            cb = self.codebooks[j]
+            d = (cb * cb).sum(1) - 2 * sub[:, j, :] @ cb.T
+            codes[:, j] = np.argmin(d, axis=1)
+        return codes, np.zeros(0, dtype=np.float32)
+
+    def scores(self, q: np.ndarray, codes: np.ndarray, aux: np.ndarray) -> np.ndarray:
+        assert self.codebooks is not None
+        lut = np.einsum("mkd,md->mk", self.codebooks, q.reshape(self.m, self.dsub))
+        out = np.empty(codes.shape[0], dtype=np.float32)
+        cols = np.arange(self.m)
+        for s in range(0, codes.shape[0], _BLOCK):
+            out[s : s + _BLOCK] = lut[cols, codes[s : s + _BLOCK]].sum(axis=1)
+        return out
+
+
+class FloatSpill:
+    """Float32 vector file shared by many segments, memory-mapped read/write.
+
+    Holds the full-precision copies used only to re-rank a handful of candidates,
+    so they live in the page cache rather than the worker heap. Rows are
+    addressed by slot; freed slots are reused and the file grows by doubling,
+    so one file descriptor and one mapping serve every segment of a store.
+    """
+
+    def __init__(self, dim: int, directory: Optional[str] = None) -> None:
+        self.dim = dim
+        self._fh = tempfile.TemporaryFile(dir=directory)
+        self._end = 0
+        self._free: List[int] = []
+        self._map: Optional[np.memmap] = None
+
+    def __len__(self) -> int:
+        """Number of live (allocated) slots."""
+        return self._end - len(self._free)
+
+    @property
+    def capacity(self) -> int:
+        return 0 if self._map is None else int(self._map.shape[0])
+
+    def _reserve(self, need: int) -> None:
+        if need <= self.capacity:
+            return
+        cap = max(need, self.capacity * 2, 1024)
+        if self._map is not None:
+            self._map.flush()
+        self._fh.truncate(cap * self.dim * 4)
+        self._map = np.memmap(self._fh, dtype=np.float32, mode="r+", shape=(cap, self.dim))
+
+    def alloc(self, vecs: np.ndarray) -> np.ndarray:
+        """Store `vecs` in free (or new) slots and return the slot numbers."""
+        n = vecs.shape[0]
+        reused = [self._free.pop() for _ in range(min(n, len(self._free)))]
+        fresh = list(range(self._end, self._end + n - len(reused)))
+        self._reserve(self._end + len(fresh))
+        self._end += len(fresh)
+        slots = np.asarray(reused + fresh, dtype=np.int64)
+        assert self._map is not None
+        self._map[slots] = vecs
+        return slots
+
+    def free(self, slots: Sequence[int]) -> None:
+        self._free.extend(int(s) for s in slots)
+
+    def live_slots(self) -> np.ndarray:
+        mask = np.ones(self._end, dtype=bool)
+        mask[self._free] = False
+        return np.flatnonzero(mask)
+
+    def write(self, slot: int, vec: np.ndarray) -> None:
+        assert self._map is not None
+        self._map[slot] = vec
+
+    def rows(self, slots: np.ndarray | int) -> np.ndarray:
+        assert self._map is not None
+        return np.array(self._map[slots])
+
+
+class SpillRows:
+    """One segment's rows in a shared FloatSpill: row i lives in slot `slots[i]`.
+
+    Slots are returned to the spill when the owning segment is garbage collected.
+    """
+
+    def __init__(self, spill: FloatSpill) -> None:
+        self.spill = spill
+        self._slots = np.zeros(0, dtype=np.int64)
+        self._n = 0
+
+    def __len__(self) -> int:
+        return self._n
+
+    def append(self, vecs: np.ndarray) -> None:
+        slots = self.spill.alloc(vecs)
+        need = self._n + slots.shape[0]
+        if need > self._slots.shape[0]:
+            grown = np.zeros(max(need, self._slots.shape[0] * 2, 16), dtype=np.int64)
+            grown[: self._n] = self._slots[: self._n]
+            self._slots = grown
+        self._slots[self._n : need] = slots
+        self._n = need
+
+    def write(self, i: int, vec: np.ndarray) -> None:
+        self.spill.write(int(self._slots[i]), vec)
+
+    def swap_remove(self, i: int) -> None:
+        """Free row i's slot and move the last row's slot into its place."""
+        last = self._n - 1
+        self.spill.free([self._slots[i]])
+        self._slots[i] = self._slots[last]
+        self._n = last
+
+    def rows(self, idx: np.ndarray | slice | int) -> np.ndarray:
+        return self.spill.rows(self._slots[: self._n][idx])
+
+    def release(self) -> None:
+        self.spill.free(self._slots[: self._n])
+        self._n = 0
+
+
+# Re-rank depth per mode: int8 scores are near-exact, PQ codes need a deeper candidate pool
+DEFAULT_RERANK = {"int8": 4, "pq": 32}
+
+
+class QuantizedStorage:
+    """Codec and spill file shared by every QuantizedSegment of one store.
+
+    A PQ codebook is trained once across all segments, as soon as `pq_train_size`
+    vectors exist in total, so small orgs are quantized too and the codebook is
+    not duplicated per org. Until then rows are scored exactly.
+    """
+
+    def __init__(
+        self, mode: str = "int8", pq_m: int = 96, pq_train_size: int = 4096, spill_dir: Optional[str] = None
+    ) -> None:
+        if mode not in DEFAULT_RERANK:
+            raise ValueError(f"Unsupported quantization mode: {mode}")
+        self.mode = mode
+        self.pq_m = pq_m
+        self.pq_train_size = pq_train_size
+        self.spill_dir = spill_dir
+        self.dim: Optional[int] = None
+        self.codec: Int8Codec | PQCodec | None = None
+        self.spill: Optional[FloatSpill] = None
+
+    def ensure(self, dim: int) -> None:
+        if self.dim is None:
+            self.dim = dim
+            self.codec = Int8Codec(dim) if self.mode == "int8" else PQCodec(dim, m=self.pq_m, train_size=self.pq_train_size)
+            self.spill = FloatSpill(dim, self.spill_dir)
+        elif dim != self.dim:
+            raise ValueError(f"Vector dimension {dim} does not match the store's {self.dim}")
+
+    def ready(self) -> bool:
+        """Train the PQ codebook once enough vectors have arrived; True when codes can be used."""
+        assert self.codec is not None and self.spill is not None
+        if self.codec.trained:
+            return True
+        assert isinstance(self.codec, PQCodec)
+        if len(self.spill) < self.codec.train_size:
+            return False
+        live = self.spill.live_slots()
+        rng = np.random.default_rng(0)
+        sample = np.sort(rng.choice(live, size=self.codec.train_size, replace=False))
+        self.codec.train(self.spill.rows(sample))
+        return True
+
+
+class QuantizedSegment:
+    """Drop-in VectorSegment variant that keeps only compressed codes in memory.
+
+    Search scores all rows on the codes, then re-ranks the best
+    `k * rerank_factor` candidates against the full-precision spill file.
+    New rows are encoded in batches of `encode_batch` (or at the next search);
+    until then, and until a PQ codec is trained, they are scored exactly from
+    the spill file. Pass a shared `storage` so a store's segments use one
+    codec and one spill file; otherwise the segment gets its own.
+    """
+
+    def __init__(
+        self,
+        mode: str = "int8",
+        dim: Optional[int] = None,
+        rerank_factor: Optional[int] = None,
+        pq_m: int = 96,
+        pq_train_size: int = 4096,
+        spill_dir: Optional[str] = None,
+        encode_batch: int = 256,
+        storage: Optional[QuantizedStorage] = None,
+    ) -> None:
+        self.storage = storage if storage is not None else QuantizedStorage(mode, pq_m=pq_m, pq_train_size=pq_train_size, spill_dir=spill_dir)
+        self.mode = self.storage.mode
+        self.dim = dim
+        self.rerank_factor = rerank_factor or DEFAULT_RERANK[self.mode]
+        self.encode_batch = encode_batch
+        self.codec: Int8Codec | PQCodec | None = None
+        self._spill: Optional[SpillRows] = None
+        self._codes = np.zeros((0, 0), dtype=np.int8)
+        self._aux = np.zeros(0, dtype=np.float32)
+        self._n_coded = 0
+        self._size = 0
+        self.ids: List[Hashable] = []
+        self.org_ids: List[int] = []
+        self.titles: List[str] = []
+        self.urls: List[Optional[str]] = []
+        self._row_by_id: Dict[Hashable, int] = {}
+        if dim is not None:
+            self._init_dim(dim)
+
+    def _init_dim(self, dim: int) -> None:
+        self.storage.ensure(dim)
+        assert self.storage.codec is not None and self.storage.spill is not None
+        self.dim = dim
+        self.codec = self.storage.codec
+        self._codes, self._aux = self.codec.alloc(0)
+        self._spill = SpillRows(self.storage.spill)
+        weakref.finalize(self, self._spill.release)
+
+    def __len__(self) -> int:
+        return self._size
+
+    def index_of(self, did: Hashable) -> Optional[int]:
+        return self._row_by_id.get(did)
+
+    def empty_like(self) -> "QuantizedSegment":
+        return QuantizedSegment(
+            self.mode, self.dim, self.rerank_factor, encode_batch=self.encode_batch, storage=self.storage
+        )
+
+    @property
+    def memory_bytes(self) -> int:
+        """Bytes of in-memory vector payload (codes plus per-vector scales)."""
+        return int(self._codes[: self._n_coded].nbytes + self._aux[: self._n_coded].nbytes)
+
+    def vector(self, i: int) -> np.ndarray:
+        assert self._spill is not None
+        return self._spill.rows(i)
+
+    def _encode_pending(self) -> None:
+        if self._n_coded < self._size and self.storage.ready():
+            self._encode_rows(self._n_coded, self._size)
+
+    def _encode_rows(self, start: int, end: int) -> None:
+        assert self.codec is not None and self._spill is not None
+        codes, aux = self.codec.encode(self._spill.rows(slice(start, end)))
+        if end > self._codes.shape[0]:
+            cap = max(end, self._codes.shape[0] * 2, 16)
+            new_codes, new_aux = self.codec.alloc(cap)
+            new_codes[: self._n_coded] = self._codes[: self._n_coded]
+            if new_aux.size:
+                new_aux[: self._n_coded] = self._aux[: self._n_coded]
+            self._codes, self._aux = new_codes, new_aux
+        self._codes[start:end] = codes
+        if aux.size:
+            self._aux[start:end] = aux
+        self._n_coded = end
+
+    def add(self, did: Hashable, org_id: int, title: str, url: Optional[str], vec: Sequence[float]) -> None:
+        v = np.asarray(vec, dtype=np.float32)
+        if self.codec is None:
+            self._init_dim(int(v.shape[0]))
+        assert self.codec is not None and self._spill is not None
+        v = v / (float(np.linalg.norm(v)) or 1.0)
+        self._spill.append(v.reshape(1, -1))
+        self._row_by_id[did] = self._size
+        self._size += 1
+        self.ids.append(did)
+        self.org_ids.append(org_id)
+        self.titles.append(title)
+        self.urls.append(url)
+        if self._size - self._n_coded >= self.encode_batch:
+            self._encode_pending()
+
+    def replace(self, i: int, title: str, url: Optional[str], vec: Optional[Sequence[float]] = None) -> None:
+        """Overwrite row i in place, re-encoding its code if the vector changes."""
+        if vec is not None and self.codec is not None and self._spill is not None:
+            v = np.asarray(vec, dtype=np.float32)
+            v = v / (float(np.linalg.norm(v)) or 1.0)
+            self._spill.write(i, v)
+            if i < self._n_coded:
+                self._recode(i, v)
+        self.titles[i] = title
+        self.urls[i] = url
+
+    def _recode(self, i: int, v: np.ndarray) -> None:
+        assert self.codec is not None
+        codes, aux = self.codec.encode(v.reshape(1, -1))
+        self._codes[i] = codes[0]
+        if aux.size:
+            self._aux[i] = aux[0]
+
+    def remove(self, did: Hashable) -> bool:
+        """Delete a row, moving the last row (vector, code and metadata) into its place."""
+        i = self._row_by_id.pop(did, None)
+        if i is None:
+            return False
+        assert self._spill is not None
+        last = self._size - 1
+        cols = (self.ids, self.org_ids, self.titles, self.urls)
+        self._spill.swap_remove(i)
+        if i != last:
+            if last < self._n_coded:
+                self._codes[i] = self._codes[last]
+                if self._aux.size:
+                    self._aux[i] = self._aux[last]
+            elif i < self._n_coded:
+                self._recode(i, self._spill.rows(i))
+            for col in cols:
+                col[i] = col[last]
+            self._row_by_id[self.ids[i]] = i
+        for col in cols:
+            col.pop()
+        self._size = last
+        self._n_coded = min(self._n_coded, last)
+        return True
+
+    def search(self, q: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        if self._size == 0 or k <= 0 or self.codec is None or self._spill is None:
+            return []
+        self._encode_pending()
+        approx = np.empty(self._size, dtype=np.float32)
+        if self._n_coded:
+            approx[: self._n_coded] = self.codec.scores(q, self._codes[: self._n_coded], self._aux[: self._n_coded])
+        if self._n_coded < self._size:
+            approx[self._n_coded :] = self._spill.rows(slice(self._n_coded, self._size)) @ q
+        n_cand = min(self._size, max(k, k * self.rerank_factor))
+        cand = np.argpartition(-approx, n_cand - 1)[:n_cand] if self._size > n_cand else np.arange(self._size)
+        cand = np.sort(cand)
+        exact = self._spill.rows(cand) @ q
+        order = np.argsort(-exact)[:k]
+        return [(float(exact[j]), int(cand[j])) for j in order]
+
+    def row(self, i: int, score: float) -> dict:
+        return {"id": self.ids[i], "org_id": self.org_ids[i], "title": self.titles[i], "url": self.urls[i], "score": score}
+
+    def without_org(self, org_id: int) -> "QuantizedSegment":
+        out = self.empty_like()
+        for i, o in enumerate(self.org_ids):
+            if o != org_id:
+                out.add(self.ids[i], o, self.titles[i], self.urls[i], self.vector(i))
+        return out
+
+
+__all__ = ["DEFAULT_RERANK", "Int8Codec", "PQCodec", "FloatSpill", "SpillRows", "QuantizedStorage", "QuantizedSegment"]
@@ -0,0 +1,252 @@
+from __future__ import annotations
+
+import heapq
+from typing import Callable, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class VectorSegment:
+    """Block of unit vectors (float32 matrix) with parallel metadata rows.
+
+    One segment holds the documents of a single org, so an org-filtered query is a
+    single matrix-vector product over that org's rows only. Rows are appended;
+    removing one moves the last row into its place.
+    """
+
+    def __init__(self, dim: Optional[int] = None) -> None:
+        self.dim = dim
+        self._mat = np.zeros((0, dim or 0), dtype=np.float32)
+        self._size = 0
+        self.ids: List[Hashable] = []
+        self.org_ids: List[int] = []
+        self.titles: List[str] = []
+        self.urls: List[Optional[str]] = []
+        self._row_by_id: Dict[Hashable, int] = {}
+
+    @classmethod
+    def from_arrays(
+        cls,
+        mat: np.ndarray,
+        ids: List[Hashable],
+        org_ids: List[int],
+        titles: List[str],
+        urls: List[Optional[str]],
+    ) -> "VectorSegment":
+        """Wrap an existing row-normalized matrix without copying it.
+
+        `mat` may be a copy-on-write memory map (np.load(..., mmap_mode="c")); rows are
+        paged in as searches touch them and the first append copies it into memory.
+        """
+        seg = cls(int(mat.shape[1]))
+        seg._mat = mat
+        seg._size = int(mat.shape[0])
+        seg.ids, seg.org_ids, seg.titles, seg.urls = list(ids), list(org_ids), list(titles), list(urls)
+        seg._row_by_id = {did: i for i, did in enumerate(seg.ids)}
+        return seg
+
+    def __len__(self) -> int:
+        return self._size
+
+    def index_of(self, did: Hashable) -> Optional[int]:
+        return self._row_by_id.get(did)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._mat[: self._size]
+
+    @property
+    def memory_bytes(self) -> int:
+        return int(self.vectors.nbytes)
+
+    def vector(self, i: int) -> np.ndarray:
+        return self._mat[i]
+
+    def empty_like(self) -> "VectorSegment":
+        return VectorSegment(self.dim)
+
+    def _reserve(self, extra: int) -> None:
+        need = self._size + extra
+        if need <= self._mat.shape[0]:
+            return
+        new_cap = max(need, self._mat.shape[0] * 2, 16)
+        grown = np.zeros((new_cap, self.dim or 0), dtype=np.float32)
+        grown[: self._size] = self._mat[: self._size]
+        self._mat = grown
+
+    def add(self, did: Hashable, org_id: int, title: str, url: Optional[str], vec: Sequence[float]) -> None:
+        v = np.asarray(vec, dtype=np.float32)
+        if self.dim is None:
+            self.dim = int(v.shape[0])
+            self._mat = np.zeros((0, self.dim), dtype=np.float32)
+        n = float(np.linalg.norm(v)) or 1.0
+        self._reserve(1)
+        self._mat[self._size] = v / n
+        self._row_by_id[did] = self._size
+        self._size += 1
+        self.ids.append(did)
+        self.org_ids.append(org_id)
+        self.titles.append(title)
+        self.urls.append(url)
+
+    def replace(self, i: int, title: str, url: Optional[str], vec: Optional[Sequence[float]] = None) -> None:
+        """Overwrite row i in place; the vector is kept when `vec` is None."""
+        if vec is not None:
+            v = np.asarray(vec, dtype=np.float32)
+            self._mat[i] = v / (float(np.linalg.norm(v)) or 1.0)
+        self.titles[i] = title
+        self.urls[i] = url
+
+    def remove(self, did: Hashable) -> bool:
+        i = self._row_by_id.pop(did, None)
+        if i is None:
+            return False
+        last = self._size - 1
+        cols = (self.ids, self.org_ids, self.titles, self.urls)
+        if i != last:
+            self._mat[i] = self._mat[last]
+            for col in cols:
+                col[i] = col[last]
+            self._row_by_id[self.ids[i]] = i
+        for col in cols:
+            col.pop()
+        self._size = last
+        return True
+
+    def search(self, q: np.ndarray, k: int) -> List[Tuple[float, int]]:
+        """Return up to k (cosine score, row) pairs, best first. `q` must be unit-norm."""
+        if self._size == 0 or k <= 0:
+            return []
+        scores = self.vectors @ q
+        if self._size > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(self._size)
+        top = top[np.argsort(-scores[top])]
+        return [(float(scores[i]), int(i)) for i in top]
+
+    def row(self, i: int, score: float) -> dict:
+        return {"id": self.ids[i], "org_id": self.org_ids[i], "title": self.titles[i], "url": self.urls[i], "score": score}
+
+    def without_org(self, org_id: int) -> "VectorSegment":
+        """Return a copy of this segment with one org's rows removed."""
+        out = self.empty_like()
+        for i, o in enumerate(self.org_ids):
+            if o != org_id:
+                out.add(self.ids[i], o, self.titles[i], self.urls[i], self._mat[i])
+        return out
+
+
+# Any object with VectorSegment's interface (add/remove/search/row/vector/empty_like/without_org)
+Segment = VectorSegment
+
+
+class OrgSegments:
+    """Vector segments partitioned by org, plus an optional global segment.
+
+    Org-filtered searches touch only that org's segment. Cross-org searches use the
+    global segment when enabled, otherwise they merge per-segment top-k results.
+    Segments can be loaded and evicted independently, or deferred with a loader
+    that runs the first time the org is touched. `segment_factory` builds new
+    segments, e.g. a QuantizedSegment for compressed storage.
+    """
+
+    def __init__(self, keep_global: bool = False, segment_factory: Callable[[], Segment] = VectorSegment) -> None:
+        self.segment_factory = segment_factory
+        self._segments: Dict[int, Segment] = {}
+        self._deferred: Dict[int, Tuple[Callable[[], Segment], int]] = {}
+        self.global_segment: Optional[Segment] = segment_factory() if keep_global else None
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self._segments.values()) + sum(n for _, n in self._deferred.values())
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._segments) + list(self._deferred))
+
+    @property
+    def deferred(self) -> List[int]:
+        return list(self._deferred)
+
+    def defer_segment(self, org_id: int, loader: Callable[[], Segment], size: int = 0) -> None:
+        """Register `loader` to build an org's segment on first use instead of now."""
+        self.evict_segment(org_id)
+        self._deferred[org_id] = (loader, size)
+
+    def _materialize(self, org_id: Optional[int] = None) -> None:
+        orgs = [org_id] if org_id is not None else list(self._deferred)
+        for org in orgs:
+            entry = self._deferred.pop(org, None)
+            if entry is not None:
+                self.load_segment(org, entry[0]())
+
+    @property
+    def memory_bytes(self) -> int:
+        return sum(s.memory_bytes for s in self._segments.values())
+
+    def segment(self, org_id: int) -> Optional[Segment]:
+        self._materialize(org_id)
+        return self._segments.get(org_id)
+
+    def add(self, did: Hashable, org_id: int, title: str, url: Optional[str], vec: Optional[Sequence[float]]) -> None:
+        """Insert a row, or replace the row with the same id in place.
+
+        `vec` may be None only when replacing (metadata-only update).
+        """
+        self._materialize(org_id)
+        if self.global_segment is not None:
+            self._materialize()
+        seg = self._segments.get(org_id)
+        if seg is None:
+            seg = self._segments[org_id] = self.segment_factory()
+        targets = [seg] if self.global_segment is None else [seg, self.global_segment]
+        for target in targets:
+            row = target.index_of(did)
+            if row is not None:
+                target.replace(row, title, url, vec)
+            elif vec is not None:
+                target.add(did, org_id, title, url, vec)
+
+    def remove(self, did: Hashable, org_id: int) -> int:
+        """Delete a row from its org's segment (and the global one); returns 1 if it existed."""
+        seg = self.segment(org_id)
+        removed = seg is not None and seg.remove(did)
+        if self.global_segment is not None:
+            self.global_segment.remove(did)
+        return int(removed)
+
+    def load_segment(self, org_id: int, seg: Segment) -> None:
+        """Install a prebuilt segment for an org, replacing any resident one."""
+        self.evict_segment(org_id)
+        self._segments[org_id] = seg
+        if self.global_segment is not None:
+            for i in range(len(seg)):
+                self.global_segment.add(seg.ids[i], seg.org_ids[i], seg.titles[i], seg.urls[i], seg.vector(i))
+
+    def evict_segment(self, org_id: int) -> Optional[Segment]:
+        """Drop an org's segment from memory and return it (None if not resident)."""
+        self._deferred.pop(org_id, None)
+        seg = self._segments.pop(org_id, None)
+        if seg is not None and self.global_segment is not None:
+            self.global_segment = self.global_segment.without_org(org_id)
+        return seg
+
+    def search(self, q: Sequence[float], org_id: Optional[int], k: int = 5) -> List[dict]:
+        qv = np.asarray(q, dtype=np.float32)
+        qv = qv / (float(np.linalg.norm(qv)) or 1.0)
+        if org_id is not None:
+            seg = self.segment(org_id)
+            if seg is None:
+                return []
+            return [seg.row(i, s) for s, i in seg.search(qv, k)]
+        self._materialize()
+        if self.global_segment is not None:
+            return [self.global_segment.row(i, s) for s, i in self.global_segment.search(qv, k)]
+        candidates = []
+        for seg in self._segments.values():
+            for s, i in seg.search(qv, k):
+                candidates.append((s, i, seg))
+        top = heapq.nlargest(k, candidates, key=lambda c: c[0])
+        return [seg.row(i, s) for s, i, seg in top]
+
+
+__all__ = ["VectorSegment", "OrgSegments"]
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import io
+import json
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.storage.io import ObjectStore
+
+from .dedup import NearDuplicateIndex
+from .segments import VectorSegment
+from .vector import DocumentKeys, InMemoryVectorStore
+
+# Two slots are written alternately and CURRENT is switched last, so a crash
+# mid-write leaves the previous snapshot intact.
+_SLOTS = ("a", "b")
+
+
+@dataclass
+class SnapshotState:
+    """Copy of the in-memory search state, taken between store calls and written after."""
+
+    keys: dict
+    segments: Dict[int, dict]
+    keyword_docs: List[dict]
+    near_dups: Optional[dict] = None
+    created_at: str = field(default_factory=lambda: datetime.utcnow().isoformat() + "Z")
+
+
+def _segment_matrix(seg) -> np.ndarray:
+    if isinstance(seg, VectorSegment):
+        return np.array(seg.vectors, dtype=np.float32)
+    if len(seg) == 0:
+        return np.zeros((0, seg.dim or 0), dtype=np.float32)
+    return np.stack([np.asarray(seg.vector(i), dtype=np.float32) for i in range(len(seg))])
+
+
+class SearchSnapshots:
+    """Snapshots of InMemoryVectorStore segments and the keyword corpus in the object store.
+
+    Layout under `prefix`: CURRENT names the live slot; each slot holds
+    manifest.json, keyword.json, near_dups.json (when near-duplicate clustering is
+    on), and per org `org-<id>.npy` (float32 rows) plus
+    `org-<id>.json` (ids, titles, urls). Restoring reads only the manifest and the
+    keyword corpus; each org's matrix is memory-mapped when the org is first queried.
+    """
+
+    def __init__(self, store: ObjectStore, prefix: str = "snapshots/search") -> None:
+        self.store = store
+        self.prefix = prefix.rstrip("/")
+
+    def capture(self, vs: InMemoryVectorStore, keyword_docs: List[dict], near_dups: Optional[dict] = None) -> SnapshotState:
+        """Copy `vs`'s segments; `near_dups` is a NearDuplicateIndex.to_dict() state."""
+        segments = {}
+        for org in vs.segments:
+            seg = vs.segments.segment(org)
+            if seg is None or len(seg) == 0:
+                continue
+            segments[org] = {
+                "matrix": _segment_matrix(seg),
+                "ids": list(seg.ids),
+                "titles": list(seg.titles),
+                "urls": list(seg.urls),
+            }
+        return SnapshotState(
+            keys=vs.keys.to_dict(),
+            segments=segments,
+            keyword_docs=[dict(d) for d in keyword_docs],
+            near_dups=near_dups,
+        )
+
+    def _current_slot(self) -> Optional[str]:
+        try:
+            slot = self.store.get_text(f"{self.prefix}/CURRENT").strip()
+        except FileNotFoundError:
+            return None
+        return slot if slot in _SLOTS else None
+
+    def write(self, state: SnapshotState) -> str:
+        """Write `state` to the inactive slot and switch CURRENT to it; returns the slot."""
+        cur = self._current_slot()
+        slot = _SLOTS[1] if cur == _SLOTS[0] else _SLOTS[0]
+        base = f"{self.prefix}/{slot}"
+        orgs = {}
+        for org, seg in state.segments.items():
+            buf = io.BytesIO()
+            np.save(buf, seg["matrix"], allow_pickle=False)
+            self.store.put_bytes(f"{base}/org-{org}.npy", buf.getvalue())
+            self.store.put_text(
+                f"{base}/org-{org}.json",
+                json.dumps({"ids": seg["ids"], "titles": seg["titles"], "urls": seg["urls"]}),
+            )
+            orgs[str(org)] = int(seg["matrix"].shape[0])
+        self.store.put_text(f"{base}/keyword.json", json.dumps(state.keyword_docs))
+        if state.near_dups is not None:
+            self.store.put_text(f"{base}/near_dups.json", json.dumps(state.near_dups))
+        manifest = {"created_at": state.created_at, "orgs": orgs, "keys": state.keys}
+        self.store.put_text(f"{base}/manifest.json", json.dumps(manifest))
+        self.store.put_text(f"{self.prefix}/CURRENT", slot)
+        return slot
+
+    def restore(self, vs: InMemoryVectorStore, near_dups: Optional[NearDuplicateIndex] = None) -> Optional[List[dict]]:
+        """Install the latest snapshot into `vs` lazily and return its keyword corpus.
+
+        `near_dups` is restored too when the snapshot has its state. Returns None
+        (leaving `vs` untouched) when there is no snapshot.
+        """
+        slot = self._current_slot()
+        if slot is None:
+            return None
+        base = f"{self.prefix}/{slot}"
+        try:
+            manifest = json.loads(self.store.get_text(f"{base}/manifest.json"))
+            keyword_docs = json.loads(self.store.get_text(f"{base}/keyword.json"))
+        except FileNotFoundError:
+            return None
+        vs.keys = DocumentKeys.from_dict(manifest.get("keys", {}))
+        if near_dups is not None:
+            try:
+                near_dups.restore(json.loads(self.store.get_text(f"{base}/near_dups.json")))
+            except FileNotFoundError:
+                pass
+        for org, size in manifest.get("orgs", {}).items():
+            vs.segments.defer_segment(int(org), self._loader(vs, base, int(org)), size=int(size))
+        return keyword_docs
+
+    def _loader(self, vs: InMemoryVectorStore, base: str, org: int):
+        def load():
+            mat = np.load(self.store.local_path(f"{base}/org-{org}.npy"), mmap_mode="c")
+            meta = json.loads(self.store.get_text(f"{base}/org-{org}.json"))
+            ids = meta["ids"]
+            seg = vs.segments.segment_factory()
+            if isinstance(seg, VectorSegment):
+                return VectorSegment.from_arrays(mat, ids, [org] * len(ids), meta["titles"], meta["urls"])
+            # Compressed segments re-encode from the float rows; no embedding calls either way
+            for i, did in enumerate(ids):
+                seg.add(did, org, meta["titles"][i], meta["urls"][i], mat[i])
+            return seg
+
+        return load
+
+
+__all__ = ["SearchSnapshots", "SnapshotState"]
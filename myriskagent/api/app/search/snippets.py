@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .analysis import AnalyzedText
+
+_ELLIPSIS = "…"
+
+
+@dataclass
+class Snippet:
+    text: str
+    # [start, end) character spans of query terms within `text`
+    highlights: List[Tuple[int, int]] = field(default_factory=list)
+
+
+def _utf8_len(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def cap_bytes(text: str, max_bytes: int) -> str:
+    """Trim `text` to at most `max_bytes` UTF-8 bytes, at a word boundary when possible."""
+    if max_bytes <= 0 or _utf8_len(text) <= max_bytes:
+        return text
+    budget = max_bytes - _utf8_len(_ELLIPSIS)
+    cut = text.encode("utf-8")[: max(budget, 0)].decode("utf-8", errors="ignore")
+    space = cut.rfind(" ")
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + _ELLIPSIS
+
+
+def lead_snippet(content: str, max_bytes: int) -> Snippet:
+    """Opening text of a document, for results with no query to bias towards."""
+    return Snippet(cap_bytes(content.strip(), max_bytes))
+
+
+def _best_window(
+    ids: np.ndarray, positions: np.ndarray, window: int, weights: Mapping[int, float]
+) -> Tuple[int, int]:
+    """Token range [lo, hi) of at most `window` tokens with the best match score.
+
+    A window scores the summed weight of the distinct query terms it contains,
+    plus a tenth of a weight for each repeat, so windows covering more (and
+    rarer) query terms win over ones that repeat a single term. Candidates start
+    at each match; the match positions are walked with two pointers.
+    """
+    best, best_lo, best_hi = -1.0, int(positions[0]), int(positions[0]) + 1
+    counts: Counter = Counter()
+    score = 0.0
+    j = 0
+    terms = ids[positions].tolist()
+    pos = positions.tolist()
+    for i, start in enumerate(pos):
+        while j < len(pos) and pos[j] < start + window:
+            t = terms[j]
+            w = weights.get(t, 1.0)
+            score += w if counts[t] == 0 else 0.1 * w
+            counts[t] += 1
+            j += 1
+        if score > best:
+            best, best_lo, best_hi = score, start, pos[j - 1] + 1
+        # Slide past match i
+        t = terms[i]
+        w = weights.get(t, 1.0)
+        counts[t] -= 1
+        score -= w if counts[t] == 0 else 0.1 * w
+    return best_lo, best_hi
+
+
+def query_snippet(
+    content: str,
+    analyzed: AnalyzedText,
+    query_ids: Iterable[int],
+    max_bytes: int = 320,
+    window: int = 32,
+    weights: Optional[Mapping[int, float]] = None,
+) -> Snippet:
+    """Query-biased snippet from a document's analyzed token array.
+
+    Picks the `window`-token span with the best match score, pads it with context
+    on both sides up to `window` tokens, and trims it to `max_bytes` UTF-8 bytes
+    (ellipses included). Falls back to the opening text when nothing matches.
+    """
+    q = np.fromiter(query_ids, dtype=np.int32)
+    positions = np.flatnonzero(np.isin(analyzed.ids, q)) if len(q) and len(analyzed) else np.zeros(0, dtype=np.int64)
+    if len(positions) == 0:
+        return lead_snippet(content, max_bytes)
+    lo, hi = _best_window(analyzed.ids, positions, window, weights or {})
+    # Centre the matches in the window, then shrink from the far side until it fits
+    pad = max(window - (hi - lo), 0)
+    lo = max(lo - pad // 2, 0)
+    hi = min(hi + (pad - pad // 2), len(analyzed))
+    starts, ends = analyzed.starts, analyzed.ends
+    n = len(analyzed)
+    while True:
+        # Whole-document edges keep their leading/trailing punctuation
+        s = int(starts[lo]) if lo > 0 else len(content) - len(content.lstrip())
+        e = int(ends[hi - 1]) if hi < n else len(content.rstrip())
+        prefix = _ELLIPSIS if lo > 0 else ""
+        suffix = _ELLIPSIS if hi < n else ""
+        text = prefix + content[s:e] + suffix
+        if hi - lo <= 1 or max_bytes <= 0 or _utf8_len(text) <= max_bytes:
+            break
+        # Drop a context token from the side with more of it; with none left, drop trailing matches
+        inside = positions[(positions >= lo) & (positions < hi)]
+        left, right = int(inside[0]) - lo, hi - 1 - int(inside[-1])
+        if left > right:
+            lo += 1
+        else:
+            hi -= 1
+    if max_bytes > 0 and _utf8_len(text) > max_bytes:
+        # A single oversized token
+        return Snippet(cap_bytes(text, max_bytes))
+    offset = len(prefix) - s
+    highlights = [
+        (int(starts[p]) + offset, int(ends[p]) + offset) for p in positions.tolist() if lo <= p < hi
+    ]
+    return Snippet(text, highlights)
+
+
+__all__ = ["Snippet", "cap_bytes", "lead_snippet", "query_snippet"]
@@ -1,14 +1,21 @@
 from __future__ import annotations
 
+import hashlib
+import itertools
 import math
 import os
 import re
-from dataclasses import dataclass
-from typing import Callable, Iterable, List, Optional, Sequence, Tuple
+from dataclasses import dataclass, field
+from functools import partial
+from typing import Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple
 
 from sqlalchemy import text
 from sqlmodel import create_engine
 
+from .analysis import AnalyzedText, default_analyzer, hash_vector
+from .quantization import QuantizedSegment, QuantizedStorage
+from .segments import OrgSegments, VectorSegment
+
 try:
     import openai  # type: ignore
 except Exception:  # pragma: no cover
@@ -20,20 +27,13 @@ except Exception:  # pragma: no cover
     chromadb = None  # type: ignore
 
 
-def _tokenize(text: str) -> List[str]:
-    return re.findall(r"[A-Za-z0-9_]+", text.lower())
+def hash_embed(text: str, dim: int = 1536) -> List[float]:
+    return hash_vector(default_analyzer().hashes(text), dim)
 
 
-def hash_embed(text: str, dim: int = 1536) -> List[float]:
-    vec = [0.0] * dim
-    tokens = _tokenize(text)
-    if not tokens:
-        return vec
-    for tok in tokens:
-        h = hash(tok) % dim
-        vec[h] += 1.0
-    norm = math.sqrt(sum(v * v for v in vec)) or 1.0
-    return [v / norm for v in vec]
+def hash_embed_tokens(analyzed: AnalyzedText, dim: int = 1536) -> List[float]:
+    """`hash_embed` from an already analyzed text, using the vocabulary's cached term hashes."""
+    return hash_vector(default_analyzer().vocab.hashes(analyzed.ids), dim)
 
 
 def get_embedder(dim: int = 1536) -> Callable[[str], List[float]]:
@@ -73,6 +73,143 @@ class DocumentUpsert:
     url: Optional[str]
     content: str
     published_at: Optional[str] = None
+    # Analyzed `content`, filled once at ingest so indexes and the hashing embedder reuse it
+    tokens: Optional[AnalyzedText] = field(default=None, repr=False, compare=False)
+
+
+def content_hash(text: str) -> str:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def content_ref(content: str) -> str:
+    """Reference of a document without a URL (`sha:<content hash>`), as used in its document_key."""
+    return f"sha:{content_hash(content)}"
+
+
+def document_key(d: DocumentUpsert) -> Tuple[int, str]:
+    """Identity of a document for upserts: (org_id, url), or (org_id, content hash) without a URL."""
+    return (d.org_id, d.url or content_ref(d.content))
+
+
+def _with_refs(results: List[dict], keys: DocumentKeys) -> List[dict]:
+    """Give URL-less hits the `ref` of their document_key, so other retrievers' hits can be matched to them."""
+    for r in results:
+        if not r.get("url"):
+            h = keys.content_hash_of(r["id"])
+            if h is not None:
+                r["ref"] = f"sha:{h}"
+    return results
+
+
+class DocumentKeys:
+    """Maps document keys to stable ids and remembers content hashes.
+
+    `resolve` returns the existing id for a known key (so the caller replaces the
+    entry in place) and whether the content changed (so unchanged re-ingests can
+    skip re-embedding).
+    """
+
+    def __init__(self) -> None:
+        self._ids: Dict[Tuple[int, str], Hashable] = {}
+        self._hashes: Dict[Hashable, str] = {}
+        self._next_id = 1
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def resolve(self, d: DocumentUpsert, new_id: Optional[Callable[[], Hashable]] = None) -> Tuple[Hashable, bool]:
+        key = document_key(d)
+        did = self._ids.get(key)
+        if did is None:
+            if new_id is not None:
+                did = new_id()
+            else:
+                did = self._next_id
+                self._next_id += 1
+            self._ids[key] = did
+        h = content_hash(d.content)
+        changed = self._hashes.get(did) != h
+        self._hashes[did] = h
+        return did, changed
+
+    def _pop(self, key: Tuple[int, str]) -> Optional[Hashable]:
+        did = self._ids.pop(key, None)
+        if did is not None:
+            self._hashes.pop(did, None)
+        return did
+
+    def forget(self, d: DocumentUpsert) -> List[Hashable]:
+        """Drop `d`'s key and its chunks' keys (`<ref>#chunk=<i>`); returns the ids they had."""
+        org, ref = document_key(d)
+        ids = [self._pop((org, ref))]
+        for i in itertools.count():
+            did = self._pop((org, f"{ref}#chunk={i}"))
+            if did is None:
+                break
+            ids.append(did)
+        return [did for did in ids if did is not None]
+
+    def content_hash_of(self, did: Hashable) -> Optional[str]:
+        return self._hashes.get(did)
+
+    def needs_embedding(self, d: DocumentUpsert) -> bool:
+        """True when `d` is new or its content changed since it was last resolved."""
+        did = self._ids.get(document_key(d))
+        return did is None or self._hashes.get(did) != content_hash(d.content)
+
+    def to_dict(self) -> dict:
+        return {
+            "next_id": self._next_id,
+            "keys": [[org, ref, did, self._hashes.get(did)] for (org, ref), did in self._ids.items()],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "DocumentKeys":
+        inst = cls()
+        inst._next_id = int(data.get("next_id", 1))
+        for org, ref, did, h in data.get("keys", []):
+            inst._ids[(int(org), ref)] = did
+            if h is not None:
+                inst._hashes[did] = h
+        return inst
+
+
+# Suffix of chunk upserts' URLs (see chunking.chunk_url)
+_CHUNK_SUFFIX = re.compile(r"#chunk=\d+$")
+
+# Precomputed embeddings passed to `upsert_documents`, keyed by `content_hash(content)`
+Embeddings = Mapping[str, List[float]]
+
+
+def _embedding_for(d: DocumentUpsert, embeddings: Optional[Embeddings], embed: Callable[[str], List[float]]) -> List[float]:
+    vec = embeddings.get(content_hash(d.content)) if embeddings else None
+    return vec if vec is not None else embed(d.content)
+
+
+def _delete_sql(d: DocumentUpsert) -> Tuple[str, dict]:
+    """Statement deleting `d`'s row in the `document` table and its `<ref>#chunk=<i>` rows."""
+    ref = d.url or f"sha:{content_hash(d.content)}"
+    chunks = ref.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "#chunk=%"
+    params = {"org_id": d.org_id, "chunks": chunks}
+    if d.url:
+        match = "url = :url"
+        params["url"] = d.url
+    else:
+        match = "(url is null and md5(content) = md5(:content))"
+        params["content"] = d.content
+    return f"delete from document where org_id = :org_id and ({match} or url like :chunks)", params
+
+
+# New and changed rows are written with one statement: with the unique index on
+# (org_id, url) (migration 0005), concurrent ingests of a URL update the same row.
+# URL-less rows never conflict (NULLs are distinct) and are matched by content.
+_UPSERT_SQL = """
+    insert into document (org_id, source_id, title, url, published_at, content, embedding, created_at)
+    values (:org_id, NULL, :title, :url, :published_at, :content, :embedding, now())
+    on conflict (org_id, url) do update
+    set title = excluded.title, published_at = excluded.published_at,
+        content = excluded.content, embedding = excluded.embedding
+"""
 
 
 class PgVectorStore:
@@ -81,52 +218,60 @@ class PgVectorStore:
         self.dim = 1536
         self._embed = get_embedder(self.dim)
 
-    def upsert_documents(self, docs: Sequence[DocumentUpsert]) -> int:
+    def upsert_documents(self, docs: Sequence[DocumentUpsert], embeddings: Optional[Embeddings] = None) -> int:
         if not docs:
             return 0
         inserted = 0
         with self.engine.begin() as conn:
             for d in docs:
-                emb = self._embed(d.content)
+                # Same (org_id, url), or same content when there is no URL, updates in place
                 if d.url:
-                    row = conn.execute(text("select id from document where url = :url limit 1"), {"url": d.url}).first()
-                    if row:
-                        conn.execute(
-                            text(
-                                "update document set title=:title, content=:content, published_at=:published_at, embedding=:embedding where id=:id"
-                            ),
-                            {
-                                "title": d.title,
-                                "content": d.content,
-                                "published_at": d.published_at,
-                                "embedding": emb,
-                                "id": row[0],
-                            },
-                        )
-                        inserted += 1
-                        continue
-                conn.execute(
-                    text(
-                        "insert into document (org_id, source_id, title, url, published_at, content, embedding, created_at) values (:org_id, NULL, :title, :url, :published_at, :content, :embedding, now())"
-                    ),
-                    {
-                        "org_id": d.org_id,
-                        "title": d.title,
-                        "url": d.url,
-                        "published_at": d.published_at,
-                        "content": d.content,
-                        "embedding": emb,
-                    },
-                )
+                    row = conn.execute(
+                        text("select id, md5(content) = md5(:content) from document where org_id = :org_id and url = :url limit 1"),
+                        {"org_id": d.org_id, "url": d.url, "content": d.content},
+                    ).first()
+                else:
+                    row = conn.execute(
+                        text("select id, true from document where org_id = :org_id and url is null and md5(content) = md5(:content) limit 1"),
+                        {"org_id": d.org_id, "content": d.content},
+                    ).first()
+                if row and row[1]:
+                    # Unchanged content keeps its embedding
+                    conn.execute(
+                        text("update document set title=:title, published_at=:published_at where id=:id"),
+                        {"title": d.title, "published_at": d.published_at, "id": row[0]},
+                    )
+                else:
+                    conn.execute(
+                        text(_UPSERT_SQL),
+                        {
+                            "org_id": d.org_id,
+                            "title": d.title,
+                            "url": d.url,
+                            "published_at": d.published_at,
+                            "content": d.content,
+                            "embedding": _embedding_for(d, embeddings, self._embed),
+                        },
+                    )
                 inserted += 1
         return inserted
 
-    def search(self, query: str, org_id: Optional[int], k: int = 5) -> List[dict]:
-        q_emb = self._embed(query)
+    def delete_documents(self, docs: Sequence[DocumentUpsert]) -> int:
+        """Delete the rows of `docs` (matched like upserts) and of their chunks; returns rows deleted."""
+        deleted = 0
+        with self.engine.begin() as conn:
+            for d in docs:
+                sql, params = _delete_sql(d)
+                deleted += conn.execute(text(sql), params).rowcount or 0
+        return deleted
+
+    def search(self, query: str, org_id: Optional[int], k: int = 5, query_vector: Optional[List[float]] = None) -> List[dict]:
+        q_emb = query_vector if query_vector is not None else self._embed(query)
         org_filter = "and org_id = :org_id" if org_id is not None else ""
         sql = text(
             f"""
             select id, org_id, title, url, published_at, left(content, 300) as snippet,
+                   case when url is null then content end as body,
                    (embedding <=> :qvec) as distance
             from document
             where embedding is not null {org_filter}
@@ -152,90 +297,122 @@ class PgVectorStore:
                     "score": 1.0 - float(r["distance"] or 1.0),
                 }
             )
+            if r["body"] is not None:
+                results[-1]["ref"] = content_ref(r["body"])
         return results
 
 
 class InMemoryVectorStore:
-    def __init__(self) -> None:
-        self.docs: List[Tuple[int, int, str, Optional[str], List[float]]] = []
-        self._next_id = 1
-        self._embed = get_embedder()
+    """Process-local vector store partitioned into one segment per org.
 
-    def upsert_documents(self, docs: Sequence[DocumentUpsert]) -> int:
+    Set `global_segment=True` to also keep a combined segment so cross-org
+    (org_id=None) queries are a single scan instead of a per-org merge.
+    `quantization` ("int8" or "pq") stores compressed codes in memory and
+    re-ranks the top `k * rerank_factor` candidates at full precision (by default
+    4 for int8 and 32 for PQ); all segments share one codec and spill file.
+    """
+
+    def __init__(
+        self,
+        global_segment: bool = False,
+        quantization: Optional[str] = None,
+        rerank_factor: Optional[int] = None,
+        spill_dir: Optional[str] = None,
+    ) -> None:
+        if quantization and quantization != "none":
+            storage = QuantizedStorage(quantization, spill_dir=spill_dir)
+            factory = partial(QuantizedSegment, rerank_factor=rerank_factor, storage=storage)
+        else:
+            factory = VectorSegment
+        self.segments = OrgSegments(keep_global=global_segment, segment_factory=factory)
+        self.keys = DocumentKeys()
+        self.dim = 1536
+        self._embed = get_embedder(self.dim)
+
+    def upsert_documents(self, docs: Sequence[DocumentUpsert], embeddings: Optional[Embeddings] = None) -> int:
         for d in docs:
-            emb = self._embed(d.content)
-            did = self._next_id
-            self._next_id += 1
-            self.docs.append((did, d.org_id, d.title or "", d.url, emb))
+            did, changed = self.keys.resolve(d)
+            emb = _embedding_for(d, embeddings, self._embed) if changed else None
+            self.segments.add(did, d.org_id, d.title or "", d.url, emb)
         return len(docs)
 
-    @staticmethod
-    def _cosine(a: List[float], b: List[float]) -> float:
-        dot = sum(x * y for x, y in zip(a, b))
-        na = math.sqrt(sum(x * x for x in a)) or 1.0
-        nb = math.sqrt(sum(y * y for y in b)) or 1.0
-        return dot / (na * nb)
-
-    def search(self, query: str, org_id: Optional[int], k: int = 5) -> List[dict]:
-        q = self._embed(query)
-        scored: List[Tuple[float, Tuple[int, int, str, Optional[str], List[float]]]] = []
-        for rec in self.docs:
-            if org_id is not None and rec[1] != org_id:
-                continue
-            scored.append((self._cosine(q, rec[4]), rec))
-        top = sorted(scored, key=lambda x: x[0], reverse=True)[:k]
-        out = []
-        for score, (did, o, title, url, _emb) in top:
-            out.append({"id": did, "org_id": o, "title": title, "url": url, "score": float(score)})
-        return out
+    def delete_documents(self, docs: Sequence[DocumentUpsert]) -> int:
+        deleted = 0
+        for d in docs:
+            for did in self.keys.forget(d):
+                deleted += self.segments.remove(did, d.org_id)
+        return deleted
+
+    def load_segment(self, org_id: int, segment: VectorSegment) -> None:
+        self.segments.load_segment(org_id, segment)
+
+    def evict_segment(self, org_id: int) -> Optional[VectorSegment]:
+        return self.segments.evict_segment(org_id)
+
+    def search(self, query: str, org_id: Optional[int], k: int = 5, query_vector: Optional[List[float]] = None) -> List[dict]:
+        q = query_vector if query_vector is not None else self._embed(query)
+        return _with_refs(self.segments.search(q, org_id=org_id, k=k), self.keys)
 
 
 class ChromaVectorStore:
     def __init__(self, persist_dir: Optional[str] = None) -> None:
-        self._embed = get_embedder()
+        self.dim = 1536
+        self._embed = get_embedder(self.dim)
+        self.keys: Optional[DocumentKeys] = None
         if chromadb is None:  # pragma: no cover
             self._client = None
-            self._docs: List[Tuple[str, int, str, Optional[str], List[float]]] = []
+            self._segments = OrgSegments()
+            self.keys = DocumentKeys()
         else:
             settings = chromadb.config.Settings(chroma_db_impl="duckdb+parquet", persist_directory=persist_dir) if persist_dir else None
             self._client = chromadb.Client(settings) if settings else chromadb.Client()
             self._coll = self._client.get_or_create_collection("documents")
 
-    def upsert_documents(self, docs: Sequence[DocumentUpsert]) -> int:
+    @property
+    def is_local(self) -> bool:
+        """True when running on the in-process fallback rather than a Chroma client."""
+        return self._client is None
+
+    def upsert_documents(self, docs: Sequence[DocumentUpsert], embeddings: Optional[Embeddings] = None) -> int:
         if chromadb is None:  # fallback in-memory
             for d in docs:
-                doc_id = d.url or f"doc-{len(self._docs)+1}"
-                self._docs.append((doc_id, d.org_id, d.title or "", d.url, self._embed(d.content)))
+                # Same id scheme as the Chroma collection; per org, so the content-hash skip never crosses orgs
+                doc_id, changed = self.keys.resolve(d, new_id=lambda: "{}:{}".format(*document_key(d)))
+                emb = _embedding_for(d, embeddings, self._embed) if changed else None
+                self._segments.add(doc_id, d.org_id, d.title or "", d.url, emb)
             return len(docs)
         ids = []
-        embeddings = []
+        vectors = []
         metadatas = []
         documents = []
         for d in docs:
-            ids.append(d.url or f"{d.org_id}-{len(ids)+1}")
-            embeddings.append(self._embed(d.content))
-            metadatas.append({"org_id": d.org_id, "title": d.title or ""})
+            org, ref = document_key(d)
+            ids.append(f"{org}:{ref}")
+            vectors.append(_embedding_for(d, embeddings, self._embed))
+            # The parent id (chunk suffix stripped) lets delete_documents find every chunk
+            metadatas.append({"org_id": d.org_id, "title": d.title or "", "parent": _CHUNK_SUFFIX.sub("", f"{org}:{ref}")})
             documents.append(d.content)
-        self._coll.upsert(ids=ids, embeddings=embeddings, metadatas=metadatas, documents=documents)
+        self._coll.upsert(ids=ids, embeddings=vectors, metadatas=metadatas, documents=documents)
+        return len(docs)
+
+    def delete_documents(self, docs: Sequence[DocumentUpsert]) -> int:
+        if chromadb is None:
+            deleted = 0
+            for d in docs:
+                for did in self.keys.forget(d):
+                    deleted += self._segments.remove(did, d.org_id)
+            return deleted
+        for d in docs:
+            parent = "{}:{}".format(*document_key(d))
+            self._coll.delete(ids=[parent])
+            self._coll.delete(where={"parent": parent})
         return len(docs)
 
-    def search(self, query: str, org_id: Optional[int], k: int = 5) -> List[dict]:
+    def search(self, query: str, org_id: Optional[int], k: int = 5, query_vector: Optional[List[float]] = None) -> List[dict]:
+        q = query_vector if query_vector is not None else self._embed(query)
         if chromadb is None:  # fallback search
-            q = self._embed(query)
-            scored: List[Tuple[float, Tuple[str, int, str, Optional[str], List[float]]]] = []
-            for rec in self._docs:
-                if org_id is not None and rec[1] != org_id:
-                    continue
-                dot = sum(x * y for x, y in zip(q, rec[4]))
-                nq = math.sqrt(sum(x * x for x in q)) or 1.0
-                nr = math.sqrt(sum(y * y for y in rec[4])) or 1.0
-                scored.append((dot / (nq * nr), rec))
-            top = sorted(scored, key=lambda x: x[0], reverse=True)[:k]
-            out = []
-            for score, (doc_id, o, title, url, _emb) in top:
-                out.append({"id": doc_id, "org_id": o, "title": title, "url": url, "score": float(score)})
-            return out
-        res = self._coll.query(query_embeddings=[self._embed(query)], n_results=k, where={"org_id": org_id} if org_id is not None else {})
+            return _with_refs(self._segments.search(q, org_id=org_id, k=k), self.keys)
+        res = self._coll.query(query_embeddings=[q], n_results=k, where={"org_id": org_id} if org_id is not None else {})
         out: List[dict] = []
         for i, _id in enumerate(res.get("ids", [[]])[0]):
             out.append({
@@ -243,9 +420,26 @@ class ChromaVectorStore:
                 "org_id": (res.get("metadatas", [[]])[0][i] or {}).get("org_id"),
                 "title": (res.get("metadatas", [[]])[0][i] or {}).get("title"),
                 "url": None,
+                # Ids are "<org>:<ref>" (see upsert_documents)
+                "ref": str(_id).split(":", 1)[-1],
                 "score": float(res.get("distances", [[]])[0][i]) if res.get("distances") else 0.0,
             })
         return out
 
 
-__all__ = ["hash_embed", "PgVectorStore", "InMemoryVectorStore", "DocumentUpsert", "get_embedder", "ChromaVectorStore"]
+__all__ = [
+    "hash_embed",
+    "hash_embed_tokens",
+    "PgVectorStore",
+    "InMemoryVectorStore",
+    "DocumentUpsert",
+    "DocumentKeys",
+    "document_key",
+    "content_hash",
+    "content_ref",
+    "get_embedder",
+    "ChromaVectorStore",
+    "VectorSegment",
+    "OrgSegments",
+    "QuantizedSegment",
+]
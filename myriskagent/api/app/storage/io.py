@@ -3,6 +3,7 @@ from __future__ import annotations
 import hashlib
 import json
 import os
+import tempfile
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
@@ -27,9 +28,28 @@ class ObjectStore:
     def put_bytes(self, key: str, data: bytes) -> str:
         path = self._local_path(key)
         path.parent.mkdir(parents=True, exist_ok=True)
-        path.write_bytes(data)
+        # Write-then-rename so readers (including memory maps of the old file) never see a partial object;
+        # the temp name is unique, so concurrent writers of one key (threads included) never share it
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except FileNotFoundError:
+                pass
+            raise
         return f"{self.base_uri.rstrip('/')}/{key}"
 
+    def local_path(self, key: str) -> Path:
+        """Filesystem path of an existing object, e.g. for np.load(..., mmap_mode=...)."""
+        path = self._local_path(key)
+        if not path.exists():
+            raise FileNotFoundError(key)
+        return path
+
     def get_bytes(self, key: str) -> bytes:
         path = self._local_path(key)
         return path.read_bytes()
@@ -0,0 +1,82 @@
+"""Recall@k / latency benchmark: IVF ANN index vs exact search.
+
+Run from myriskagent/api:
+    python -m benchmarks.bench_ann --n 20000 --dim 384 --k 10
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from app.search.ann import IVFIndex
+
+
+def make_corpus(n: int, dim: int, n_topics: int, seed: int, noise: float = 0.6) -> np.ndarray:
+    # Topic-clustered unit vectors, closer to real embeddings than isotropic noise
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(n_topics, dim))
+    vecs = topics[rng.integers(0, n_topics, size=n)] + noise * rng.normal(size=(n, dim))
+    return (vecs / np.linalg.norm(vecs, axis=1, keepdims=True)).astype(np.float32)
+
+
+def exact_topk(corpus: np.ndarray, q: np.ndarray, k: int) -> np.ndarray:
+    scores = corpus @ q
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def percentile_ms(samples: list[float], p: float) -> float:
+    return float(np.percentile(samples, p) * 1000.0)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--queries", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--nlist", type=int, default=128)
+    ap.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    # Queries come from the same topic mixture as the corpus but are not indexed
+    data = make_corpus(args.n + args.queries, args.dim, n_topics=max(16, args.nlist // 2), seed=args.seed)
+    corpus, queries = data[: args.n], data[args.n :]
+    ids = np.arange(args.n)
+    orgs = np.zeros(args.n, dtype=np.int64)
+
+    t0 = time.perf_counter()
+    index = IVFIndex(dim=args.dim, nlist=args.nlist)
+    # Insert in batches to exercise the incremental path and retraining
+    for start in range(0, args.n, 1000):
+        index.add(ids[start : start + 1000], orgs[start : start + 1000], corpus[start : start + 1000])
+    build_s = time.perf_counter() - t0
+    print(f"corpus n={args.n} dim={args.dim} nlist={args.nlist} build={build_s:.2f}s")
+
+    exact_lat: list[float] = []
+    truth = []
+    for q in queries:
+        t = time.perf_counter()
+        truth.append(set(exact_topk(corpus, q, args.k).tolist()))
+        exact_lat.append(time.perf_counter() - t)
+    print(f"exact     recall@{args.k}=1.000  p50={percentile_ms(exact_lat, 50):.2f}ms  p95={percentile_ms(exact_lat, 95):.2f}ms")
+
+    for nprobe in args.nprobe:
+        lat: list[float] = []
+        hits = 0
+        for q, gold in zip(queries, truth):
+            t = time.perf_counter()
+            res = index.search(q, k=args.k, nprobe=nprobe)
+            lat.append(time.perf_counter() - t)
+            hits += len(gold & {did for did, _ in res})
+        recall = hits / (len(truth) * args.k)
+        print(
+            f"ivf np={nprobe:<3} recall@{args.k}={recall:.3f}  p50={percentile_ms(lat, 50):.2f}ms  p95={percentile_ms(lat, 95):.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
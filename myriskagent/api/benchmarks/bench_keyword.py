@@ -0,0 +1,66 @@
+"""BM25 latency: inverted index with MaxScore pruning vs full-corpus scan.
+
+Run from myriskagent/api:
+    python -m benchmarks.bench_keyword --n 20000 --k 10
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+import numpy as np
+
+from app.search.keyword import InvertedIndex, bm25_score
+
+from .bench_ann import percentile_ms
+
+
+def make_docs(n: int, vocab: int, seed: int) -> list[tuple[int, int, str]]:
+    # Zipf-distributed terms so a few are very common, like real text
+    rng = np.random.default_rng(seed)
+    docs = []
+    for i in range(n):
+        terms = np.minimum(rng.zipf(1.2, size=int(rng.integers(20, 400))), vocab)
+        docs.append((i, i % 4, " ".join(f"t{t}" for t in terms)))
+    return docs
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--vocab", type=int, default=50000)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    docs = make_docs(args.n, args.vocab, args.seed)
+    rng = np.random.default_rng(args.seed + 1)
+    queries = [" ".join(f"t{t}" for t in np.minimum(rng.zipf(1.2, size=3), args.vocab)) for _ in range(args.queries)]
+
+    t0 = time.perf_counter()
+    index = InvertedIndex()
+    for did, org, text in docs:
+        index.add(did, org, text)
+    print(f"corpus n={args.n} build={time.perf_counter() - t0:.2f}s")
+
+    corpus = [(str(did), text) for did, _, text in docs]
+    scan_lat: list[float] = []
+    for q in queries[: max(1, args.queries // 10)]:
+        t = time.perf_counter()
+        bm25_score(q, corpus)
+        scan_lat.append(time.perf_counter() - t)
+    print(f"scan      p50={percentile_ms(scan_lat, 50):.2f}ms  p95={percentile_ms(scan_lat, 95):.2f}ms")
+
+    for org in (None, 0):
+        lat: list[float] = []
+        for q in queries:
+            t = time.perf_counter()
+            index.search(q, org_id=org, k=args.k)
+            lat.append(time.perf_counter() - t)
+        label = "all orgs" if org is None else f"org={org}"
+        print(f"index {label:<9} p50={percentile_ms(lat, 50):.2f}ms  p95={percentile_ms(lat, 95):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
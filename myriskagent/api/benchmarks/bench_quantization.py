@@ -0,0 +1,77 @@
+"""Memory / latency / recall benchmark for quantized in-memory vector segments.
+
+Compares the float32 VectorSegment (exact) with int8 and PQ QuantizedSegments,
+which keep codes in memory and re-rank top candidates at full precision.
+
+Run from myriskagent/api:
+    python -m benchmarks.bench_quantization --n 20000 --dim 1536 --k 10
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from app.search.quantization import QuantizedSegment
+from app.search.segments import VectorSegment
+from benchmarks.bench_ann import make_corpus, percentile_ms
+
+
+def python_list_bytes(dim: int) -> int:
+    # Footprint of the pre-segment representation: a list of Python floats per doc
+    vec = [float(i) + 0.5 for i in range(dim)]
+    return sys.getsizeof(vec) + sum(sys.getsizeof(v) for v in vec)
+
+
+def run(name: str, seg, queries: np.ndarray, k: int, truth: list[set[int]] | None) -> list[set[int]]:
+    lat: list[float] = []
+    found: list[set[int]] = []
+    for q in queries:
+        t = time.perf_counter()
+        res = seg.search(q, k)
+        lat.append(time.perf_counter() - t)
+        found.append({i for _, i in res})
+    recall = 1.0 if truth is None else sum(len(a & b) for a, b in zip(found, truth)) / (len(truth) * k)
+    per_doc = seg.memory_bytes / max(1, len(seg))
+    print(
+        f"{name:<10} mem/doc={per_doc:8.0f}B  recall@{k}={recall:.3f}  "
+        f"p50={percentile_ms(lat, 50):.2f}ms  p95={percentile_ms(lat, 95):.2f}ms"
+    )
+    return found
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=1536)
+    ap.add_argument("--queries", type=int, default=100)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--rerank-factor", type=int, default=None, help="default: 4 for int8, 32 for pq")
+    ap.add_argument("--pq-m", type=int, default=96)
+    ap.add_argument("--noise", type=float, default=0.6, help="within-topic spread of the synthetic corpus")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+
+    data = make_corpus(args.n + args.queries, args.dim, n_topics=64, seed=args.seed, noise=args.noise)
+    corpus, queries = data[: args.n], data[args.n :]
+    segments = {
+        "float32": VectorSegment(),
+        "int8": QuantizedSegment("int8", rerank_factor=args.rerank_factor),
+        "pq": QuantizedSegment("pq", rerank_factor=args.rerank_factor, pq_m=args.pq_m),
+    }
+    for name, seg in segments.items():
+        t = time.perf_counter()
+        for i, v in enumerate(corpus):
+            seg.add(i, 0, "", None, v)
+        print(f"{name:<10} build={time.perf_counter() - t:.2f}s")
+
+    print(f"n={args.n} dim={args.dim}  python-list baseline mem/doc={python_list_bytes(args.dim)}B")
+    truth = run("float32", segments["float32"], queries, args.k, None)
+    run("int8", segments["int8"], queries, args.k, truth)
+    run("pq", segments["pq"], queries, args.k, truth)
+
+
+if __name__ == "__main__":
+    main()
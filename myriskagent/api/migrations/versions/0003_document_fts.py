@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Generated full-text column (title weighted above body) with a GIN index for keyword search
+    op.execute(
+        """
+        ALTER TABLE document ADD COLUMN IF NOT EXISTS search_tsv tsvector
+          GENERATED ALWAYS AS (
+            setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(content, '')), 'B')
+          ) STORED
+        """
+    )
+    op.execute("CREATE INDEX IF NOT EXISTS ix_document_search_tsv ON document USING GIN (search_tsv)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ix_document_search_tsv")
+    op.execute("ALTER TABLE document DROP COLUMN IF EXISTS search_tsv")
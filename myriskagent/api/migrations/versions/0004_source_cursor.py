@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'source_cursor',
+        sa.Column('source_id', sa.Integer, primary_key=True, autoincrement=False),
+        sa.Column('since', sa.DateTime(), nullable=True),
+        sa.Column('boundary', sa.JSON(), nullable=False, server_default='[]'),
+        sa.Column('last_success_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.String(length=512), nullable=True),
+        sa.Column('items_total', sa.Integer, nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('source_cursor')
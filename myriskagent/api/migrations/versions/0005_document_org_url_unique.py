@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Racing select-then-insert upserts may have left several rows per URL; keep the newest
+    op.execute(
+        """
+        DELETE FROM document d
+        USING document newer
+        WHERE d.url IS NOT NULL
+          AND newer.org_id = d.org_id AND newer.url = d.url AND newer.id > d.id
+        """
+    )
+    # Upserts write with ON CONFLICT (org_id, url); NULL URLs never conflict
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_document_org_url ON document (org_id, url)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS ux_document_org_url")
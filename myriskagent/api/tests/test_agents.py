@@ -0,0 +1,809 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from app.agents.cache import ResponseCache
+from app.agents.http import HttpClients
+from app.agents.news import NewsAgent
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = json.dumps({"path": self.path}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def test_http_clients_reuse_pooled_connections():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    seen = []
+
+    async def run(http: HttpClients):
+        for i in range(3):
+            r = await http.get("wiki", f"{base}/page/{i}")
+            assert r.json() == {"path": f"/page/{i}"}
+        await http.aclose()
+
+    try:
+        asyncio.run(run(HttpClients(observer=lambda host, reused, _: seen.append(reused))))
+        assert seen == [False, True, True]
+        seen.clear()
+        asyncio.run(run(HttpClients(pooled=False, observer=lambda host, reused, _: seen.append(reused))))
+        assert seen == [False, False, False]
+    finally:
+        server.shutdown()
+
+
+def test_agents_use_injected_clients_and_timeouts():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append((request.url.host, request.extensions["timeout"]["read"]))
+        return httpx.Response(200, json={"articles": [{"title": "ACME fined", "url": "https://n.example/1"}]})
+
+    async def run():
+        http = HttpClients(timeouts={"news": 3.0}, transport=httpx.MockTransport(handler))
+        res = await NewsAgent(api_key="k", http=http).search("ACME")
+        await http.aclose()
+        return res
+
+    res = asyncio.run(run())
+    assert [it["title"] for it in res.items] == ["ACME fined"]
+    assert calls == [("newsapi.org", 3.0)]
+
+
+def test_response_cache_ttl_revalidation_and_stale_while_revalidate(tmp_path, monkeypatch):
+    import app.agents.cache as cache_mod
+
+    now = [1000.0]
+    monkeypatch.setattr(cache_mod.time, "time", lambda: now[0])
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304, headers={"etag": '"v1"'})
+        return httpx.Response(200, json={"n": len(calls)}, headers={"etag": '"v1"'})
+
+    outcomes = []
+
+    async def run():
+        cache = ResponseCache(tmp_path, ttls={"wiki": 60}, stale_while_revalidate=30)
+        http = HttpClients(transport=httpx.MockTransport(handler), cache=cache, cache_observer=lambda a, o: outcomes.append(o))
+        url = "https://en.wikipedia.org/api/rest_v1/page/summary/ACME"
+        first = await http.get("wiki", url)
+        assert (await http.get("wiki", url)).json() == first.json() == {"n": 1}
+        now[0] += 75  # stale, inside the revalidate window: served at once, refreshed behind
+        assert (await http.get("wiki", url)).headers["x-cache"] == "STALE"
+        await asyncio.gather(*http._tasks)
+        now[0] += 100  # past the window: conditional request inline
+        r = await http.get("wiki", url)
+        assert r.headers["x-cache"] == "REVALIDATED" and r.json() == {"n": 1}
+        await http.aclose()
+        # Entries survive a restart
+        assert len(ResponseCache(tmp_path)) == 1
+
+    asyncio.run(run())
+    assert calls == [None, '"v1"', '"v1"']
+    assert outcomes == ["miss", "hit", "stale", "revalidated", "revalidated"]
+
+
+def test_response_cache_evicts_least_recently_used(tmp_path):
+    from app.agents.cache import CachedResponse
+
+    async def run():
+        cache = ResponseCache(tmp_path, max_bytes=2500)
+        for key in ("aa1", "bb2", "cc3"):
+            await cache.put(key, CachedResponse(200, {}, b"x" * 1000, 0.0))
+        return cache
+
+    cache = asyncio.run(run())
+    assert len(cache) == 2 and cache.total_bytes <= 2500
+    assert not (tmp_path / "aa" / "aa1.body").exists()
+
+
+def test_response_cache_concurrent_writers_and_stale_on_5xx(tmp_path, monkeypatch):
+    from concurrent.futures import ThreadPoolExecutor
+
+    import app.agents.cache as cache_mod
+    from app.agents.cache import CachedResponse
+
+    # Workers sharing the directory write the same entry at once: no clobbered temp files
+    writers = [ResponseCache(tmp_path) for _ in range(4)]
+    with ThreadPoolExecutor(8) as pool:
+        jobs = [
+            pool.submit(writers[i % 4]._write, "dd4", CachedResponse(200, {}, bytes([i]) * 4096, float(i)))
+            for i in range(200)
+        ]
+        for job in jobs:
+            job.result()
+    assert sorted(p.name for p in (tmp_path / "dd").iterdir()) == ["dd4.body", "dd4.meta"]
+
+    now = [1000.0]
+    monkeypatch.setattr(cache_mod.time, "time", lambda: now[0])
+    statuses = iter([200, 500])
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(next(statuses), json={"ok": True})
+
+    async def run():
+        cache = ResponseCache(tmp_path / "c", ttls={"wiki": 60}, stale_while_revalidate=0)
+        http = HttpClients(transport=httpx.MockTransport(handler), cache=cache)
+        url = "https://en.wikipedia.org/api/rest_v1/page/summary/ACME"
+        await http.get("wiki", url)
+        now[0] += 3600
+        r = await http.get("wiki", url)
+        await http.aclose()
+        return r
+
+    r = asyncio.run(run())
+    assert r.status_code == 200 and r.headers["x-cache"] == "STALE" and r.json() == {"ok": True}
+
+
+def test_fan_out_deadlines_and_request_dedupe():
+    from app.agents.fanout import RequestFetches, SourceUnavailable, fan_out
+
+    calls = []
+
+    def source(name, delay, fail=False):
+        async def fetch():
+            calls.append(name)
+            await asyncio.sleep(delay)
+            if fail:
+                raise RuntimeError("upstream 500")
+            return name.upper()
+
+        return fetch
+
+    async def run():
+        fetches = RequestFetches()
+        outcomes = await fan_out(
+            fetches,
+            {
+                "news": (("news", "q"), source("news", 0.01)),
+                "filings": (("filings", "q"), source("filings", 5)),
+                "sanctions": (("sanctions", "q"), source("sanctions", 0, fail=True)),
+            },
+            deadlines={"filings": 0.05},
+            default_deadline=1.0,
+        )
+        # A later call in the same request reuses the result, or fails fast
+        assert await fetches.get(("news", "q"), source("news", 0)) == "NEWS"
+        try:
+            await fetches.get(("filings", "q"), source("filings", 0))
+            raise AssertionError("expected SourceUnavailable")
+        except SourceUnavailable:
+            pass
+        await fetches.aclose()
+        return outcomes
+
+    outcomes = asyncio.run(run())
+    assert {n: o.status for n, o in outcomes.items()} == {"news": "ok", "filings": "timeout", "sanctions": "error"}
+    assert outcomes["news"].result == "NEWS" and outcomes["filings"].elapsed_ms < 1000
+    assert outcomes["sanctions"].summary()["error"] == "upstream 500"
+    assert sorted(calls) == ["filings", "news", "sanctions"]
+
+
+def test_fan_out_shared_fetch_outlives_the_shorter_deadline():
+    from app.agents.fanout import RequestFetches, fan_out
+
+    calls = []
+
+    async def fetch():
+        calls.append("filings")
+        await asyncio.sleep(0.1)
+        return "FILINGS"
+
+    async def run():
+        fetches = RequestFetches()
+        try:
+            # Two sources share one fetch; the first waiter's timeout must not cancel it under the second
+            return await fan_out(
+                fetches,
+                {"risk": (("filings", "q"), fetch), "qa": (("filings", "q"), fetch)},
+                deadlines={"risk": 0.02, "qa": 1.0},
+            )
+        finally:
+            await fetches.aclose()
+
+    outcomes = asyncio.run(run())
+    assert {n: o.status for n, o in outcomes.items()} == {"risk": "timeout", "qa": "ok"}
+    assert outcomes["qa"].result == "FILINGS" and calls == ["filings"]
+
+
+def test_resilience_retries_then_opens_circuit_and_fails_fast():
+    from app.agents.resilience import CircuitOpenError, HostResilience
+
+    statuses = iter([503, 200, 503, 503, 503])
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request.url.path)
+        return httpx.Response(next(statuses))
+
+    events = []
+
+    async def run():
+        res = HostResilience(failure_threshold=3, reset_timeout=60, attempts=3, backoff=0.001, max_backoff=0.01,
+                             observer=lambda host, ev: events.append(ev))
+        http = HttpClients(transport=httpx.MockTransport(handler), resilience=res)
+        assert (await http.get("sanctions", "https://api.opensanctions.org/a")).status_code == 200
+        # Three 503s: retried, returned as-is, and the breaker opens
+        assert (await http.get("sanctions", "https://api.opensanctions.org/b")).status_code == 503
+        assert res.snapshot()["api.opensanctions.org"]["state"] == "open"
+        try:
+            await http.get("sanctions", "https://api.opensanctions.org/c")
+            raise AssertionError("expected CircuitOpenError")
+        except CircuitOpenError:
+            pass
+        await http.aclose()
+
+    asyncio.run(run())
+    assert sent == ["/a", "/a", "/b", "/b", "/b"]
+    assert events == ["retry", "retry", "retry", "short_circuit"]
+
+
+def test_resilience_does_not_retry_timeouts_or_trip_on_429():
+    from app.agents.resilience import HostResilience
+
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request.url.path)
+        if request.url.path == "/slow":
+            raise httpx.ReadTimeout("timed out", request=request)
+        return httpx.Response(429, headers={"Retry-After": "0"})
+
+    async def run():
+        res = HostResilience(failure_threshold=2, reset_timeout=60, attempts=3, backoff=0.001, max_backoff=0.01)
+        http = HttpClients(transport=httpx.MockTransport(handler), resilience=res)
+        try:
+            await http.get("sanctions", "https://api.opensanctions.org/slow")
+            raise AssertionError("expected ReadTimeout")
+        except httpx.ReadTimeout:
+            pass
+        # Six 429s over two calls: retried and returned, but the breaker stays closed
+        for _ in range(2):
+            assert (await http.get("sanctions", "https://api.opensanctions.org/busy")).status_code == 429
+        await http.aclose()
+        return res.breaker("api.opensanctions.org")
+
+    breaker = asyncio.run(run())
+    assert sent == ["/slow"] + ["/busy"] * 6
+    assert breaker.state == "closed" and breaker.failures == 1
+
+
+def test_token_bucket_rejects_when_queue_too_long():
+    from app.agents.resilience import RateLimitedError, TokenBucket
+
+    async def run():
+        bucket = TokenBucket(rate=20, burst=2, max_wait=0.06)
+        # Two burst tokens, one queued ~50ms, the fourth would wait ~100ms
+        return await asyncio.gather(*(bucket.acquire() for _ in range(4)), return_exceptions=True)
+
+    out = asyncio.run(run())
+    assert out[:3] == [None, None, None] and isinstance(out[3], RateLimitedError)
+
+
+def test_sanctions_index_fuzzy_screening_and_incremental_reload(tmp_path, monkeypatch):
+    import app.agents.sanctions_index as idx_mod
+    from app.agents.sanctions_index import SanctionsIndex
+
+    (tmp_path / "targets.simple.csv").write_text(
+        "id,schema,name,aliases,dataset\n"
+        "Q7747,Person,Vladimir Vladimirovich PUTIN,Путин Владимир;Putin Vladimir,EU Financial Sanctions\n"
+        "NK-acme,Company,Société Générale de Chimie S.A.,,US OFAC SDN\n"
+    )
+    index = SanctionsIndex(tmp_path, threshold=0.85)
+    assert index.reload()["added"] == ["targets.simple.csv"]
+
+    assert [m.entity.id for m in index.screen("PUTIN, Vladimir")] == ["Q7747"]
+    assert index.screen("Vladimir Putin")[0].score >= 0.85
+    hit = index.screen("Societe Generale de Chimie")[0]
+    assert hit.entity.id == "NK-acme" and hit.score == 1.0 and hit.entity.datasets == ("US OFAC SDN",)
+    assert index.screen("Generic Health Partners") == []
+    assert [len(r) for r in index.screen_many(["Putin Vladimir", "Jane Doe"])] == [1, 0]
+
+    parsed = []
+    real_read = idx_mod.read_list_file
+    monkeypatch.setattr(idx_mod, "read_list_file", lambda p: (parsed.append(p.name), real_read(p))[1])
+    (tmp_path / "entities.ftm.json").write_text(
+        json.dumps({"id": "NK-orca", "schema": "Vessel", "caption": "Orca Trader", "datasets": ["un_sc"],
+                    "properties": {"name": ["Orca Trader"], "previousName": ["Sea Falcon"]}}) + "\n"
+        + json.dumps({"id": "s-1", "schema": "Sanction", "properties": {"program": ["x"]}}) + "\n"
+    )
+    (tmp_path / "download.csv.part").write_text("partial")
+    assert index.reload() == {"added": ["entities.ftm.json"], "updated": [], "removed": []}
+    assert parsed == ["entities.ftm.json"] and len(index) == 3
+    assert index.screen("Sea Falcon")[0].matched_name == "Sea Falcon"
+
+    (tmp_path / "targets.simple.csv").unlink()
+    assert index.reload()["removed"] == ["targets.simple.csv"]
+    assert index.screen("Vladimir Putin") == []
+
+
+def _companyfacts() -> dict:
+    def fact(end, val, form="10-K", start=None, filed="2024-02-01", fy=2023, fp="FY"):
+        out = {"end": end, "val": val, "accn": "0000-1", "fy": fy, "fp": fp, "form": form, "filed": filed}
+        if start:
+            out["start"] = start
+        return out
+
+    return {
+        "cik": 1234,
+        "entityName": 'ACME "Widgets" Corp',
+        "facts": {
+            "dei": {"EntityCommonStockSharesOutstanding": {"units": {"shares": [fact("2024-01-15", 1e6)]}}},
+            "us-gaap": {
+                "Revenues": {
+                    "label": "Revenues",
+                    "units": {
+                        "USD": [
+                            fact("2022-12-31", 800.0, start="2022-01-01", filed="2023-02-01", fy=2022),
+                            fact("2023-12-31", 900.0, start="2023-01-01", filed="2024-02-01"),
+                            # Restated in a later filing
+                            fact("2023-12-31", 1000.0, start="2023-01-01", filed="2024-06-01", form="10-K/A"),
+                            # A quarter repeated in the annual report is not an annual value
+                            fact("2023-12-31", 260.0, start="2023-10-01"),
+                            fact("2023-09-30", 240.0, start="2023-07-01", form="10-Q", fp="Q3"),
+                        ]
+                    },
+                },
+                "NetIncomeLoss": {"units": {"USD": [fact("2023-12-31", 50.0, start="2023-01-01")]}},
+                "Assets": {"units": {"USD": [fact("2023-12-31", 2000.0)]}},
+                "Liabilities": {"units": {"USD": [fact("2023-12-31", 1500.0)]}},
+                "AccountsPayableCurrent": {"units": {"USD": [fact("2023-12-31", 10.0)]}},
+            },
+        },
+    }
+
+
+def test_filings_agent_streams_company_facts_into_local_table(tmp_path):
+    from app.agents.filings import FilingsAgent
+    from app.agents.finance import FinanceAgent
+    from app.agents.xbrl import FactStore
+
+    body = json.dumps(_companyfacts()).encode()
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append((request.url.path, request.headers.get("if-none-match")))
+        if request.headers.get("if-none-match") == '"f1"':
+            return httpx.Response(304, headers={"etag": '"f1"'})
+        return httpx.Response(200, content=body, headers={"etag": '"f1"'})
+
+    store = FactStore(tmp_path, max_age=3600, batch_rows=2)
+
+    async def run():
+        http = HttpClients(transport=httpx.MockTransport(handler))
+        agent = FilingsAgent(http=http, facts=store)
+        first = await agent.fetch(org="ACME", ticker="1234")
+        await agent.fetch(org="ACME", ticker="1234")  # fresh: no request
+        meta = store.meta("1234")
+        meta["fetched_at"] -= 7200
+        store._write_meta("1234", meta)
+        await agent.fetch(org="ACME", ticker="1234")  # stale: conditional, 304
+        await http.aclose()
+        return first
+
+    res = asyncio.run(run())
+    assert requests == [("/api/xbrl/companyfacts/CIK0000001234.json", None), ("/api/xbrl/companyfacts/CIK0000001234.json", '"f1"')]
+    assert store.meta("1234")["entity_name"] == 'ACME "Widgets" Corp' and store.is_fresh("1234")
+    assert not [p for p in tmp_path.iterdir() if p.name.startswith(".")]
+
+    facts = store.read("1234")
+    assert set(facts["metric"]) == {"revenue", "net_income", "assets", "liabilities"} and len(facts) == 8
+    annual = store.annual("1234")
+    assert annual["revenue"].tolist() == [800.0, 1000.0]
+    assert res.facts["revenue"] == "1000" and res.facts["fiscal_year_end"] == "2023-12-31"
+    assert "revenue 1.0K" in res.embeds[0]["text"]
+
+    feats = FinanceAgent(facts=store).fundamentals("CIK1234")
+    assert feats == {"leverage": 0.75, "net_margin": 0.05, "revenue_growth": 0.25}
+
+    # The API and the scheduler refreshing the same company at once each write their own temp file
+    from concurrent.futures import ThreadPoolExecutor
+
+    src = tmp_path / "downloads" / "facts.json"
+    src.parent.mkdir()
+    src.write_bytes(body)
+    with ThreadPoolExecutor(4) as pool:
+        assert set(pool.map(lambda _: store.ingest("1234", src), range(16))) == {8}
+    assert len(store.read("1234")) == 8 and not [p for p in tmp_path.iterdir() if p.name.startswith(".")]
+
+
+def test_batch_finance_features_match_per_series_pandas():
+    import numpy as np
+    import pandas as pd
+    from app.agents.prices import batch_features
+
+    rng = np.random.default_rng(0)
+    idx = pd.date_range("2024-01-01", periods=120, freq="B")
+    wide = pd.DataFrame(100 * np.exp(np.cumsum(rng.normal(0, 0.02, (120, 4)), axis=0)), index=idx, columns=list("ABCD"))
+    wide.iloc[:50, 1] = np.nan  # listed later
+    wide.iloc[:, 3] = np.nan  # no data at all
+    got = batch_features(wide, return_windows=(5, 30), vol_windows=(20,), drawdown_window=60)
+
+    for t in "ABC":
+        close = wide[t].dropna()
+        assert np.isclose(got.loc[t, "ret_5d"], close.iloc[-1] / close.iloc[-6] - 1)
+        assert np.isclose(got.loc[t, "ret_30d"], close.iloc[-1] / close.iloc[-31] - 1)
+        assert np.isclose(got.loc[t, "vol_20d"], close.pct_change().tail(20).std())
+        tail = close.tail(60)
+        assert np.isclose(got.loc[t, "drawdown"], (1 - tail / tail.cummax()).max())
+    assert got.loc["D"].isna().all()
+
+
+def test_price_store_appends_incrementally_and_compacts(tmp_path):
+    import pandas as pd
+    from app.agents.finance import FinanceAgent
+    from app.agents.prices import PriceStore
+
+    days = pd.date_range("2024-03-01", periods=6, freq="B")
+    series = {"ACME": [10, 11, 12, 13, 14, 15], "INIT": [5, 5, 5, 6, 6, 7]}
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sym, size = request.url.params["symbol"], request.url.params["outputsize"]
+        n = 6 if size == "full" else 3
+        closes = series[sym]
+        data = {d.strftime("%Y-%m-%d"): {"5. adjusted close": str(c)} for d, c in zip(days[:n], closes[:n])}
+        return httpx.Response(200, json={"Time Series (Daily)": data})
+
+    store = PriceStore(tmp_path, max_parts=2)
+    store.append(pd.DataFrame({"ticker": "ACME", "date": days[:2], "close": [10.0, 11.0]}))
+
+    async def run():
+        http = HttpClients(transport=httpx.MockTransport(handler))
+        agent = FinanceAgent(api_key="k", http=http, prices=store, return_windows=(2,), vol_windows=(3,))
+        written = await agent.update_prices(["ACME", "INIT"])
+        feats = await agent.portfolio_features(["ACME", "INIT", "NONE"], refresh=False)
+        await http.aclose()
+        return written, feats
+
+    written, feats = asyncio.run(run())
+    # ACME: compact fetch, only the day after its stored history; INIT: full history
+    assert written == 1 + 6
+    assert store.last_dates() == {"ACME": days[2].date(), "INIT": days[5].date()}
+    assert len(list(tmp_path.glob("part-*.parquet"))) == 2
+    assert store.append(pd.DataFrame({"ticker": ["ACME"], "date": [days[1]], "close": [99.0]})) == 0
+    store.append(pd.DataFrame({"ticker": ["ACME"], "date": [days[3]], "close": [13.0]}))
+    assert len(list(tmp_path.glob("part-*.parquet"))) == 1
+    m = PriceStore(tmp_path).matrix(["ACME", "INIT"])
+    assert m["ACME"].dropna().tolist() == [10, 11, 12, 13] and len(m) == 6
+    assert feats.loc["ACME", "ret_2d"] == 12 / 10 - 1 and feats.loc["INIT", "ret_2d"] == 7 / 6 - 1
+    assert feats.loc["NONE"].isna().all()
+
+
+def test_update_prices_skips_weekends_and_refetches_once_a_day(tmp_path):
+    import pandas as pd
+    from datetime import date
+    from app.agents.finance import FinanceAgent
+    from app.agents.prices import PriceStore
+
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request.url.params["symbol"])
+        # Closes up to Friday 2024-03-08 only: the following Monday is a holiday
+        return httpx.Response(200, json={"Time Series (Daily)": {"2024-03-08": {"5. adjusted close": "10"}}})
+
+    store = PriceStore(tmp_path)
+    store.append(pd.DataFrame({"ticker": "ACME", "date": [pd.Timestamp("2024-03-07")], "close": [9.0]}))
+
+    async def run():
+        http = HttpClients(transport=httpx.MockTransport(handler))
+        agent = FinanceAgent(api_key="k", http=http, prices=store)
+        counts = []
+        for today in (date(2024, 3, 9), date(2024, 3, 10), date(2024, 3, 11), date(2024, 3, 12), date(2024, 3, 12)):
+            before = len(calls)
+            await agent.update_prices(["ACME"], today=today)
+            counts.append(len(calls) - before)
+        await http.aclose()
+        return counts
+
+    # Saturday fetches Friday's close; Sunday and Monday have it; Tuesday expects Monday's
+    # (a holiday) and fetches once, then not again that day
+    assert asyncio.run(run()) == [1, 0, 0, 1, 0]
+    assert store.last_dates() == {"ACME": date(2024, 3, 8)}
+
+
+def test_social_signals_are_seeded_incremental_and_flag_spikes():
+    import pandas as pd
+    from app.agents.social import SignalState, SocialAgent, SocialSignals
+
+    now = pd.Timestamp("2024-05-31")
+
+    def scan(signals, org, when=now, days=60):
+        return asyncio.run(SocialAgent(signals=signals).scan(org, days=days, now=when))
+
+    a, b = SocialSignals(seed=7), SocialSignals(seed=7)
+    first = scan(a, "1")
+    assert first.events == scan(b, "1").events and first.online_component == scan(b, "1").online_component
+    assert first.events != scan(SocialSignals(seed=7), "2").events
+    assert len(first.events) == 30 and first.events[-1]["date"] == now.isoformat()
+
+    # Same day again: nothing new is simulated; the next day adds exactly one observation
+    state = a.state("1")
+    assert scan(a, "1").events == first.events and state.n == 60
+    later = scan(a, "1", when=now + pd.Timedelta(days=1))
+    assert state.n == 61 and later.events[:-1] == first.events[1:]
+
+    st = SignalState(alpha=0.2, threshold=3.0, window=5, warmup=5)
+    for i, v in enumerate([10, 11, 9, 10, 11, 10, 60, 10, 11]):
+        st.update(v, f"d{i}")
+    assert [s.date for s in st.spikes] == ["d6"] and st.spikes[0].count == 60
+    # The spike enters the baseline clipped, and the ring buffer only counts it while it is in the window
+    assert st.mean < 20
+    assert st.spike_ratio == 1 / 5 and st.online_component == 10 + 80 / 5
+    for i in range(5):
+        st.update(10, f"e{i}")
+    assert st.spike_ratio == 0 and [e["date"] for e in st.recent()] == [f"e{i}" for i in range(5)]
+
+
+def test_social_observations_replace_simulation_and_stay_in_date_order():
+    import pandas as pd
+    from app.agents.social import SocialAgent, SocialSignals
+
+    signals = SocialSignals(seed=7)
+    asyncio.run(SocialAgent(signals=signals).scan("1", now=pd.Timestamp("2024-05-31")))
+    assert signals.state("1").simulated and signals.state("1").n == 60
+
+    days = pd.date_range("2024-06-01", periods=9, freq="D")
+    for day, count in zip(days, [10, 11, 9, 10, 11, 10, 9, 10, 100]):
+        spike = signals.observe("1", count, day)
+    st = signals.state("1")
+    assert not st.simulated and st.n == 9 and spike is not None and spike.date == "2024-06-09T00:00:00"
+    try:
+        signals.observe("1", 5, pd.Timestamp("2024-06-08"))
+        raise AssertionError("expected ValueError")
+    except ValueError:
+        pass
+
+    # Scans report real observations without simulating into them
+    res = asyncio.run(SocialAgent(signals=signals).scan("1", now=pd.Timestamp("2024-06-20")))
+    assert st.n == 9 and [e["date"][:10] for e in res.events] == [d.date().isoformat() for d in days]
+    assert [s["date"] for s in res.spikes] == ["2024-06-09T00:00:00"]
+
+
+def test_scheduler_polls_sources_with_cursors_and_bounded_concurrency(tmp_path):
+    from sqlmodel import create_engine
+    from app.models import SourceCursor
+    from app.scheduler import Scheduler, SourceJob, SqlSourceStore, news_fetcher
+
+    articles = {
+        "acme": [
+            {"title": "ACME recall", "url": "https://n/1", "publishedAt": "2024-05-02T10:00:00Z"},
+            {"title": "ACME earnings", "url": "https://n/2", "publishedAt": "2024-05-01T09:00:00Z"},
+        ],
+        "init": [{"title": "Initech fine", "url": "https://n/3", "publishedAt": "2024-05-01T08:00:00+02:00"}],
+    }
+    active = {"now": 0, "max": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        active["now"] += 1
+        active["max"] = max(active["max"], active["now"])
+        await asyncio.sleep(0.02)
+        active["now"] -= 1
+        q = request.url.params["q"]
+        if q == "down":
+            return httpx.Response(503)
+        return httpx.Response(200, json={"articles": articles[q]})
+
+    class Store(SqlSourceStore):
+        def sources(self):
+            return [SourceJob(1, 10, "news", params={"query": "acme"}), SourceJob(2, 20, "news", params={"query": "init"}),
+                    SourceJob(3, 10, "news", params={"query": "down"}), SourceJob(4, 10, "rss")]
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'sched.db'}")
+    SourceCursor.__table__.create(engine)
+    ingested = []
+
+    async def sink(docs):
+        ingested.extend(docs)
+        return len(docs)
+
+    async def run():
+        http = HttpClients(transport=httpx.MockTransport(handler))
+        fetchers = {"news": news_fetcher(NewsAgent(api_key="k", http=http))}
+        first = await Scheduler(Store(engine), fetchers, sink, concurrency=2).run_once()
+        articles["acme"].insert(0, {"title": "ACME probe", "url": "https://n/4", "publishedAt": "2024-05-03T00:00:00Z"})
+        # A new process resumes from the stored cursors
+        second = Scheduler(Store(engine), fetchers, sink, concurrency=2)
+        again = await second.run_once()
+        await http.aclose()
+        return first, again, second
+
+    first, again, sched = asyncio.run(run())
+    assert first == 3 and again == 1 and active["max"] == 2
+    assert [d["url"] for d in ingested[3:]] == ["https://n/4"] and ingested[3]["org_id"] == 10
+    cursors = SqlSourceStore(engine).cursors()
+    assert cursors[1].since.isoformat() == "2024-05-03T00:00:00" and cursors[1].items_total == 3
+    assert cursors[2].since.isoformat() == "2024-05-01T06:00:00"
+    assert cursors[3].since is None and cursors[3].last_error.startswith("HTTPStatusError")
+    assert 4 not in cursors
+    # Polled sources resume one jittered interval after their last success; never-polled
+    # ones are spread over the jitter window
+    fresh = Scheduler(Store(engine), {}, sink, interval=100.0, jitter=0.5)
+    now = time.time()
+    asyncio.run(fresh.refresh())
+    assert now + 45 < fresh._due[1] < now + 151 and now <= fresh._due[4] <= now + 51
+
+
+def test_news_fetcher_pages_back_to_the_cursor_and_dedups_its_boundary():
+    from datetime import datetime
+    from app.models import SourceCursor
+    from app.scheduler import Scheduler, SourceJob, news_fetcher
+
+    def art(i, ts):
+        return {"title": f"t{i}", "url": f"https://n/{i}", "publishedAt": ts}
+
+    since = "2024-05-01T00:00:00Z"
+    # n/0 was ingested at the cursor instant, n/1 shares it but was not; n/4 and n/5 straddle a page edge
+    feed = [art(0, since), art(1, since), art(2, "2024-05-01T01:00:00Z"), art(3, "2024-05-01T02:00:00Z")]
+    feed += [art(i, "2024-05-01T03:00:00Z") for i in (4, 5)]
+    feed += [art(i, f"2024-05-01T{i:02d}:00:00Z") for i in range(6, 12)]
+    feed.append(art(99, "2024-04-30T00:00:00Z"))
+    requests = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        p = request.url.params
+        requests.append(dict(p))
+        lo, hi = p.get("from"), p.get("to")
+        hits = [a for a in feed if (not lo or a["publishedAt"][:19] >= lo) and (not hi or a["publishedAt"][:19] <= hi)]
+        hits.sort(key=lambda a: a["publishedAt"], reverse=True)
+        return httpx.Response(200, json={"articles": hits[: int(p["pageSize"])]})
+
+    class Store:
+        def __init__(self):
+            self.saved = {}
+
+        def sources(self):
+            return [SourceJob(1, 10, "news", params={"query": "acme"})]
+
+        def cursors(self):
+            return dict(self.saved)
+
+        def save(self, cursor):
+            self.saved[cursor.source_id] = cursor
+
+    ingested = []
+
+    async def sink(docs):
+        ingested.extend(d["url"] for d in docs)
+        return len(docs)
+
+    async def run(max_pages):
+        http = HttpClients(transport=httpx.MockTransport(handler))
+        agent = NewsAgent(api_key="k", http=http)
+        agent.page_size = 3
+        store = Store()
+        store.saved[1] = SourceCursor(source_id=1, since=datetime(2024, 5, 1), boundary=["https://n/0"])
+        sched = Scheduler(store, {"news": news_fetcher(agent, max_pages=max_pages)}, sink)
+        n = await sched.run_once()
+        await http.aclose()
+        return n, store.saved[1]
+
+    n, cursor = asyncio.run(run(max_pages=10))
+    assert n == 11 and sorted(ingested) == sorted(f"https://n/{i}" for i in range(1, 12))
+    assert cursor.since == datetime(2024, 5, 1, 11) and cursor.boundary == ["https://n/11"]
+    assert all(r["from"] == "2024-05-01T00:00:00" for r in requests) and requests[1]["to"] == "2024-05-01T09:00:00"
+
+    # Out of pages before reaching the cursor: what was read is ingested, the cursor stays put
+    ingested.clear()
+    n, cursor = asyncio.run(run(max_pages=2))
+    assert n == 5 and cursor.since == datetime(2024, 5, 1) and cursor.boundary == ["https://n/0"]
+
+
+class _FakeCompletions(BaseHTTPRequestHandler):
+    """Minimal OpenAI-compatible chat completions server; streams `chunks` as SSE."""
+
+    chunks = ["<p>ACME ", "was fined ", "[1](https://n/1).</p>"]
+    # Set by the test once the first token arrived; the server holds the rest of the stream until then
+    first_seen = threading.Event()
+    held = []
+
+    def do_POST(self):
+        req = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(req)
+        if not req.get("stream"):
+            body = json.dumps({
+                "id": "c1", "object": "chat.completion", "created": 0, "model": req["model"],
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(self.chunks)}, "finish_reason": "stop"}],
+            }).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for i, text in enumerate(self.chunks):
+            chunk = {
+                "id": "c1", "object": "chat.completion.chunk", "created": 0, "model": req["model"],
+                "choices": [{"index": 0, "delta": {"content": text}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+            if i == 0:
+                self.held.append(self.first_seen.wait(5))
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def log_message(self, *args):
+        pass
+
+
+def test_qa_and_narrator_use_async_streaming_completions(monkeypatch):
+    from app.agents.narrator import NarratorAgent
+    from app.agents.qa import QAAssistantAgent
+    from app.search.vector import InMemoryVectorStore
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _FakeCompletions)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("OPENAI_BASE_URL", f"http://127.0.0.1:{server.server_address[1]}/v1")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setenv("OVERRIDE_HASH_EMBED", "true")
+
+    async def run():
+        qa = QAAssistantAgent(vector_store=InMemoryVectorStore())
+        ctx = await qa.context("ACME fines", org_id=1)
+        tokens = []
+        async for text in qa.stream(ctx):
+            tokens.append(text)
+            _FakeCompletions.first_seen.set()
+        answer = await qa.answer("ACME fines", org_id=1)
+        report = await NarratorAgent(client=qa.client).build_reports({"org_id": 1, "period": "2024Q4", "top_docs": []})
+        await qa.client.close()
+        return tokens, answer, report
+
+    tokens, answer, report = asyncio.run(run())
+    server.shutdown()
+    # The first token reached the consumer while the server was still holding the rest back
+    assert _FakeCompletions.held == [True]
+    assert tokens == _FakeCompletions.chunks
+    assert answer.answer_html == "".join(tokens) and report.html == answer.answer_html
+    assert [r.get("stream", False) for r in server.requests] == [True, False, False]
+    assert server.requests[0]["messages"][0]["role"] == "system"
+
+
+def test_resilience_counts_unretried_5xx_against_the_breaker():
+    from app.agents.resilience import CircuitOpenError, HostResilience
+
+    sent = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        sent.append(request.url.path)
+        return httpx.Response(500)
+
+    async def run():
+        res = HostResilience(failure_threshold=2, reset_timeout=60, attempts=3, backoff=0.001, max_backoff=0.01)
+        http = HttpClients(transport=httpx.MockTransport(handler), resilience=res)
+        # Not retried, but each 500 is a failure: the second opens the circuit
+        for path in ("/a", "/b"):
+            assert (await http.get("sanctions", f"https://api.opensanctions.org{path}")).status_code == 500
+        try:
+            await http.get("sanctions", "https://api.opensanctions.org/c")
+            raise AssertionError("expected CircuitOpenError")
+        except CircuitOpenError:
+            pass
+        await http.aclose()
+
+    asyncio.run(run())
+    assert sent == ["/a", "/b"]
@@ -0,0 +1,631 @@
+import os
+
+import numpy as np
+
+os.environ.setdefault("OVERRIDE_HASH_EMBED", "true")
+from app.search.ann import AnnVectorStore, IVFIndex
+from app.search.vector import DocumentUpsert, InMemoryVectorStore, content_hash
+from app.storage.io import ObjectStore
+
+
+def test_ivf_index_org_filter_and_recall():
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(600, 32)).astype(np.float32)
+    idx = IVFIndex(dim=32, nlist=8, nprobe=8)
+    idx.add(list(range(600)), [i % 3 for i in range(600)], vecs)
+    assert idx.is_trained
+    res = idx.search(vecs[10], k=5)
+    assert res[0][0] == 10
+    res_org = idx.search(vecs[10], k=5, org_id=2)
+    assert res_org and all(did % 3 == 2 for did, _ in res_org)
+
+
+def test_ivf_index_reclaims_removed_rows_under_retention_churn():
+    rng = np.random.default_rng(3)
+    idx = IVFIndex(dim=16, nlist=4, nprobe=4)
+    window, batch, vecs = 100, 20, {}
+    for step in range(30):
+        ids = list(range(step * batch, (step + 1) * batch))
+        batch_vecs = rng.normal(size=(batch, 16)).astype(np.float32)
+        vecs.update(zip(ids, batch_vecs))
+        idx.add(ids, [1] * batch, batch_vecs)
+        for did in range(step * batch - window, step * batch - window + batch):
+            if did >= 0:
+                idx.remove(did)
+                del vecs[did]
+        assert len(idx) == len(vecs)
+        assert idx._size - len(idx) <= idx.max_dead_fraction * idx._size
+    assert idx.is_trained and idx._vecs.shape[0] <= 4 * window
+    newest = max(vecs)
+    assert idx.search(vecs[newest], k=1)[0][0] == newest
+    for did in list(vecs):
+        idx.remove(did)
+    assert len(idx) == 0 and not idx.is_trained and idx.search(vecs[newest], k=1) == []
+
+
+def test_ann_store_save_and_load(tmp_path):
+    store = ObjectStore(base_uri=f"file://{tmp_path}")
+    vs = AnnVectorStore(nlist=4)
+    vs.upsert_documents([
+        DocumentUpsert(id=None, org_id=1, title="ACME debt", url="u1", content="acme lower debt"),
+        DocumentUpsert(id=None, org_id=2, title="Other", url="u2", content="unrelated weather report"),
+    ])
+    vs.save(store, "vectors/ann")
+    loaded = AnnVectorStore.load(store, "vectors/ann", nlist=4)
+    res = loaded.search("acme debt", org_id=1, k=3)
+    assert [r["url"] for r in res] == ["u1"]
+
+
+def test_object_store_concurrent_writes_to_one_key(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    store = ObjectStore(base_uri=f"file://{tmp_path}")
+    payloads = [bytes([i]) * 4096 for i in range(8)]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda p: [store.put_bytes("snap/state.json", p) for _ in range(50)], payloads))
+    assert store.get_bytes("snap/state.json") in payloads
+    assert [p.name for p in (tmp_path / "snap").iterdir()] == ["state.json"]
+
+
+def test_in_memory_store_org_segments_load_and_evict():
+    vs = InMemoryVectorStore(global_segment=True)
+    vs.upsert_documents([
+        DocumentUpsert(id=None, org_id=1, title="ACME debt", url="u1", content="acme lower debt"),
+        DocumentUpsert(id=None, org_id=2, title="Globex debt", url="u2", content="globex lower debt"),
+    ])
+    assert [r["url"] for r in vs.search("lower debt", org_id=2, k=5)] == ["u2"]
+    assert {r["url"] for r in vs.search("lower debt", org_id=None, k=5)} == {"u1", "u2"}
+    seg = vs.evict_segment(1)
+    assert seg is not None and len(seg) == 1
+    assert vs.search("acme", org_id=1, k=5) == []
+    assert [r["url"] for r in vs.search("lower debt", org_id=None, k=5)] == ["u2"]
+    vs.load_segment(1, seg)
+    assert [r["url"] for r in vs.search("acme", org_id=1, k=5)] == ["u1"]
+
+
+def test_quantized_segments_rerank_to_exact_top_hit():
+    from app.search.quantization import QuantizedSegment
+    from app.search.segments import VectorSegment
+
+    rng = np.random.default_rng(1)
+    vecs = rng.normal(size=(300, 64)).astype(np.float32)
+    exact = VectorSegment()
+    segs = [QuantizedSegment("int8"), QuantizedSegment("pq", pq_m=8, pq_train_size=256)]
+    for i, v in enumerate(vecs):
+        exact.add(i, 1, "", None, v)
+        for seg in segs:
+            seg.add(i, 1, "", None, v)
+    q = vecs[42] / np.linalg.norm(vecs[42])
+    want = [i for _, i in exact.search(q, 3)]
+    for seg in segs:
+        assert [i for _, i in seg.search(q, 3)] == want
+        assert seg.memory_bytes < exact.memory_bytes
+
+
+def test_quantized_store_shares_one_codebook_and_spill_file_across_orgs():
+    import gc
+
+    vs = InMemoryVectorStore(quantization="pq")
+    storage = vs.segments.segment_factory.keywords["storage"]
+    storage.pq_train_size = 64
+    rng = np.random.default_rng(2)
+    vecs = rng.normal(size=(80, 32)).astype(np.float32)
+    for i, v in enumerate(vecs):
+        vs.segments.add(i, i % 8, "", None, v)
+    q = vecs[13] / np.linalg.norm(vecs[13])
+    # 10 rows per org: no org could train alone, but the shared codebook covers all of them
+    assert [r["id"] for r in vs.segments.search(q, org_id=5, k=1)] == [13]
+    seg = vs.segments.segment(5)
+    assert storage.codec.trained and seg.codec is storage.codec and seg.memory_bytes > 0
+    assert vs.segments.segment(0)._spill.spill is seg._spill.spill
+    assert seg.rerank_factor == 32
+    assert len(storage.spill) == 80
+    vs.segments.remove(13, 5)
+    vs.segments.evict_segment(0)
+    gc.collect()
+    assert len(storage.spill) == 69
+    vs.segments.add(100, 0, "", None, vecs[0])
+    assert len(storage.spill) == 70 and storage.spill.capacity == 1024
+
+
+def test_upsert_is_idempotent_per_org_and_url():
+    vs = InMemoryVectorStore()
+    feed = [
+        DocumentUpsert(id=None, org_id=1, title="A", url="u1", content="acme lower debt"),
+        DocumentUpsert(id=None, org_id=1, title="B", url=None, content="acme litigation settled"),
+    ]
+    for _ in range(3):
+        vs.upsert_documents(feed)
+    assert len(vs.segments) == 2
+    vs.upsert_documents([DocumentUpsert(id=None, org_id=1, title="A2", url="u1", content="acme higher debt")])
+    res = vs.search("acme higher debt", org_id=1, k=5)
+    assert len(res) == 2 and res[0]["url"] == "u1" and res[0]["title"] == "A2"
+
+
+def test_chroma_fallback_stores_same_url_for_each_org(monkeypatch):
+    import app.search.vector as vector_mod
+
+    monkeypatch.setattr(vector_mod, "chromadb", None)
+    vs = vector_mod.ChromaVectorStore()
+    doc = dict(title="Wire", url="https://n/1", content="acme fined by regulators")
+    vs.upsert_documents([DocumentUpsert(id=None, org_id=1, **doc), DocumentUpsert(id=None, org_id=2, **doc)])
+    for org in (1, 2):
+        res = vs.search("acme fined", org_id=org, k=5)
+        assert [(r["org_id"], r["url"]) for r in res] == [(org, "https://n/1")]
+
+
+def test_near_duplicate_index_keeps_one_canonical_copy():
+    from app.search.dedup import NearDuplicateIndex
+
+    body = "ACME Corp agreed to pay a fine of 12 million dollars to settle claims by regulators over billing practices in three states"
+    docs = [
+        DocumentUpsert(id=None, org_id=1, title="Wire", url="https://a.example/1", content=body),
+        DocumentUpsert(id=None, org_id=1, title="Wire", url="https://b.example/2", content=body + " on Tuesday"),
+        DocumentUpsert(id=None, org_id=2, title="Wire", url="https://c.example/3", content=body),
+        DocumentUpsert(id=None, org_id=1, title="Other", url="https://a.example/4", content="Globex opens a new plant in Ohio"),
+    ]
+    nd = NearDuplicateIndex(threshold=0.7)
+    kept = nd.filter(docs)
+    assert [d.url for d in kept] == ["https://a.example/1", "https://c.example/3", "https://a.example/4"]
+    assert nd.alternates(1, "https://a.example/1") == ["https://b.example/2"]
+    assert nd.filter(docs[:2]) == [docs[0]]
+    assert nd.canonical_url(1, "https://b.example/2") == "https://a.example/1"
+
+
+def test_near_duplicates_are_released_on_removal_and_snapshotted(tmp_path):
+    from app.search.dedup import NearDuplicateIndex
+    from app.search.snapshot import SearchSnapshots
+    from app.search.vector import document_key
+
+    body = "ACME Corp agreed to pay a fine of 12 million dollars to settle claims by regulators over billing practices in three states"
+    docs = [
+        DocumentUpsert(id=None, org_id=1, title="Wire", url=f"https://n{i}.example/", content=body + " today" * i)
+        for i in range(3)
+    ]
+    nd = NearDuplicateIndex(threshold=0.7)
+    assert nd.filter(docs) == [docs[0]]
+
+    snaps = SearchSnapshots(ObjectStore(base_uri=f"file://{tmp_path}"), "snap")
+    snaps.write(snaps.capture(InMemoryVectorStore(), [], nd.to_dict()))
+    restored = NearDuplicateIndex(threshold=0.7)
+    snaps.restore(InMemoryVectorStore(), restored)
+    assert restored.alternates(1, docs[0].url) == [docs[1].url, docs[2].url]
+
+    for idx in (nd, restored):
+        # Dropping the canonical hands its duplicates back; re-filtering promotes the first
+        released = idx.remove(document_key(docs[0]))
+        assert [d.url for d in released] == [docs[1].url, docs[2].url]
+        assert idx.filter(released) == [docs[1]]
+        assert idx.alternates(1, docs[1].url) == [docs[2].url]
+        assert idx.canonical_url(1, docs[2].url) == docs[1].url
+
+
+def test_reciprocal_rank_fusion_merges_and_rewards_agreement():
+    from app.search.fusion import reciprocal_rank_fusion
+
+    kw = [{"org_id": 1, "url": "a", "title": "A", "snippet": "kw"}, {"org_id": 1, "url": "b", "title": "B"}]
+    vec = [{"org_id": 1, "url": "b", "title": "B"}, {"org_id": 1, "url": "c", "title": "C"}, {"org_id": 1, "url": "a", "title": "A"}]
+    fused = reciprocal_rank_fusion({"keyword": kw, "vector": vec}, k=60)
+    assert [r["url"] for r in fused] == ["b", "a", "c"]
+    assert fused[0]["ranks"] == {"keyword": 2, "vector": 1}
+    assert fused[1]["snippet"] == "kw"
+    assert len(reciprocal_rank_fusion({"keyword": kw, "vector": vec}, limit=1)) == 1
+
+
+def test_hybrid_search_fuses_url_less_documents_across_legs(monkeypatch):
+    import asyncio
+
+    import app.main as main
+    from app.search.aio import AsyncVectorStore
+    from app.search.catalog import DocumentCatalog
+    from app.search.chunking import TokenChunker
+    from app.search.keyword import InvertedIndex
+
+    vs = InMemoryVectorStore()
+    monkeypatch.setattr(main, "VECTOR_STORE", vs)
+    monkeypatch.setattr(main, "CATALOG", DocumentCatalog())
+    monkeypatch.setattr(main, "KEYWORD_INDEX", InvertedIndex())
+    monkeypatch.setattr(main, "KEYWORD_FTS", None)
+    monkeypatch.setattr(main, "DOC_TOKENS", {})
+    monkeypatch.setattr(main, "NEAR_DUPS", None)
+    monkeypatch.setattr(main, "SEARCH_CACHE", None)
+    docs = [
+        DocumentUpsert(id=None, org_id=1, title="Memo", url=None, content="acme covenant breach disclosed in the memo"),
+        DocumentUpsert(id=None, org_id=1, title="Memo", url=None, content="globex covenant waiver granted"),
+    ]
+
+    async def run(chunker):
+        monkeypatch.setattr(main, "ASYNC_STORE", AsyncVectorStore(vs, chunker=chunker))
+        await main._ingest_documents(docs)
+        res = await main.docs_search_hybrid(q="acme covenant breach", org_id=1, k=10, keyword_depth=None, vector_depth=None)
+        return res["results"]
+
+    for chunker in (None, TokenChunker(max_tokens=4, overlap=0)):
+        results = asyncio.run(run(chunker))
+        # Same title, no URL: each document is still one entry, found by both legs
+        assert len(results) == 2
+        assert results[0]["ranks"] == {"keyword": 1, "vector": 1}
+        assert results[0]["ref"] == f"sha:{content_hash(docs[0].content)}"
+
+
+def test_async_store_embeds_only_changed_documents():
+    import asyncio
+
+    from app.search.aio import AsyncVectorStore, get_async_embedder
+
+    calls: list[int] = []
+    embed = get_async_embedder()
+
+    async def counting_embed(texts):
+        calls.append(len(texts))
+        return await embed(texts)
+
+    astore = AsyncVectorStore(InMemoryVectorStore(), embed=counting_embed)
+    feed = [
+        DocumentUpsert(id=None, org_id=1, title="A", url="u1", content="acme lower debt"),
+        DocumentUpsert(id=None, org_id=1, title="B", url="u2", content="acme litigation settled"),
+    ]
+
+    async def run():
+        await astore.upsert_documents(feed)
+        await astore.upsert_documents(feed)
+        return await astore.search("acme litigation", org_id=1, k=2)
+
+    res = asyncio.run(run())
+    assert calls == [2, 1]
+    assert res[0]["url"] == "u2"
+
+
+def test_in_process_stores_train_and_search_off_the_event_loop():
+    import asyncio
+    import threading
+    import time
+
+    from app.search.aio import as_async
+
+    vs = AnnVectorStore(dim=1536, nlist=4)
+    threads: list[str] = []
+    active: list[int] = []
+    train = vs.index.train
+
+    def slow_train():
+        threads.append(threading.current_thread().name)
+        active.append(1)
+        time.sleep(0.05)
+        assert len(active) == 1, "store calls overlapped"
+        train()
+        active.pop()
+
+    vs.index.train = slow_train
+    astore = as_async(vs)
+    docs = [DocumentUpsert(id=None, org_id=1, title=str(i), url=f"u{i}", content=f"acme filing {i} debt") for i in range(64)]
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        t = asyncio.create_task(ticker())
+        await asyncio.gather(astore.upsert_documents(docs[:32]), astore.upsert_documents(docs[32:]))
+        hits = await astore.search("acme filing 3 debt", org_id=1, k=1)
+        t.cancel()
+        return ticks, hits
+
+    ticks, hits = asyncio.run(run())
+    assert threads and threading.main_thread().name not in threads
+    # The loop kept running while the index trained
+    assert ticks >= 5 and hits[0]["url"] == "u3"
+
+
+def test_snapshot_restores_lazily_without_embedding(tmp_path):
+    from app.search.snapshot import SearchSnapshots
+
+    vs = InMemoryVectorStore()
+    vs.upsert_documents([
+        DocumentUpsert(id=None, org_id=1, title="A", url="u1", content="acme lower debt"),
+        DocumentUpsert(id=None, org_id=2, title="B", url="u2", content="globex litigation settled"),
+    ])
+    snaps = SearchSnapshots(ObjectStore(base_uri=f"file://{tmp_path}"), "snap")
+    docs = [{"id": 1, "org_id": 1, "title": "A", "url": "u1", "content": "acme lower debt"}]
+    assert snaps.write(snaps.capture(vs, docs)) == "a"
+    assert snaps.write(snaps.capture(vs, docs)) == "b"
+
+    restored = InMemoryVectorStore()
+    assert snaps.restore(restored) == docs
+    assert sorted(restored.segments.deferred) == [1, 2] and len(restored.segments) == 2
+
+    def no_embed(_text):
+        raise AssertionError("restore must not embed")
+
+    restored._embed = no_embed
+    q = vs._embed("globex litigation")
+    assert restored.search("", org_id=2, k=1, query_vector=q) == vs.search("", org_id=2, k=1, query_vector=q)
+    assert restored.segments.deferred == [1]
+    # Unchanged re-ingest is recognised from the restored keys
+    restored.upsert_documents([DocumentUpsert(id=None, org_id=1, title="A", url="u1", content="acme lower debt")])
+    assert len(restored.segments) == 2
+
+
+def test_long_documents_are_chunked_and_collapsed_to_parent():
+    import asyncio
+
+    from app.search.aio import AsyncVectorStore
+    from app.search.chunking import TokenChunker
+
+    chunker = TokenChunker(max_tokens=50, overlap=10)
+    filler = " ".join(f"boilerplate{i}" for i in range(400))
+    body = filler + " the issuer disclosed a material weakness in revenue controls " + filler
+    chunks = list(chunker.split(body))
+    assert len(chunks) > 10 and all(len(chunker._encode(c)) <= 50 for c in chunks)
+
+    vs = InMemoryVectorStore()
+    astore = AsyncVectorStore(vs, chunker=chunker, batch_size=8)
+    docs = [
+        DocumentUpsert(id=None, org_id=1, title="10-K", url="https://sec.example/10k", content=body),
+        DocumentUpsert(id=None, org_id=1, title="Short", url="https://news.example/1", content="quarterly dividend declared"),
+    ]
+
+    async def run():
+        await astore.upsert_documents(docs)
+        return await astore.search("material weakness revenue controls", org_id=1, k=5)
+
+    res = asyncio.run(run())
+    assert len(vs.segments) == len(chunks) + 1
+    # Many matching chunks collapse into one hit on the parent filing, and the search
+    # widens past them until k parents (here: the whole corpus) are found
+    assert [r["url"] for r in res] == ["https://sec.example/10k", "https://news.example/1"]
+    assert res[0]["chunk"] > 0 and "chunk" not in res[1]
+
+    # Every chunk of the long filing outranks the short notes, filling the initial k * overfetch window
+    vs = InMemoryVectorStore()
+    astore = AsyncVectorStore(vs, chunker=chunker, batch_size=64)
+    filing = " ".join(f"revenue controls weakness note{i}" for i in range(800))
+    notes = [f"revenue note{i} dividend guidance board meeting schedule update" for i in range(4)]
+    docs = [DocumentUpsert(id=None, org_id=1, title="10-K", url="https://sec.example/10k", content=filing)]
+    docs += [DocumentUpsert(id=None, org_id=1, title=f"N{i}", url=f"https://news.example/{i}", content=t) for i, t in enumerate(notes)]
+
+    async def run_k():
+        await astore.upsert_documents(docs)
+        return await astore.search("revenue controls weakness", org_id=1, k=4)
+
+    res = asyncio.run(run_k())
+    assert len(res) == 4 and len({r["url"] for r in res}) == 4 and res[0]["url"] == "https://sec.example/10k"
+
+
+def test_inverted_index_matches_bm25_and_updates_incrementally():
+    from app.search.keyword import InvertedIndex, bm25_score
+
+    docs = [
+        ("1", 1, "acme debt debt refinancing"),
+        ("2", 1, "acme litigation settled"),
+        ("3", 2, "globex debt default notice filed"),
+        ("4", 1, "quarterly results steady margins"),
+    ]
+    idx = InvertedIndex()
+    for did, org, text in docs:
+        idx.add(did, org, text)
+    for org in (None, 1):
+        corpus = [(did, text) for did, o, text in docs if org is None or o == org]
+        want = bm25_score("acme debt", corpus)[:2]
+        got = idx.search("acme debt", org_id=org, k=2)
+        assert [d for d, _ in got] == [d for d, _ in want]
+        assert np.allclose([s for _, s in got], [s for _, s in want])
+    idx.add("1", 1, "acme new chief executive")
+    idx.remove("2")
+    assert [d for d, _ in idx.search("debt", org_id=1, k=5)] == []
+    assert [d for d, _ in idx.search("debt", k=5)] == ["3"]
+    assert len(idx) == 3
+
+
+def test_analyzer_token_arrays_feed_index_embedder_and_highlights():
+    from app.search.analysis import ENGLISH_STOPWORDS, Analyzer
+    from app.search.keyword import InvertedIndex
+    from app.search.vector import hash_embed, hash_embed_tokens
+
+    text = "ACME filed the Debt notice; debt holders were notified."
+    doc = Analyzer().analyze(text)
+    assert doc.ids.dtype == np.int32 and len(doc) == 9
+    assert doc.ids[3] == doc.ids[5]  # "Debt" and "debt" intern to one id
+    # Default analyzer: the token path reproduces the text path exactly
+    from app.search.analysis import default_analyzer
+
+    assert np.allclose(hash_embed_tokens(default_analyzer().analyze(text), 64), hash_embed(text, 64))
+
+    stemmed = Analyzer(stopwords=ENGLISH_STOPWORDS, stem=True)
+    assert stemmed.terms(text) == ["acme", "file", "debt", "notice", "debt", "holder", "notify"]
+    analyzed = stemmed.analyze(text)
+    q = stemmed.lookup("Debts the unknownterm")
+    assert len(stemmed.vocab) == 6 and q.tolist() == [stemmed.vocab.get("debt")]
+    assert [text[s:e] for s, e in analyzed.spans(q.tolist())] == ["Debt", "debt"]
+
+    idx = InvertedIndex(analyzer=stemmed)
+    idx.add_tokens("1", 1, analyzed)
+    idx.add("2", 1, "holders of equity")
+    assert [d for d, _ in idx.search("holder debts", org_id=1, k=2)] == ["1", "2"]
+
+
+def test_vocabulary_hash_buffer_grows_by_doubling():
+    from app.search.analysis import Vocabulary, term_hash
+
+    vocab = Vocabulary()
+    buffers = set()
+    for i in range(5000):
+        vocab.intern(f"t{i}")
+        # Earlier ids stay readable while the buffer grows
+        assert vocab.hashes(np.array([0, i]))[1] == term_hash(f"t{i}")
+        buffers.add(vocab._hashes.shape[0])
+    assert sorted(buffers) == [1024, 2048, 4096, 8192]
+    assert vocab.hash_of("t4999") == term_hash("t4999") and vocab.hash_of("unseen") == term_hash("unseen")
+
+
+def test_document_catalog_recency_retention_and_ids():
+    from app.search.catalog import DocumentCatalog
+
+    cat = DocumentCatalog(retention_per_org=2)
+    up = lambda org, url: cat.upsert(DocumentUpsert(id=None, org_id=org, title=url, url=url, content=url))
+    a, _ = up(1, "a")
+    up(2, "x")
+    b, _ = up(1, "b")
+    again, evicted = up(1, "a")
+    assert again is a and evicted == [] and len(cat) == 3
+    assert [r["url"] for r in cat.recent(1)] == ["a", "b"]
+    assert [r["url"] for r in cat.recent(None, limit=2)] == ["a", "b"]
+    c, evicted = up(1, "c")
+    assert evicted == [b] and cat.get(b["id"]) is None and cat.by_key((1, "b")) is None
+    assert [r["url"] for r in cat.iter_org(1)] == ["a", "c"]
+    assert c["id"] == 4
+
+    restored = DocumentCatalog()
+    restored.restore([dict(r) for r in cat])
+    assert [r["url"] for r in restored.recent(None, limit=10)] == ["c", "a", "x"]
+    d, _ = restored.upsert(DocumentUpsert(id=None, org_id=1, title="d", url="d", content="d"))
+    assert d["id"] == 5
+
+
+def test_deleted_documents_leave_every_vector_store():
+    import asyncio
+
+    from app.search.aio import AsyncVectorStore
+    from app.search.chunking import TokenChunker
+
+    filing = " ".join(f"revenue controls weakness note{i}" for i in range(200))
+    docs = [
+        DocumentUpsert(id=None, org_id=1, title="10-K", url="https://sec.example/10k", content=filing),
+        DocumentUpsert(id=None, org_id=1, title="A", url=None, content="acme lower debt"),
+        DocumentUpsert(id=None, org_id=1, title="B", url="u2", content="acme litigation settled"),
+    ]
+    stores = [
+        InMemoryVectorStore(global_segment=True),
+        InMemoryVectorStore(quantization="int8"),
+        AnnVectorStore(nlist=2),
+    ]
+    for vs in stores:
+        astore = AsyncVectorStore(vs, chunker=TokenChunker(max_tokens=50, overlap=10))
+
+        async def run():
+            await astore.upsert_documents(docs)
+            deleted = await astore.delete_documents(docs[:2])
+            return deleted, await astore.search("acme revenue controls", org_id=None, k=10)
+
+        deleted, res = asyncio.run(run())
+        assert deleted > 2 and [r["url"] for r in res] == ["u2"], type(vs)
+        assert len(vs.keys) == 1
+
+
+def test_retention_eviction_removes_documents_from_vector_search(monkeypatch):
+    import asyncio
+
+    import app.main as main
+    from app.search.aio import AsyncVectorStore
+    from app.search.catalog import DocumentCatalog
+    from app.search.dedup import NearDuplicateIndex
+    from app.search.keyword import InvertedIndex
+
+    vs = InMemoryVectorStore()
+    monkeypatch.setattr(main, "VECTOR_STORE", vs)
+    monkeypatch.setattr(main, "ASYNC_STORE", AsyncVectorStore(vs))
+    monkeypatch.setattr(main, "CATALOG", DocumentCatalog(retention_per_org=2))
+    monkeypatch.setattr(main, "KEYWORD_INDEX", InvertedIndex())
+    monkeypatch.setattr(main, "DOC_TOKENS", {})
+    monkeypatch.setattr(main, "NEAR_DUPS", NearDuplicateIndex(threshold=0.8))
+    texts = ["acme lower debt and steady margins", "globex litigation settled in court", "initech fined for late filings"]
+
+    async def run():
+        for i, text in enumerate(texts):
+            await main._ingest_documents([DocumentUpsert(id=None, org_id=1, title=str(i), url=f"u{i}", content=text)])
+        hits = await main.ASYNC_STORE.search("acme lower debt", org_id=1, k=10)
+        # The evicted canonical is gone from the near-duplicate index: its copy is indexed anew
+        await main._ingest_documents([DocumentUpsert(id=None, org_id=1, title="c", url="u9", content=texts[0])])
+        return hits, await main.ASYNC_STORE.search("acme lower debt", org_id=1, k=10)
+
+    hits, after = asyncio.run(run())
+    assert sorted(r["url"] for r in hits) == ["u1", "u2"]
+    assert [r["url"] for r in main.CATALOG.recent(1)] == ["u9", "u2"] and len(vs.segments) == 2
+    assert after[0]["url"] == "u9" and "u0" not in {r["url"] for r in after}
+
+
+def test_evicting_a_canonical_document_drops_its_near_duplicates(monkeypatch):
+    import asyncio
+
+    import app.main as main
+    from app.search.aio import AsyncVectorStore
+    from app.search.catalog import DocumentCatalog
+    from app.search.dedup import NearDuplicateIndex
+    from app.search.keyword import InvertedIndex
+
+    vs = InMemoryVectorStore()
+    monkeypatch.setattr(main, "VECTOR_STORE", vs)
+    monkeypatch.setattr(main, "ASYNC_STORE", AsyncVectorStore(vs))
+    monkeypatch.setattr(main, "CATALOG", DocumentCatalog(retention_per_org=1))
+    monkeypatch.setattr(main, "KEYWORD_INDEX", InvertedIndex())
+    monkeypatch.setattr(main, "DOC_TOKENS", {})
+    monkeypatch.setattr(main, "NEAR_DUPS", NearDuplicateIndex(threshold=0.7))
+    body = "ACME Corp agreed to pay a fine of 12 million dollars to settle claims by regulators over billing practices"
+
+    async def run():
+        await main._ingest_documents([
+            DocumentUpsert(id=None, org_id=1, title="a", url="u0", content=body),
+            DocumentUpsert(id=None, org_id=1, title="b", url="u1", content=body + " today"),
+        ])
+        # Retention of one evicts u0, and its suppressed copy u1 with it
+        await main._ingest_documents([DocumentUpsert(id=None, org_id=1, title="c", url="u2", content="globex opens a plant")])
+        return await main.ASYNC_STORE.search("acme fine billing", org_id=1, k=10)
+
+    hits = asyncio.run(run())
+    assert [r["url"] for r in main.CATALOG.recent(1)] == ["u2"]
+    assert [r["url"] for r in hits] == ["u2"] and len(vs.segments) == 1
+    assert main.NEAR_DUPS.alternates(1, "u0") == [] and main.NEAR_DUPS.canonical_url(1, "u1") == "u1"
+
+
+def test_query_snippet_picks_best_window_and_caps_bytes():
+    from app.search.analysis import Analyzer
+    from app.search.snippets import cap_bytes, query_snippet
+
+    an = Analyzer()
+    filler = " ".join(f"word{i}" for i in range(200))
+    content = f"Debt mentioned early. {filler} The ACME debt default was disclosed in the notes. {filler} Closing débt remarks."
+    doc = an.analyze(content)
+    q = an.lookup("acme debt default").tolist()
+    snip = query_snippet(content, doc, q, max_bytes=120, window=12)
+    assert len(snip.text.encode("utf-8")) <= 120
+    assert snip.text.startswith("…") and snip.text.endswith("…")
+    assert [snip.text[s:e] for s, e in snip.highlights] == ["ACME", "debt", "default"]
+
+    # No match: leading text, still capped
+    lead = query_snippet(content, doc, an.lookup("zzz").tolist(), max_bytes=40)
+    assert lead.text.startswith("Debt mentioned") and lead.highlights == []
+    assert len(lead.text.encode("utf-8")) <= 40
+    assert cap_bytes("ééééé", 7) == "éé…"
+
+
+def test_postgres_fts_query_operators():
+    from app.search.keyword import postgres_fts_query
+
+    assert postgres_fts_query("ACME debt-default!") == "acme & debt & default"
+    assert postgres_fts_query("acme debt", "|") == "acme | debt"
+    assert postgres_fts_query("!!") == "''"
+
+
+def test_query_cache_lru_ttl_and_generations(monkeypatch):
+    from app.search import cache as cache_mod
+
+    gens = cache_mod.CorpusGenerations()
+    c = cache_mod.QueryCache(maxsize=2, ttl_s=10)
+    c.put(("q", 1, gens.get(1)), ["r1"], 0.5)
+    assert c.get(("q", 1, gens.get(1))) == (["r1"], 0.5)
+    gens.bump([1, 1, 2])
+    assert gens.get(1) == 1 and gens.get(None) == 2
+    assert c.get(("q", 1, gens.get(1))) is None
+    c.put("a", 1, 0.0)
+    c.put("b", 2, 0.0)
+    c.get("a")
+    c.put("c", 3, 0.0)
+    assert c.get("b") is None and c.get("a") == (1, 0.0)
+    now = cache_mod.time.monotonic()
+    monkeypatch.setattr(cache_mod.time, "monotonic", lambda: now + 11)
+    assert c.get("a") is None
+    assert c.hits == 3 and c.misses == 3
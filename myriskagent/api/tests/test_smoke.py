@@ -105,3 +105,11 @@ def test_docs_recent_smoke():
     data = r.json()
     assert data.get("org_id") == 1
     assert isinstance(data.get("results"), list)
+
+
+def test_social_observations_smoke():
+    client = TestClient(app)
+    r = client.post("/social/77/observations", json={"count": 12, "date": "2024-06-02"})
+    assert r.status_code == 200 and r.json().get("spike") is None
+    assert client.post("/social/77/observations", json={"count": 3, "date": "2024-06-01"}).status_code == 409
+    assert client.post("/social/77/observations", json={"count": 3, "date": "June 1st"}).status_code == 422
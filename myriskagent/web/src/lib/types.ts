@@ -3,6 +3,8 @@ export interface DocResult {
   title?: string
   url?: string
   snippet?: string
+  // [start, end) character spans of matched query terms in `snippet`
+  highlights?: [number, number][]
 }
 
 export interface ScoreFamily { score: number; confidence: number }
@@ -15,7 +15,7 @@ const Documents: React.FC = () => {
   const { orgId } = useOrg()
   const [q, setQ] = React.useState<string>(() => { try { return localStorage.getItem('mra_docs_q') || '' } catch { return '' } })
   const [ticker, setTicker] = React.useState('')
-  const [mode, setMode] = React.useState<'vector' | 'keyword'>(() => { try { return ((localStorage.getItem('mra_docs_mode') as 'vector'|'keyword') || 'vector') } catch { return 'vector' } })
+  const [mode, setMode] = React.useState<'vector' | 'keyword' | 'hybrid'>(() => { try { return ((localStorage.getItem('mra_docs_mode') as 'vector'|'keyword'|'hybrid') || 'vector') } catch { return 'vector' } })
   const [selected, setSelected] = React.useState<DocResult | null>(() => {
     try { const raw = localStorage.getItem('mra_docs_selected'); return raw ? JSON.parse(raw) : null } catch { return null }
   })
@@ -40,7 +40,9 @@ const Documents: React.FC = () => {
     queryFn: async () => {
       const path = mode === 'vector'
         ? `/api/docs/search?q=${encodeURIComponent(q)}&org_id=${orgId}`
-        : `/api/docs/search/keyword?q=${encodeURIComponent(q)}&org_id=${orgId}`
+        : mode === 'hybrid'
+          ? `/api/docs/search/hybrid?q=${encodeURIComponent(q)}&org_id=${orgId}`
+          : `/api/docs/search/keyword?q=${encodeURIComponent(q)}&org_id=${orgId}`
       return apiGet<{ results: DocResult[] }>(path)
     },
   })
@@ -106,8 +108,23 @@ const Documents: React.FC = () => {
     }
   }, [results])
 
-  const highlight = (text?: string) => {
+  const escapeHtml = (s: string) => s.replace(/[&<>"']/g, c => ({ '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;' }[c] as string))
+
+  // Server-side spans come from the analyzer, so they follow its stemming and stopwords
+  const markSpans = (text: string, spans: [number, number][]) => {
+    let out = ''
+    let pos = 0
+    for (const [s, e] of spans) {
+      if (s < pos) continue
+      out += escapeHtml(text.slice(pos, s)) + '<mark>' + escapeHtml(text.slice(s, e)) + '</mark>'
+      pos = e
+    }
+    return out + escapeHtml(text.slice(pos))
+  }
+
+  const highlight = (text?: string, spans?: [number, number][]) => {
     if (!text) return ''
+    if (spans) return markSpans(text, spans)
     const terms = (q || '').trim().split(/\s+/).filter(Boolean)
     let out = text
     for (const t of terms) {
@@ -130,6 +147,7 @@ const Documents: React.FC = () => {
         <ToggleButtonGroup exclusive value={mode} onChange={(_, v) => v && setMode(v)} size="small">
           <ToggleButton value="vector" sx={{ color: '#F1A501', borderColor: '#B30700' }}>Vector</ToggleButton>
           <ToggleButton value="keyword" sx={{ color: '#F1A501', borderColor: '#B30700' }}>Keyword</ToggleButton>
+          <ToggleButton value="hybrid" sx={{ color: '#F1A501', borderColor: '#B30700' }}>Hybrid</ToggleButton>
         </ToggleButtonGroup>
         <TextField variant="outlined" size="small" placeholder="Ticker (e.g., ACMEX)" value={ticker} onChange={e => setTicker(e.target.value)}
           InputProps={{ sx: { color: '#F1A501' } }}
@@ -228,7 +246,7 @@ const Documents: React.FC = () => {
                           primaryTypographyProps={{ component: 'div' }}
                           secondaryTypographyProps={{ component: 'div' }}
                           primary={<span dangerouslySetInnerHTML={{ __html: highlight(r.title) }} />}
-                          secondary={<span dangerouslySetInnerHTML={{ __html: highlight(r.snippet) }} />}
+                          secondary={<span dangerouslySetInnerHTML={{ __html: highlight(r.snippet, r.highlights) }} />}
                           sx={{ color: '#F1A501' }}
                         />
                       </ListItem>